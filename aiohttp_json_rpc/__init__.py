@@ -1,9 +1,11 @@
-from .decorators import raw_response, validate  # NOQA
+from .decorators import raw_response, validate, process, bulkhead  # NOQA
 from .client import JsonRpcClient, JsonRpcClientContext  # NOQA
+from .client_pool import JsonRpcClientPool  # NOQA
 from .rpc import JsonRpc  # NOQA
 
 from .exceptions import (  # NOQA
     RpcGenericServerDefinedError,
+    RpcDeadlineExceededError,
     RpcInvalidRequestError,
     RpcMethodNotFoundError,
     RpcInvalidParamsError,
@@ -1,5 +1,20 @@
 class AuthBackend:
-    pass
+    def dump_identity(self, request):
+        """
+        Returns a JSON serializable representation of the identity of the
+        user of request, which gets embedded in resumption tokens.
+        """
+
+        return None
+
+    def resume_request(self, request, identity):
+        """
+        Restores the identity, which was created by dump_identity(), on
+        request. This gets used instead of prepare_request() for clients
+        presenting a valid resumption token.
+        """
+
+        return self.prepare_request(request)
 
 
 class DummyAuthBackend(AuthBackend):
@@ -1,23 +1,39 @@
 from importlib import import_module
+import json
 
 from django.contrib.auth import authenticate, login as django_login
 from django.contrib.auth.models import User, AnonymousUser
 from django.contrib.sessions.models import Session
-from django.forms.models import model_to_dict
 from django.conf import settings
 from django.http import HttpRequest
 from django.apps import apps
 
 from .. import RpcInvalidParamsError
+from ..django.serializers import get_serializer
+from ..django import acquire_db_connections
+from ..django.cache import ModelViewCache
+from ..topics import filter_subscriptions
 from ..rpc import JsonRpcMethod
 from . import AuthBackend
 
 
 class DjangoAuthBackend(AuthBackend):
-    def __init__(self, generic_orm_methods=False):
+    def __init__(self, generic_orm_methods=False, cached_models=(),
+                 cache_maxsize=256, cache_ttl=60):
+
         self.generic_orm_methods = generic_orm_methods
         self.session_engine = import_module(settings.SESSION_ENGINE)
 
+        # view caches
+        self.view_caches = {}
+
+        for model in cached_models:
+            if isinstance(model, str):
+                model = apps.get_model(model)
+
+            self.view_caches[model] = ModelViewCache(
+                model, maxsize=cache_maxsize, ttl=cache_ttl)
+
     # Helper methods
     def get_user(self, request):
         session_key = request.cookies.get('sessionid', '')
@@ -69,11 +85,18 @@ class DjangoAuthBackend(AuthBackend):
         return True
 
     # generic ORM methods
-    def dump_model_object(self, obj):
-        d = model_to_dict(obj)
-        d['pk'] = obj.pk
+    def dump_model_object(self, obj, fields=None):
+        return get_serializer(obj.__class__).dump(obj, fields=fields)
+
+    def dump_model_objects(self, model, objects, fields=None):
+        # subclasses that override dump_model_object() get it used for views
+        # too
+        dump_model_object = type(self).dump_model_object
 
-        return d
+        if dump_model_object is not DjangoAuthBackend.dump_model_object:
+            return [self.dump_model_object(i, fields=fields) for i in objects]
+
+        return get_serializer(model).dump_many(objects, fields=fields)
 
     async def _model_view(self, request, model):
         lookups = request.msg.data['params'] or {}
@@ -81,14 +104,55 @@ class DjangoAuthBackend(AuthBackend):
         if not isinstance(lookups, dict):
             raise RpcInvalidParamsError
 
+        # '_fields' is an optional whitelist of fields to dump
+        lookups = dict(lookups)
+        fields = lookups.pop('_fields', None)
+
+        if fields is not None:
+            if not isinstance(fields, list):
+                raise RpcInvalidParamsError
+
+            if not all(isinstance(i, str) for i in fields):
+                raise RpcInvalidParamsError
+
+            fields = tuple(fields)
+
+        # cache lookup
+        cache = self.view_caches.get(model, None)
+
+        if cache is not None:
+            user = request.http_request.user
+
+            cache_key = (
+                json.dumps(lookups, sort_keys=True),
+                fields,
+                user.is_superuser,
+                frozenset(user.get_all_permissions()),
+            )
+
+            result = cache.get(cache_key)
+
+            if result is not None:
+                return result
+
+            generation = cache.generation
+
         try:
-            objects = model.objects.filter(**lookups)
+            serializer = get_serializer(model)
 
-            return [self.dump_model_object(i) for i in objects]
+            objects = serializer.prepare_queryset(
+                model.objects.filter(**lookups), fields=fields)
+
+            result = self.dump_model_objects(model, objects, fields=fields)
 
         except Exception:
             raise RpcInvalidParamsError
 
+        if cache is not None:
+            cache.set(cache_key, result, generation)
+
+        return result
+
     async def _model_delete(self, request, model):
         lookups = request.msg.data['params'] or {}
 
@@ -135,6 +199,9 @@ class DjangoAuthBackend(AuthBackend):
             raise RpcInvalidParamsError
 
     async def handle_orm_call(self, request):
+        # the ORM runs in the task of the call
+        await acquire_db_connections()
+
         method_name = request.msg.data['method'].split('__')[1]
         app_label, _ = method_name.split('.')
         action, model_name = _.split('_')
@@ -186,9 +253,46 @@ class DjangoAuthBackend(AuthBackend):
 
         # rediscover methods and topics
         await self.prepare_request(request.http_request, user=user)
+        request.http_request.rpc._index_subscriptions(request.http_request)
 
         return True
 
+    # session resumption
+    def dump_identity(self, request):
+        if isinstance(request.user, AnonymousUser):
+            return None
+
+        return {
+            'user_id': request.user.pk,
+        }
+
+    def _get_user_by_identity(self, identity):
+        # the permissions get read from the database, so permissions that
+        # were revoked since the token was issued don't apply
+        try:
+            user = User.objects.get(pk=identity['user_id'], is_active=True)
+
+        except User.DoesNotExist:
+            return AnonymousUser()
+
+        # fill the permission cache of the user while still in the worker
+        # thread; prepare_request() needs the permissions
+        user.get_all_permissions()
+
+        return user
+
+    async def resume_request(self, request, identity):
+        if not identity:
+            return await self.prepare_request(request, user=AnonymousUser())
+
+        user = await request.rpc.loop.run_in_executor(
+            request.rpc.worker_pool.executor,
+            self._get_user_by_identity,
+            identity,
+        )
+
+        await self.prepare_request(request, user=user)
+
     # request processing
     async def prepare_request(self, request, user=None):
         if not user:
@@ -230,4 +334,5 @@ class DjangoAuthBackend(AuthBackend):
         if not hasattr(request, 'subscriptions'):
             request.subscriptions = set()
 
-        request.subscriptions = request.topics & request.subscriptions
+        request.subscriptions = filter_subscriptions(request.topics,
+                                                     request.subscriptions)
@@ -1,53 +1,139 @@
-import binascii
+from concurrent.futures import ProcessPoolExecutor
+import threading
 import asyncio
 import hashlib
+import logging
+import hmac
 import os
 
 from aiohttp_json_rpc.rpc import JsonRpcMethod
+from .passwd_stores import PasswdFileStore
+from ..topics import filter_subscriptions
+from ..cache import LRUCache
 from .. import RpcInvalidParamsError
 from . import login_required
 
+logger = logging.getLogger('aiohttp-json-rpc.auth.passwd')
+
+
+def hash_password(password, salt, rounds):
+    if not type(password) == bytes:
+        password = password.encode()
+
+    return hashlib.pbkdf2_hmac('sha256', password, salt, rounds)
+
 
 class PasswdAuthBackend:
-    def __init__(self, passwd_file):
+    """
+    Password hashing for logins runs in a process pool of hash_workers
+    processes. With hash_workers=0 the default executor of the loop is used
+    instead.
+
+    Users are kept in memory and persisted by a PasswdStore. By default the
+    classic passwd file format is used; PasswdLogStore and
+    PasswdSqliteStore write only the changed user. Every reload_interval
+    seconds the store is checked for external changes, which get reloaded
+    in an executor.
+
+    Successful logins get cached for credential_cache_ttl seconds, so a
+    reconnecting client does not have to pay for a full PBKDF2 run again.
+    The cache is keyed on an HMAC of username and password, using a key
+    that only lives in memory, and entries become invalid as soon as the
+    password of the user changes.
+    """
+
+    def __init__(self, passwd_file=None, hash_workers=None,
+                 credential_cache_ttl=60, credential_cache_size=1024,
+                 store=None, reload_interval=1):
+
+        if store is None:
+            if passwd_file is None:
+                raise ValueError('either passwd_file or store has to be set')
+
+            store = PasswdFileStore(passwd_file)
+
         self.passwd_file = passwd_file
+        self.store = store
+        self.reload_interval = reload_interval
+
+        self._lock = threading.RLock()
+        self._watch_task = None
+
+        if hash_workers is None:
+            hash_workers = min(4, os.cpu_count() or 1)
+
+        self.hash_workers = hash_workers
+        self._hash_executor = None
+
+        self._credential_cache = LRUCache(maxsize=credential_cache_size,
+                                          ttl=credential_cache_ttl)
+
+        self._credential_cache_key = os.urandom(32)
+
         self.read()
 
+    def _get_hash_executor(self):
+        if self.hash_workers and self._hash_executor is None:
+            self._hash_executor = ProcessPoolExecutor(
+                max_workers=self.hash_workers)
+
+        return self._hash_executor
+
+    def shutdown(self, wait=True):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
+
+        if self._hash_executor:
+            self._hash_executor.shutdown(wait=wait)
+            self._hash_executor = None
+
     def read(self):
-        self.user = {}
+        with self._lock:
+            self.user = self.store.load()
 
-        try:
-            with open(self.passwd_file, 'r') as f:
-                for line in f:
-                    if line.endswith('\n'):
-                        line = line[:-1]
+    def write(self):
+        with self._lock:
+            self.store.dump(self.user)
 
-                    data = line.split(':')
+    def reload(self):
+        """
+        Reloads all users if the store was changed by someone else.
+        Returns True if users were reloaded.
+        """
 
-                    if len(data) < 5:
-                        continue
+        with self._lock:
+            if not self.store.has_changed():
+                return False
 
-                    self.user[data[0]] = {
-                        'password_hash': binascii.unhexlify(data[1]),
-                        'salt': binascii.unhexlify(data[2]),
-                        'rounds': int(data[3]),
-                        'permissions': set(data[4].split(',')),
-                    }
+            self.user = self.store.load()
 
-        except FileNotFoundError:
-            pass
+            return True
 
-    def write(self):
-        with open(self.passwd_file, 'w') as f:
-            for username, data in self.user.items():
-                f.write('{username}:{password_hash}:{salt}:{rounds}:{permissions}\n'.format(  # NOQA
-                    username=username,
-                    password_hash=binascii.hexlify(
-                        data['password_hash']).decode(),
-                    salt=binascii.hexlify(data['salt']).decode(),
-                    rounds=str(data['rounds']),
-                    permissions=','.join(data['permissions']),
-                ))
+    async def _watch_store(self):
+        loop = asyncio.get_event_loop()
+
+        while True:
+            await asyncio.sleep(self.reload_interval)
+
+            try:
+                await loop.run_in_executor(None, self.reload)
+
+            except Exception:
+                logger.exception('reloading users failed')
+
+    def _start_watching_store(self):
+        if not self.reload_interval or self._watch_task is not None:
+            return
+
+        # the task gets cancelled by shutdown(), which JsonRpc.shutdown()
+        # calls, so it needs a running loop to get cleaned up
+        loop = asyncio.get_event_loop()
+
+        if not loop.is_running():
+            return
+
+        self._watch_task = loop.create_task(self._watch_store())
 
     def _create_user(self, username, password, salt=None, rounds=100000,
                      permissions=None):
@@ -56,29 +142,31 @@ class PasswdAuthBackend:
             return False
 
         salt = salt or os.urandom(16)
+        password_hash = hash_password(password, salt, rounds)
 
-        if not type(password) == bytes:
-            password = password.encode()
-
-        password_hash = hashlib.pbkdf2_hmac('sha256', password, salt, rounds)
-
-        self.user[username] = {
+        data = {
             'password_hash': password_hash,
             'salt': salt,
             'rounds': rounds,
             'permissions': permissions or []
         }
 
-        self.write()
+        with self._lock:
+            if username in self.user:
+                return False
+
+            self.store.set_user(username, data)
+            self.user[username] = data
 
         return True
 
     def _delete_user(self, username):
-        if username not in self.user:
-            return False
+        with self._lock:
+            if username not in self.user:
+                return False
 
-        self.user.pop(username)
-        self.write()
+            self.store.delete_user(username)
+            self.user.pop(username)
 
         return True
 
@@ -90,17 +178,19 @@ class PasswdAuthBackend:
                 return False
 
         salt = salt or os.urandom(16)
+        password_hash = hash_password(password, salt, rounds)
 
-        if not type(password) == bytes:
-            password = password.encode()
-
-        password_hash = hashlib.pbkdf2_hmac('sha256', password, salt, rounds)
+        with self._lock:
+            if username not in self.user:
+                return False
 
-        self.user[username]['password_hash'] = password_hash
-        self.user[username]['salt'] = salt
-        self.user[username]['rounds'] = rounds
+            data = dict(self.user[username])
+            data['password_hash'] = password_hash
+            data['salt'] = salt
+            data['rounds'] = rounds
 
-        self.write()
+            self.store.set_user(username, data)
+            self.user[username] = data
 
         return True
 
@@ -118,8 +208,38 @@ class PasswdAuthBackend:
 
         return None, set()
 
+    async def _check_credentials(self, username, password):
+        loop = asyncio.get_event_loop()
+
+        if username not in self.user:
+            return None, set()
+
+        user = self.user[username]
+
+        cache_key = hmac.new(
+            self._credential_cache_key,
+            '{}:{}:{}'.format(len(username), username, password).encode(),
+            'sha256',
+        ).digest()
+
+        # the cache stores the password hash that was valid at login time
+        if self._credential_cache.get(cache_key) == user['password_hash']:
+            return username, user['permissions']
+
+        password_hash = await loop.run_in_executor(
+            self._get_hash_executor(), hash_password, password,
+            user['salt'], user['rounds'])
+
+        if hmac.compare_digest(password_hash, user['password_hash']):
+            self._credential_cache.set(cache_key, user['password_hash'])
+
+            return username, user['permissions']
+
+        return None, set()
+
     def _is_authorized(self, request, method):
-        method = method.method
+        # topics are plain functions
+        method = getattr(method, 'method', method)
 
         if hasattr(method, 'login_required') and not request.user:
             return False
@@ -131,7 +251,25 @@ class PasswdAuthBackend:
 
         return True
 
+    def dump_identity(self, request):
+        return getattr(request, 'user', None)
+
+    def resume_request(self, request, identity):
+        # the permissions are taken from the store, so changes since the
+        # token was issued apply
+        if identity in self.user:
+            request.user = identity
+            request.permissions = self.user[identity]['permissions']
+
+        else:
+            request.user = None
+            request.permissions = set()
+
+        self.prepare_request(request)
+
     def prepare_request(self, request):
+        self._start_watching_store()
+
         if not hasattr(request, 'user'):
             request.user = None
 
@@ -164,23 +302,23 @@ class PasswdAuthBackend:
         if not hasattr(request, 'subscriptions'):
             request.subscriptions = set()
 
-        request.subscriptions = request.topics & request.subscriptions
+        request.subscriptions = filter_subscriptions(request.topics,
+                                                     request.subscriptions)
 
     async def login(self, request):
-        loop = asyncio.get_event_loop()
-
         try:
-            username = request.params['username']
-            password = request.params['password']
+            username = str(request.params['username'])
+            password = str(request.params['password'])
 
         except(KeyError, TypeError):
             raise RpcInvalidParamsError
 
         request.http_request.user, request.http_request.permissions = (
-            await loop.run_in_executor(None, self._login, username, password))
+            await self._check_credentials(username, password))
 
         # rediscover methods
         self.prepare_request(request.http_request)
+        request.http_request.rpc._index_subscriptions(request.http_request)
 
         return bool(request.http_request.user)
 
@@ -190,6 +328,7 @@ class PasswdAuthBackend:
         request.http_request.permissions = set()
 
         self.prepare_request(request.http_request)
+        request.http_request.rpc._index_subscriptions(request.http_request)
 
         return True
 
@@ -0,0 +1,368 @@
+import threading
+import binascii
+import tempfile
+import sqlite3
+import os
+
+
+def parse_passwd_line(line):
+    if line.endswith('\n'):
+        line = line[:-1]
+
+    data = line.split(':')
+
+    if len(data) < 5:
+        return None, None
+
+    try:
+        return data[0], {
+            'password_hash': binascii.unhexlify(data[1]),
+            'salt': binascii.unhexlify(data[2]),
+            'rounds': int(data[3]),
+            'permissions': set(data[4].split(',')),
+        }
+
+    except ValueError:  # binascii.Error is a ValueError
+        return None, None
+
+
+def format_passwd_line(username, data):
+    return '{username}:{password_hash}:{salt}:{rounds}:{permissions}\n'.format(
+        username=username,
+        password_hash=binascii.hexlify(data['password_hash']).decode(),
+        salt=binascii.hexlify(data['salt']).decode(),
+        rounds=str(data['rounds']),
+        permissions=','.join(data['permissions']),
+    )
+
+
+def atomic_write(path, lines):
+    """
+    Writes lines to a temporary file next to path and renames it to path,
+    so readers never see a partially written file.
+    """
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.passwd-')
+
+    try:
+        with os.fdopen(fd, 'w') as f:
+            for line in lines:
+                f.write(line)
+
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp_path, path)
+
+    except BaseException:
+        os.unlink(tmp_path)
+
+        raise
+
+
+class PasswdStore:
+    """
+    Storage engine interface of PasswdAuthBackend.
+
+    All methods may block and get called from executor threads. The backend
+    serializes all calls using its own lock.
+    """
+
+    def load(self):
+        """Returns a dict of all users."""
+
+        raise NotImplementedError
+
+    def dump(self, users):
+        """Replaces all stored users."""
+
+        raise NotImplementedError
+
+    def set_user(self, username, data):
+        raise NotImplementedError
+
+    def delete_user(self, username):
+        raise NotImplementedError
+
+    def has_changed(self):
+        """Returns True if the storage was changed by someone else."""
+
+        return False
+
+    def close(self):
+        pass
+
+
+class _FileStore(PasswdStore):
+    def __init__(self, path):
+        self.path = path
+        self._stamp = None
+
+    def _get_stamp(self):
+        try:
+            stat = os.stat(self.path)
+
+        except FileNotFoundError:
+            return None
+
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def _update_stamp(self):
+        self._stamp = self._get_stamp()
+
+    def has_changed(self):
+        return self._get_stamp() != self._stamp
+
+
+class PasswdFileStore(_FileStore):
+    """
+    The classic passwd file format: one user per line.
+
+    Every change rewrites the whole file atomically.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+
+        self._users = {}
+
+    def load(self):
+        users = {}
+        self._update_stamp()
+
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    username, data = parse_passwd_line(line)
+
+                    if username is not None:
+                        users[username] = data
+
+        except FileNotFoundError:
+            pass
+
+        self._users = dict(users)
+
+        return users
+
+    def dump(self, users):
+        self._users = dict(users)
+
+        atomic_write(self.path, (format_passwd_line(username, data)
+                                 for username, data in self._users.items()))
+
+        self._update_stamp()
+
+    def set_user(self, username, data):
+        users = dict(self._users)
+        users[username] = data
+
+        self.dump(users)
+
+    def delete_user(self, username):
+        users = dict(self._users)
+        users.pop(username, None)
+
+        self.dump(users)
+
+
+class PasswdLogStore(_FileStore):
+    """
+    Append-only log of user changes.
+
+    Every line is either '+' followed by a passwd line, which creates or
+    replaces a user, or '-' followed by a username, which deletes the user.
+    A change appends exactly one line, so its cost does not depend on the
+    number of users.
+
+    Once the log holds more than compact_factor records per user (and at
+    least compact_min records), it gets compacted by atomically replacing it
+    with a snapshot containing one record per user. A torn last line, left
+    by a crash during an append, gets ignored and is cut off by the next
+    append.
+    """
+
+    def __init__(self, path, compact_factor=2, compact_min=1000, fsync=True):
+        super().__init__(path)
+
+        self.compact_factor = compact_factor
+        self.compact_min = compact_min
+        self.fsync = fsync
+
+        self._users = {}
+        self._records = 0
+
+    def load(self):
+        users = {}
+        records = 0
+        self._update_stamp()
+
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break
+
+                    records += 1
+
+                    if line.startswith('+'):
+                        username, data = parse_passwd_line(line[1:])
+
+                        if username is not None:
+                            users[username] = data
+
+                    elif line.startswith('-'):
+                        users.pop(line[1:-1], None)
+
+        except FileNotFoundError:
+            pass
+
+        self._users = dict(users)
+        self._records = records
+
+        return users
+
+    def dump(self, users):
+        self._users = dict(users)
+        self._records = len(self._users)
+
+        atomic_write(self.path, ('+' + format_passwd_line(username, data)
+                                 for username, data in self._users.items()))
+
+        self._update_stamp()
+
+    def _truncate_torn_line(self, f):
+        end = f.seek(0, os.SEEK_END)
+
+        if not end:
+            return
+
+        f.seek(end - 1)
+
+        if f.read(1) == b'\n':
+            return
+
+        # search backwards for the end of the last complete line
+        while end:
+            start = max(0, end - 4096)
+            f.seek(start)
+            index = f.read(end - start).rfind(b'\n')
+
+            if index >= 0:
+                end = start + index + 1
+
+                break
+
+            end = start
+
+        f.truncate(end)
+
+    def _append(self, line):
+        with open(self.path, 'ab+') as f:
+            self._truncate_torn_line(f)
+            f.write(line.encode())
+
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+        self._records += 1
+
+        if self._records > max(self.compact_min,
+                               self.compact_factor * len(self._users)):
+
+            self.dump(self._users)
+
+        else:
+            self._update_stamp()
+
+    def set_user(self, username, data):
+        self._users[username] = data
+        self._append('+' + format_passwd_line(username, data))
+
+    def delete_user(self, username):
+        self._users.pop(username, None)
+        self._append('-{}\n'.format(username))
+
+
+class PasswdSqliteStore(PasswdStore):
+    """
+    Stores users in a sqlite database; every change is one transaction.
+
+    Changes by other connections are detected using PRAGMA data_version.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                username TEXT PRIMARY KEY,
+                password_hash BLOB NOT NULL,
+                salt BLOB NOT NULL,
+                rounds INTEGER NOT NULL,
+                permissions TEXT NOT NULL
+            )
+        """)
+
+        self._connection.commit()
+        self._data_version = self._get_data_version()
+
+    def _get_data_version(self):
+        return self._connection.execute('PRAGMA data_version').fetchone()[0]
+
+    def load(self):
+        with self._lock:
+            users = {}
+
+            rows = self._connection.execute(
+                'SELECT username, password_hash, salt, rounds, permissions '
+                'FROM users')
+
+            for username, password_hash, salt, rounds, permissions in rows:
+                users[username] = {
+                    'password_hash': bytes(password_hash),
+                    'salt': bytes(salt),
+                    'rounds': rounds,
+                    'permissions': set(permissions.split(',')),
+                }
+
+            self._data_version = self._get_data_version()
+
+            return users
+
+    def _gen_row(self, username, data):
+        return (username, data['password_hash'], data['salt'],
+                data['rounds'], ','.join(data['permissions']))
+
+    def dump(self, users):
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM users')
+
+            self._connection.executemany(
+                'INSERT INTO users VALUES (?, ?, ?, ?, ?)',
+                (self._gen_row(*i) for i in users.items()))
+
+    def set_user(self, username, data):
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?, ?)',
+                self._gen_row(username, data))
+
+    def delete_user(self, username):
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM users WHERE username = ?',
+                                     (username, ))
+
+    def has_changed(self):
+        with self._lock:
+            # data_version only changes on commits of other connections
+            return self._get_data_version() != self._data_version
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
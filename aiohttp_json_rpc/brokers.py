@@ -0,0 +1,394 @@
+import threading
+import asyncio
+import logging
+import json
+import uuid
+
+default_logger = logging.getLogger('aiohttp-json-rpc.brokers')
+
+
+class Broker:
+    """
+    Connects a JsonRpc to other JsonRpc instances, in the same process, in
+    other processes or on other hosts.
+
+    JsonRpc.notify() delivers to its own clients and then publishes through
+    rpc.broker. Brokers deliver notifications of other instances using
+    JsonRpc._deliver(), like local ones, so state and subscriptions work
+    the same. Topics that get added at runtime without decorators get
+    shared too.
+
+    Brokers that use network connections reconnect with exponential
+    backoff, between reconnect_delay and reconnect_max_delay seconds, when
+    they lose them.
+    """
+
+    rpc = None
+    logger = default_logger
+
+    reconnect_delay = 0.1
+    reconnect_max_delay = 10
+
+    async def connect(self, rpc):
+        self.rpc = rpc
+        rpc.broker = self
+
+    async def close(self):
+        if self.rpc is not None and self.rpc.broker is self:
+            self.rpc.broker = None
+
+    async def publish(self, topic, data=None, state=False):
+        raise NotImplementedError
+
+    def publish_topics(self, topics):
+        raise NotImplementedError
+
+    async def _receive_notification(self, topic, data, state):
+        await self.rpc._deliver(topic, data, state=state)
+
+    def _receive_topics(self, topics):
+        # topics that are known already keep their decorators
+        self.rpc._add_topics(*[i for i in topics if i not in self.rpc.topics])
+
+    async def _reconnect(self, open_connection):
+        """
+        Awaits open_connection() until it succeeds and returns its result.
+        """
+
+        attempt = 0
+
+        while True:
+            await asyncio.sleep(min(self.reconnect_max_delay,
+                                    self.reconnect_delay * 2 ** attempt))
+
+            attempt += 1
+
+            try:
+                return await open_connection()
+
+            except Exception as e:
+                self.logger.debug('reconnect failed: %s', e)
+
+
+class InMemoryGroup:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.brokers = []
+        self.state = {}
+        self.topics = set()
+
+
+class InMemoryBroker(Broker):
+    """
+    Connects JsonRpc instances within one process. Brokers created with
+    peer=other_broker share notifications, state and topics with it.
+    Instances may run on different event loops in different threads.
+    """
+
+    def __init__(self, peer=None):
+        self.group = peer.group if peer is not None else InMemoryGroup()
+
+    async def connect(self, rpc):
+        await super().connect(rpc)
+
+        with self.group.lock:
+            self.group.brokers.append(self)
+            state = dict(self.group.state)
+            topics = list(self.group.topics)
+
+        self._receive_topics(topics)
+
+        for topic, data in state.items():
+            await self._receive_notification(topic, data, True)
+
+    async def close(self):
+        with self.group.lock:
+            if self in self.group.brokers:
+                self.group.brokers.remove(self)
+
+        await super().close()
+
+    def _get_peers(self):
+        return [i for i in self.group.brokers if i is not self]
+
+    async def publish(self, topic, data=None, state=False):
+        with self.group.lock:
+            if state:
+                self.group.state[topic] = data
+
+            peers = self._get_peers()
+
+        loop = asyncio.get_event_loop()
+
+        for peer in peers:
+            if peer.rpc.loop is loop:
+                await peer._receive_notification(topic, data, state)
+
+            else:
+                asyncio.run_coroutine_threadsafe(
+                    peer._receive_notification(topic, data, state),
+                    peer.rpc.loop)
+
+    def publish_topics(self, topics):
+        with self.group.lock:
+            self.group.topics.update(topics)
+            peers = self._get_peers()
+
+        for peer in peers:
+            if peer.rpc.loop is self.rpc.loop:
+                peer._receive_topics(topics)
+
+            else:
+                peer.rpc.loop.call_soon_threadsafe(peer._receive_topics,
+                                                   topics)
+
+
+# redis
+class RedisError(Exception):
+    pass
+
+
+def encode_command(*args):
+    data = [b'*' + str(len(args)).encode() + b'\r\n']
+
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+
+        data.append(b'$' + str(len(arg)).encode() + b'\r\n' + arg + b'\r\n')
+
+    return b''.join(data)
+
+
+async def read_reply(reader):
+    line = await reader.readline()
+
+    if not line:
+        raise ConnectionError('connection closed')
+
+    prefix, payload = line[:1], line[1:-2]
+
+    if prefix == b'+':
+        return payload.decode()
+
+    if prefix == b'-':
+        raise RedisError(payload.decode())
+
+    if prefix == b':':
+        return int(payload)
+
+    if prefix == b'$':
+        length = int(payload)
+
+        if length < 0:
+            return None
+
+        return (await reader.readexactly(length + 2))[:-2]
+
+    if prefix == b'*':
+        length = int(payload)
+
+        if length < 0:
+            return None
+
+        return [await read_reply(reader) for _ in range(length)]
+
+    raise RedisError('invalid reply: {!r}'.format(line))
+
+
+class RedisBroker(Broker):
+    """
+    Connects JsonRpc instances using Redis pub/sub. Speaks the Redis
+    protocol (RESP) over asyncio streams, so no Redis client library is
+    needed.
+
+    Notifications get published on the channel prefix + 'notifications'.
+    State and topics get stored in the hash prefix + 'state' and the set
+    prefix + 'topics', so instances that connect later start consistent.
+    Lost connections get reopened in the background; state and topics get
+    read again then, to catch up on what was missed.
+    """
+
+    def __init__(self, host='localhost', port=6379, password=None, db=0,
+                 prefix='aiohttp-json-rpc:', logger=default_logger):
+
+        self.host = host
+        self.port = port
+        self.password = password
+        self.db = db
+        self.logger = logger
+
+        self.channel = prefix + 'notifications'
+        self.state_key = prefix + 'state'
+        self.topics_key = prefix + 'topics'
+
+        # messages of this instance come back over the subscription
+        self.id = uuid.uuid4().hex
+
+        self._connection = None
+        self._subscription = None
+        self._lock = None
+        self._task = None
+
+    async def _open_connection(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+
+        try:
+            if self.password:
+                writer.write(encode_command('AUTH', self.password))
+                await read_reply(reader)
+
+            if self.db:
+                writer.write(encode_command('SELECT', self.db))
+                await read_reply(reader)
+
+        except Exception:
+            writer.close()
+
+            raise
+
+        return reader, writer
+
+    async def execute(self, *args):
+        async with self._lock:
+            if self._connection is None:
+                raise ConnectionError('not connected to redis')
+
+            reader, writer = self._connection
+            writer.write(encode_command(*args))
+
+            try:
+                return await read_reply(reader)
+
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # ends the subscription too, so the reader task reconnects
+                self._close_connections()
+
+                raise ConnectionError('connection to redis lost')
+
+    def _close_connections(self):
+        for connection in (self._connection, self._subscription):
+            if connection is not None:
+                connection[1].close()
+
+        self._connection = None
+        self._subscription = None
+
+    async def _open_connections(self):
+        try:
+            # subscribe before reading state and topics, so nothing gets
+            # lost in between
+            self._subscription = await self._open_connection()
+            reader, writer = self._subscription
+            writer.write(encode_command('SUBSCRIBE', self.channel))
+            await read_reply(reader)
+
+            self._connection = await self._open_connection()
+
+        except Exception:
+            self._close_connections()
+
+            raise
+
+        return reader
+
+    async def _restore(self):
+        topics = await self.execute('SMEMBERS', self.topics_key)
+        self._receive_topics([i.decode() for i in topics])
+
+        state = await self.execute('HGETALL', self.state_key)
+
+        for topic, data in zip(state[::2], state[1::2]):
+            await self._receive_notification(topic.decode(),
+                                             json.loads(data.decode()), True)
+
+    async def _reopen(self):
+        reader = await self._open_connections()
+
+        try:
+            await self._restore()
+
+        except Exception:
+            self._close_connections()
+
+            raise
+
+        return reader
+
+    async def connect(self, rpc):
+        self._lock = asyncio.Lock()
+
+        reader = await self._open_connections()
+        await super().connect(rpc)
+        await self._restore()
+
+        self._task = asyncio.ensure_future(self._run(reader))
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        self._close_connections()
+
+        await super().close()
+
+    async def _publish(self, msg):
+        msg['origin'] = self.id
+
+        await self.execute('PUBLISH', self.channel, json.dumps(msg))
+
+    async def publish(self, topic, data=None, state=False):
+        if state:
+            await self.execute('HSET', self.state_key, topic,
+                               json.dumps(data))
+
+        await self._publish({'topic': topic, 'data': data, 'state': state})
+
+    def publish_topics(self, topics):
+        async def _publish_topics():
+            try:
+                await self.execute('SADD', self.topics_key, *topics)
+                await self._publish({'topics': list(topics)})
+
+            except Exception as e:
+                self.logger.exception(e)
+
+        asyncio.ensure_future(_publish_topics(), loop=self.rpc.loop)
+
+    async def _run(self, reader):
+        while True:
+            await self._read(reader)
+
+            self.logger.error('connection to redis lost')
+            self._close_connections()
+
+            reader = await self._reconnect(self._reopen)
+            self.logger.info('reconnected to redis')
+
+    async def _read(self, reader):
+        while True:
+            try:
+                reply = await read_reply(reader)
+
+            except (ConnectionError, asyncio.IncompleteReadError):
+                return
+
+            if not isinstance(reply, list) or reply[0] != b'message':
+                continue
+
+            try:
+                msg = json.loads(reply[2].decode())
+
+                if msg['origin'] == self.id:
+                    continue
+
+                if 'topics' in msg:
+                    self._receive_topics(msg['topics'])
+
+                else:
+                    await self._receive_notification(
+                        msg['topic'], msg['data'], msg['state'])
+
+            except Exception as e:
+                self.logger.exception(e)
@@ -0,0 +1,68 @@
+from collections import OrderedDict
+import threading
+import time
+
+# reserved topic for JsonRpc.invalidate_cache()
+CACHE_INVALIDATION_TOPIC = 'rpc__cache_invalidation'
+
+
+class LRUCache:
+    """
+    Thread-safe mapping with a size limit and an optional time to live.
+
+    If the cache is full, the least recently used entry gets evicted.
+    """
+
+    def __init__(self, maxsize=128, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+
+            except KeyError:
+                self.misses += 1
+
+                return default
+
+            if expires is not None and expires <= self.clock():
+                del self._data[key]
+                self.misses += 1
+
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl if ttl is not None else self.ttl
+        expires = self.clock() + ttl if ttl is not None else None
+
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, (None, default))[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
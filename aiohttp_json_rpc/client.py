@@ -1,31 +1,69 @@
+from collections import deque
 import aiohttp
 import asyncio
 import logging
+import random
+import json
 
 from yarl import URL
 
+from .resumption import RESUMPTION_TOKEN_HEADER
+from .cache import LRUCache, CACHE_INVALIDATION_TOPIC
+from .topics import is_pattern, matches
+from .timers import get_timer_wheel
 from . import exceptions
 
 from .protocol import (
     JsonRpcMsgTyp,
     encode_request,
     encode_error,
+    encode_batch,
     decode_error,
     encode_result,
-    decode_msg,
+    decode_msgs,
 )
 
 
 default_logger = logging.getLogger('aiohttp-json-rpc.client')
 
+_MISSING = object()
+
 
 class JsonRpcClient:
+    """
+    If reconnect is set, the client reconnects when the connection drops,
+    waiting a random delay of up to reconnect_delay * 2 ** attempt seconds
+    (at most reconnect_max_delay) between attempts. After reconnecting, all
+    subscriptions get restored and calls that were made with
+    idempotent=True and did not get answered yet get sent again. All other
+    pending calls fail with ConnectionError when the connection drops.
+
+    If propagate_timeouts is set, the timeout of every call gets sent to the
+    server, which then skips calls that expired before they got dispatched.
+
+    By default, requests and notifications from the server get handled one
+    after another by the message worker. If max_handlers is set, they get
+    handed over to max_handlers handler tasks instead, so slow handlers
+    don't delay results of pending calls. With ordered_topics set,
+    notifications of the same topic still get handled in order.
+
+    Results of calls to cached_methods get cached, keyed on method and
+    params, for cache_ttl seconds in an LRU cache of cache_size entries. If
+    the server was set up with cache_invalidation=True, cached results get
+    dropped as soon as the server invalidates them.
+    """
+
     _client_id = 0
 
     def __init__(self, logger=default_logger, url=None, cookies=None,
-                 loop=None):
+                 loop=None, reconnect=False, reconnect_delay=0.1,
+                 reconnect_max_delay=10, reconnect_attempts=None,
+                 propagate_timeouts=False, max_handlers=None,
+                 ordered_topics=True, cached_methods=(), cache_size=256,
+                 cache_ttl=60):
 
         self._pending = {}
+        self._replay = {}
         self._msg_id = 0
         self._logger = logger
         self._handler = {}
@@ -33,6 +71,35 @@ class JsonRpcClient:
         self._autoconnect_url = URL(url) if url is not None else url
         self._autoconnect_cookies = cookies
         self._loop = loop or asyncio.get_event_loop()
+        self._resumption_token = None
+
+        self._reconnect = reconnect
+        self._reconnect_delay = reconnect_delay
+        self._reconnect_max_delay = reconnect_max_delay
+        self._reconnect_attempts = reconnect_attempts
+        self._reconnect_task = None
+        self._connect_kwargs = None
+        self._closing = False
+
+        self._propagate_timeouts = propagate_timeouts
+        self._timers = get_timer_wheel(self._loop)
+
+        self._max_handlers = max_handlers
+        self._ordered_topics = ordered_topics
+        self._handler_queue = None
+        self._handler_tasks = []
+        self._topic_queues = {}
+        self._streams = {}
+
+        # subscribed patterns; other topics get looked up by name
+        self._patterns = set()
+
+        self._cached_methods = set(cached_methods)
+        self._cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+        self._cache_version = None
+        self._cache_epoch = 0
+        self._cache_method_epochs = {}
+        self._cache_subscribed = False
 
         self._id = JsonRpcClient._client_id
         JsonRpcClient._client_id += 1
@@ -58,85 +125,329 @@ class JsonRpcClient:
 
             response = encode_result(msg.data['id'], result)
 
-        self._logger.debug('#%s: > %s', self._id, response)
-        await self._ws.send_str(response)
+        await self._send(response)
+
+    def _update_patterns(self, topic):
+        if not is_pattern(topic):
+            return
+
+        if topic in self._handler or topic in self._streams:
+            self._patterns.add(topic)
+
+        else:
+            self._patterns.discard(topic)
+
+    def _get_subscriptions(self, topic):
+        subscriptions = [i for i in self._patterns if matches(i, topic)]
+
+        if topic in self._handler or topic in self._streams:
+            subscriptions.append(topic)
+
+        return subscriptions
+
+    async def _handle_notification(self, msg):
+        subscriptions = self._get_subscriptions(msg.data['method'])
+
+        if not subscriptions:
+            self._logger.debug('#%s: no handler found', self._id)
+
+            return
+
+        # handlers of patterns get the notifications of all matching topics;
+        # the topic is msg.data['method'], streams of patterns get it with
+        # the params
+        topic = msg.data['method']
+
+        for subscription in subscriptions:
+            item = msg.data['params']
+
+            if subscription != topic:
+                item = (topic, item)
+
+            for stream in list(self._streams.get(subscription, ())):
+                await stream._put(item)
+
+            if subscription in self._handler:
+                await self._handler[subscription](msg.data)
+
+        self._logger.debug('#%s: handled', self._id)
+
+    async def _handle_topic_queue(self, topic):
+        queue = self._topic_queues[topic]
+
+        try:
+            await self._handle_notification(queue.popleft())
+
+        finally:
+            # the topic goes back to the end of the handler queue, so one
+            # busy topic does not starve the others
+            if queue:
+                self._handler_queue.put_nowait(
+                    (self._handle_topic_queue, topic))
+
+            else:
+                del self._topic_queues[topic]
+
+    def _start_handlers(self):
+        if not self._max_handlers or self._handler_tasks:
+            return
+
+        self._handler_queue = asyncio.Queue()
+
+        self._handler_tasks = [
+            asyncio.ensure_future(self._run_handlers())
+            for _ in range(self._max_handlers)
+        ]
+
+    def _stop_handlers(self):
+        for task in self._handler_tasks:
+            task.cancel()
+
+        self._handler_tasks = []
+        self._handler_queue = None
+        self._topic_queues = {}
+
+    async def _run_handlers(self):
+        while True:
+            handler, arg = await self._handler_queue.get()
+
+            try:
+                await handler(arg)
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as e:
+                self._logger.error(e, exc_info=True)
+
+    def _dispatch_notification(self, msg):
+        if not self._ordered_topics:
+            self._handler_queue.put_nowait((self._handle_notification, msg))
+
+            return
+
+        topic = msg.data['method']
+
+        # a topic is queued at most once; its notifications wait in order
+        if topic in self._topic_queues:
+            self._topic_queues[topic].append(msg)
+
+        else:
+            self._topic_queues[topic] = deque([msg])
+
+            self._handler_queue.put_nowait(
+                (self._handle_topic_queue, topic))
+
+    async def _handle_msg(self, msg):
+        # batch entries that could not be decoded
+        if isinstance(msg, exceptions.RpcError):
+            self._logger.debug('#%s: invalid batch entry: %s', self._id,
+                               msg)
+
+        # requests
+        elif msg.type == JsonRpcMsgTyp.REQUEST:
+            self._logger.debug('#%s: handled as request', self._id)
+
+            if self._handler_queue is not None:
+                self._handler_queue.put_nowait((self._handle_request, msg))
+
+            else:
+                await self._handle_request(msg)
+                self._logger.debug('#%s: handled', self._id)
+
+        # notifications
+        elif msg.type == JsonRpcMsgTyp.NOTIFICATION:
+            self._logger.debug('#%s: handled as notification', self._id)
+
+            if self._handler_queue is not None:
+                self._dispatch_notification(msg)
+
+            else:
+                await self._handle_notification(msg)
+
+        # results
+        elif msg.type == JsonRpcMsgTyp.RESULT:
+            future = self._pending.get(msg.data['id'], None)
+
+            # the call may have timed out already
+            if future is not None and not future.done():
+                future.set_result(msg.data['result'])
+
+        # errors
+        elif msg.type == JsonRpcMsgTyp.ERROR:
+            future = self._pending.get(msg.data['id'], None)
+
+            if future is not None and not future.done():
+                future.set_exception(decode_error(msg))
 
     async def _handle_msgs(self):
         self._logger.debug('#%s: worker start...', self._id)
+        ws = self._ws
 
-        while not self._ws.closed:
+        while not ws.closed:
             try:
                 self._logger.debug('#%s: waiting for messages', self._id)
-                raw_msg = await self._ws.receive()
+                raw_msg = await ws.receive()
 
                 self._logger.debug('#%s: < %s', self._id, raw_msg.data)
 
                 if raw_msg.type != aiohttp.WSMsgType.text:
                     continue
 
-                msg = decode_msg(raw_msg.data)
+                _, msgs = decode_msgs(raw_msg.data)
 
-                # requests
-                if msg.type == JsonRpcMsgTyp.REQUEST:
-                    self._logger.debug('#%s: handled as request', self._id)
-                    await self._handle_request(msg)
-                    self._logger.debug('#%s: handled', self._id)
+            except asyncio.CancelledError:
+                raise
 
-                # notifications
-                elif msg.type == JsonRpcMsgTyp.NOTIFICATION:
-                    self._logger.debug('#%s: handled as notification', self._id)  # NOQA
+            except Exception as e:
+                self._logger.error(e, exc_info=True)
 
-                    if msg.data['method'] in self._handler:
-                        await self._handler[msg.data['method']](msg.data)
+                continue
 
-                        self._logger.debug('#%s: handled', self._id)
+            for msg in msgs:
+                try:
+                    await self._handle_msg(msg)
 
-                    else:
-                        self._logger.debug('#%s: no handler found', self._id)
+                except asyncio.CancelledError:
+                    raise
 
-                # results
-                elif msg.type == JsonRpcMsgTyp.RESULT:
-                    if msg.data['id'] in self._pending:
-                        self._pending[msg.data['id']].set_result(
-                            msg.data['result'])
+                except Exception as e:
+                    self._logger.error(e, exc_info=True)
 
-                # errors
-                elif msg.type == JsonRpcMsgTyp.ERROR:
-                    if msg.data['id'] in self._pending:
-                        self._pending[msg.data['id']].set_exception(
-                            decode_error(msg)
-                        )
+        self._logger.debug('#%s: worker stopped', self._id)
 
-            except asyncio.CancelledError:
-                raise
+        if not self._closing and getattr(self, '_ws', None) is ws:
+            await self._handle_connection_lost()
 
-            except Exception as e:
-                self._logger.error(e, exc_info=True)
+    def _fail_pending(self, keep_replayable=False):
+        for msg_id, future in list(self._pending.items()):
+            if keep_replayable and msg_id in self._replay:
+                continue
 
-        self._logger.debug('#%s: worker stopped', self._id)
+            if not future.done():
+                future.set_exception(ConnectionError('connection lost'))
+
+    async def _handle_connection_lost(self):
+        self._logger.debug('#%s: connection lost', self._id)
+
+        session = self._session
+        del self._ws
+        del self._session
+
+        # calls that get made from now on have to find the reconnecting
+        # state, so nothing gets awaited before it is set
+        if self._reconnect:
+            self._reconnect_task = asyncio.ensure_future(
+                self._reconnect_loop())
+
+        self._fail_pending(keep_replayable=self._reconnect)
+
+        # without reconnect, invalidations get lost from now on
+        if not self._reconnect and self._cache_subscribed:
+            self._cache_subscribed = False
+            self._handler.pop(CACHE_INVALIDATION_TOPIC, None)
+            self._invalidate_cache()
+
+        await session.close()
+
+    async def _reconnect_loop(self):
+        attempt = 0
+
+        while (self._reconnect_attempts is None or
+               attempt < self._reconnect_attempts):
+
+            # full jitter, so a fleet of clients does not reconnect in sync
+            delay = random.uniform(0, min(
+                self._reconnect_max_delay,
+                self._reconnect_delay * 2 ** attempt))
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+            try:
+                await self._connect(resumption_token=self._resumption_token)
+
+            except (aiohttp.ClientError, OSError) as e:
+                self._logger.debug('#%s: reconnect failed: %s', self._id, e)
+
+                continue
+
+            self._logger.debug('#%s: reconnected', self._id)
+
+            try:
+                topics = set(self._handler) | set(self._streams)
+
+                if topics:
+                    await self._send(encode_request(
+                        'subscribe', id=self._gen_msg_id(),
+                        params=sorted(topics)))
+
+                for msg_id, (msg, idempotent) in list(self._replay.items()):
+                    await self._send(msg)
+
+                    # calls that are not idempotent get sent only once
+                    if not idempotent:
+                        self._replay.pop(msg_id, None)
+
+            except (aiohttp.ClientError, OSError) as e:
+                # the new connection is gone as well; the message worker
+                # starts the next reconnect loop
+                self._logger.debug('#%s: replay failed: %s', self._id, e)
+
+            self._reconnect_task = None
+
+            return
+
+        self._logger.error('#%s: giving up reconnecting', self._id)
+        self._reconnect_task = None
+        self._fail_pending()
+
+    async def connect_url(self, url, cookies=None, ssl=None,
+                          resumption_token=None):
+
+        self._connect_kwargs = {
+            'url': URL(url),
+            'cookies': cookies,
+            'ssl': ssl,
+        }
+
+        self._closing = False
+
+        await self._connect(resumption_token=resumption_token)
+
+    async def _connect(self, resumption_token=None):
+        url = self._connect_kwargs['url']
+        cookies = self._connect_kwargs['cookies']
+        ssl = self._connect_kwargs['ssl']
+        headers = {}
+
+        if resumption_token:
+            headers[RESUMPTION_TOKEN_HEADER] = resumption_token
 
-    async def connect_url(self, url, cookies=None, ssl=None):
-        url = URL(url)
         self._session = aiohttp.ClientSession(cookies=cookies, loop=self._loop)
 
         self._logger.debug('#%s: ws connect...', self._id)
         self._ws = None
         try:
-            self._ws = await self._session.ws_connect(url, ssl=ssl)
+            self._ws = await self._session.ws_connect(url, ssl=ssl,
+                                                      headers=headers)
         finally:
             if self._ws is None:
                 # Ensure session is closed when connection failed
+                del self._ws
                 await self._session.close()
         self._logger.debug('#%s: ws connected', self._id)
 
         self._message_worker = asyncio.ensure_future(self._handle_msgs())
+        self._start_handlers()
 
     async def connect(self, host, port, url='/', protocol='ws', cookies=None,
-                      ssl=None):
+                      ssl=None, resumption_token=None):
         if ssl is not None and protocol == 'ws':
             protocol = 'wss'
         url = URL.build(scheme=protocol, host=host, port=port, path=url)
-        await self.connect_url(url, cookies=cookies, ssl=ssl)
+        await self.connect_url(url, cookies=cookies, ssl=ssl,
+                               resumption_token=resumption_token)
 
     async def auto_connect(self):
         if self._autoconnect_url is None:
@@ -152,35 +463,210 @@ class JsonRpcClient:
             )
 
     async def disconnect(self):
-        await self._ws.close()
-        await self._session.close()
-        del self._ws
-        del self._session
+        self._closing = True
 
-    async def call(self, method, params=None, id=None, timeout=1):
-        await self.auto_connect()
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
 
-        if not id:
-            id = self._msg_id
-            self._msg_id += 1
+        # while reconnecting there may be no connection
+        if hasattr(self, '_ws'):
+            if self._ws is not None:
+                await self._ws.close()
+
+            del self._ws
+
+        if hasattr(self, '_session'):
+            await self._session.close()
+            del self._session
+
+        self._stop_handlers()
+        self._fail_pending()
+
+        for streams in list(self._streams.values()):
+            for stream in streams:
+                stream._end()
+
+        self._streams = {}
+        self._patterns = {i for i in self._handler if is_pattern(i)}
+
+    def _gen_msg_id(self):
+        msg_id = self._msg_id
+        self._msg_id += 1
+
+        return msg_id
+
+    def batch(self, timeout=1):
+        return JsonRpcBatch(self, timeout=timeout)
+
+    async def call_many(self, calls, timeout=1, return_exceptions=False):
+        """
+        Sends multiple calls in one batch message.
+
+        calls is a list of method names or (method, params) tuples.
+        Returns the list of results in the same order.
+        """
+
+        futures = []
+
+        async with self.batch(timeout=timeout) as batch:
+            for call in calls:
+                if isinstance(call, str):
+                    call = (call, )
+
+                futures.append(batch.call(*call))
+
+        results = []
 
-        self._pending[id] = asyncio.Future()
-        msg = encode_request(method, id=id, params=params)
+        for future in futures:
+            if future.exception() is not None:
+                if not return_exceptions:
+                    raise future.exception()
+
+                results.append(future.exception())
+
+            else:
+                results.append(future.result())
+
+        return results
+
+    async def _send(self, msg):
+        ws = getattr(self, '_ws', None)
+
+        if ws is None:
+            raise ConnectionError('not connected')
 
         self._logger.debug('#%s: > %s', self._id, msg)
-        await self._ws.send_str(msg)
+        await ws.send_str(msg)
+
+    def _invalidate_cache(self, methods=None):
+        if methods is None:
+            self._cache_epoch += 1
+            self._cache.clear()
+
+            return
+
+        # entries of older epochs can't be found anymore and age out
+        for method in methods:
+            self._cache_method_epochs[method] = (
+                self._cache_method_epochs.get(method, 0) + 1)
 
-        if timeout:
-            await asyncio.wait_for(self._pending[id], timeout=timeout)
+    async def _handle_cache_invalidation(self, data):
+        params = data['params']
+        version = params['version']
+
+        if version == self._cache_version:
+            return
+
+        # invalidations got lost if versions were skipped
+        if (self._cache_version is not None and
+                version == self._cache_version + 1 and params['methods']):
+
+            self._invalidate_cache(params['methods'])
 
         else:
-            await self._pending[id]
+            self._invalidate_cache()
 
-        result = self._pending[id].result()
-        del self._pending[id]
+        self._cache_version = version
+
+    async def _subscribe_cache_invalidation(self, timeout=None):
+        self._cache_subscribed = True
+
+        try:
+            await self.subscribe(CACHE_INVALIDATION_TOPIC,
+                                 self._handle_cache_invalidation,
+                                 timeout=timeout)
+
+        except Exception:
+            self._cache_subscribed = False
+            self._handler.pop(CACHE_INVALIDATION_TOPIC, None)
+
+            raise
+
+    async def _cached_call(self, method, params, timeout):
+        if not self._cache_subscribed:
+            await self._subscribe_cache_invalidation(timeout=timeout)
+
+        # the key gets fixed before the call, so results that were
+        # invalidated while the call was running get stored under a stale
+        # key
+        key = (
+            self._cache_epoch,
+            self._cache_method_epochs.get(method, 0),
+            method,
+            json.dumps(params, sort_keys=True),
+        )
+
+        # results get stored encoded, so callers that change their result
+        # don't change the cached one
+        encoded_result = self._cache.get(key, _MISSING)
+
+        if encoded_result is not _MISSING:
+            return json.loads(encoded_result)
+
+        result = await self._call(method, params=params, timeout=timeout)
+        self._cache.set(key, json.dumps(result))
 
         return result
 
+    async def call(self, method, params=None, id=None, timeout=1,
+                   idempotent=False):
+
+        """
+        Calls made with idempotent=True get sent again if the connection
+        drops before they got answered and the client reconnects.
+        """
+
+        if method in self._cached_methods and id is None:
+            return await self._cached_call(method, params, timeout)
+
+        return await self._call(method, params=params, id=id,
+                                timeout=timeout, idempotent=idempotent)
+
+    async def _call(self, method, params=None, id=None, timeout=1,
+                    idempotent=False):
+
+        if self._reconnect_task is None:
+            await self.auto_connect()
+
+        if not id:
+            id = self._gen_msg_id()
+
+        future = self._pending[id] = asyncio.Future()
+        timer = None
+
+        msg = encode_request(
+            method, id=id, params=params,
+            timeout=timeout if self._propagate_timeouts else None)
+
+        try:
+            if timeout:
+                timer = self._timers.add(future, timeout)
+
+            if self._reconnect_task is not None:
+                # gets sent once the connection is back
+                self._replay[id] = (msg, idempotent)
+
+            else:
+                if idempotent and self._reconnect:
+                    self._replay[id] = (msg, idempotent)
+
+                try:
+                    await self._send(msg)
+
+                except (aiohttp.ClientError, OSError):
+                    if id not in self._replay:
+                        raise
+
+            return await future
+
+        finally:
+            self._pending.pop(id, None)
+            self._replay.pop(id, None)
+
+            if timer is not None:
+                self._timers.cancel(timer)
+
     async def get_methods(self, timeout=None):
         return await self.call('get_methods', timeout=timeout)
 
@@ -192,15 +678,303 @@ class JsonRpcClient:
 
     async def subscribe(self, topic, handler, timeout=None):
         self._handler[topic] = handler
+        self._update_patterns(topic)
 
         return await self.call('subscribe', params=topic, timeout=timeout)
 
     async def unsubscribe(self, topic, timeout=None):
         if topic in self._handler:
             del self._handler[topic]
+            self._update_patterns(topic)
+
+        # streams of this topic still need the subscription
+        if topic in self._streams:
+            return await self.get_subscriptions(timeout=timeout)
 
         return await self.call('unsubscribe', params=topic, timeout=timeout)
 
+    def stream(self, topic, maxsize=100, overflow='drop_oldest'):
+        """
+        Returns a JsonRpcStream, an async iterator over the params of all
+        notifications of topic. All streams and the handler of a topic
+        share one subscription.
+
+        >>> async with client.stream('topic') as stream:  # doctest: +SKIP
+        ...     async for params in stream:
+        ...         print(params)
+        """
+
+        return JsonRpcStream(self, topic, maxsize=maxsize, overflow=overflow)
+
+    async def _add_stream(self, stream, timeout=None):
+        topic = stream.topic
+        subscribed = topic in self._handler or topic in self._streams
+
+        self._streams.setdefault(topic, []).append(stream)
+        self._update_patterns(topic)
+
+        if not subscribed:
+            try:
+                await self.call('subscribe', params=topic, timeout=timeout)
+
+            except Exception:
+                self._remove_stream(stream)
+
+                raise
+
+    def _remove_stream(self, stream):
+        streams = self._streams.get(stream.topic, [])
+
+        if stream in streams:
+            streams.remove(stream)
+
+        if not streams:
+            self._streams.pop(stream.topic, None)
+            self._update_patterns(stream.topic)
+
+        return (stream.topic not in self._streams and
+                stream.topic not in self._handler)
+
+    async def _close_stream(self, stream, timeout=None):
+        if self._remove_stream(stream) and hasattr(self, '_ws'):
+            await self.call('unsubscribe', params=stream.topic,
+                            timeout=timeout)
+
+    async def get_resumption_token(self, timeout=None):
+        self._resumption_token = await self.call('get_resumption_token',
+                                                 timeout=timeout)
+
+        return self._resumption_token
+
+    async def resume(self, token, timeout=None):
+        return await self.call('resume', params=token, timeout=timeout)
+
+
+class JsonRpcStream:
+    """
+    Async iterator over the params of the notifications of one topic.
+    Streams of patterns yield (topic, params) tuples instead, so the
+    matching topics can be told apart.
+
+    Notifications wait in a queue of up to maxsize entries until they get
+    consumed. If the queue is full, overflow decides what happens:
+
+    'drop_oldest' drops the oldest queued notification,
+    'drop_newest' drops the incoming notification and
+    'block' makes the client wait until there is room again, which holds
+    up the handling of all other messages without max_handlers.
+
+    Dropped notifications get counted in dropped. The stream ends when it
+    gets closed or the client disconnects.
+    """
+
+    OVERFLOW_STRATEGIES = ('drop_oldest', 'drop_newest', 'block')
+
+    _END = object()
+
+    def __init__(self, rpc_client, topic, maxsize=100,
+                 overflow='drop_oldest'):
+
+        if overflow not in self.OVERFLOW_STRATEGIES:
+            raise ValueError('unknown overflow strategy {}'.format(
+                repr(overflow)))
+
+        self._rpc_client = rpc_client
+        self.topic = topic
+        self.overflow = overflow
+        self.dropped = 0
+
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self._blocked_puts = set()
+        self._subscribed = False
+        self._closed = False
+
+    async def subscribe(self, timeout=None):
+        if self._subscribed or self._closed:
+            return
+
+        self._subscribed = True
+
+        try:
+            await self._rpc_client._add_stream(self, timeout=timeout)
+
+        except Exception:
+            self._subscribed = False
+
+            raise
+
+    async def close(self, timeout=None):
+        if self._closed:
+            return
+
+        self._end()
+
+        if self._subscribed:
+            await self._rpc_client._close_stream(self, timeout=timeout)
+
+    def _end(self):
+        self._closed = True
+
+        for put in self._blocked_puts:
+            put.cancel()
+
+        # make room for the end marker; the stream is over anyway
+        if self._queue.full():
+            self._queue.get_nowait()
+
+        self._queue.put_nowait(self._END)
+
+    async def _put(self, params):
+        if self._closed:
+            return
+
+        if not self._queue.full():
+            self._queue.put_nowait(params)
+
+        elif self.overflow == 'drop_oldest':
+            self._queue.get_nowait()
+            self._queue.put_nowait(params)
+            self.dropped += 1
+
+        elif self.overflow == 'drop_newest':
+            self.dropped += 1
+
+        else:
+            put = asyncio.ensure_future(self._queue.put(params))
+            self._blocked_puts.add(put)
+
+            try:
+                await put
+
+            except asyncio.CancelledError:
+                # _end() cancels blocked puts
+                if not self._closed:
+                    raise
+
+            finally:
+                self._blocked_puts.discard(put)
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await self.subscribe()
+
+        params = await self._queue.get()
+
+        if params is self._END:
+            # keep the end marker for further calls
+            self._queue.put_nowait(self._END)
+
+            raise StopAsyncIteration
+
+        return params
+
+    async def __aenter__(self):
+        await self.subscribe()
+
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+        return False
+
+
+class JsonRpcBatch:
+    """JSON-RPC batch of calls, sent as one message.
+
+    Example usage:
+
+    >>> async with client.batch() as batch:  # doctest: +SKIP
+    ...     result1 = batch.call('method1')
+    ...     result2 = batch.call('method2', params={'foo': 'bar'})
+    >>> result1.result()  # doctest: +SKIP
+
+    The batch gets sent when the context is left; then all calls are done.
+    Failed calls carry their exception and calls that did not get answered
+    within timeout carry an asyncio.TimeoutError.
+    """
+
+    def __init__(self, rpc_client, timeout=1):
+        self._rpc_client = rpc_client
+        self._timeout = timeout
+        self._msgs = []
+        self._futures = {}
+
+    def call(self, method, params=None):
+        msg_id = self._rpc_client._gen_msg_id()
+        future = asyncio.Future()
+
+        timeout = None
+
+        if self._rpc_client._propagate_timeouts:
+            timeout = self._timeout
+
+        self._msgs.append(encode_request(method, id=msg_id, params=params,
+                                         timeout=timeout))
+        self._futures[msg_id] = future
+
+        return future
+
+    @property
+    def _replay_id(self):
+        # batches get replayed under the id of their first call
+        return next(iter(self._futures))
+
+    def _cleanup(self):
+        self._rpc_client._replay.pop(self._replay_id, None)
+
+        for msg_id in self._futures.keys():
+            self._rpc_client._pending.pop(msg_id, None)
+
+    async def send(self):
+        client = self._rpc_client
+
+        if not self._msgs:
+            return
+
+        if client._reconnect_task is None:
+            await client.auto_connect()
+
+        client._pending.update(self._futures)
+
+        try:
+            msg = encode_batch(self._msgs)
+
+            if client._reconnect_task is not None:
+                # gets sent once the connection is back
+                client._replay[self._replay_id] = (msg, False)
+
+            else:
+                await client._send(msg)
+
+            await asyncio.wait(list(self._futures.values()),
+                               timeout=self._timeout or None)
+
+        finally:
+            self._cleanup()
+
+        for future in self._futures.values():
+            if not future.done():
+                future.set_exception(asyncio.TimeoutError())
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            await self.send()
+
+        else:
+            for future in self._futures.values():
+                future.cancel()
+
+        return False
+
 
 class JsonRpcMethod:
     """JSON-RPC callable awaitable method representation.
@@ -0,0 +1,300 @@
+import asyncio
+import logging
+import time
+
+import aiohttp
+
+from .client import JsonRpcClient
+
+default_logger = logging.getLogger('aiohttp-json-rpc.client-pool')
+
+CONNECTION_ERRORS = (aiohttp.ClientError, OSError)
+
+
+class PoolMember:
+    def __init__(self, url, client):
+        self.url = url
+        self.client = client
+
+        self.healthy = False
+        self.retry_at = 0
+        self.latency = None
+        self.topics = set()
+
+        self.calls = 0
+        self.errors = 0
+
+    @property
+    def outstanding(self):
+        return len(self.client._pending)
+
+    def update_latency(self, latency, alpha):
+        if self.latency is None:
+            self.latency = latency
+
+        else:
+            self.latency = alpha * latency + (1 - alpha) * self.latency
+
+    def get_stats(self):
+        return {
+            'url': str(self.url),
+            'healthy': self.healthy,
+            'outstanding': self.outstanding if self.healthy else 0,
+            'latency': self.latency,
+            'calls': self.calls,
+            'errors': self.errors,
+        }
+
+
+class JsonRpcClientPool:
+    """
+    Spreads calls over multiple connections to one or more servers.
+
+    The pool holds connections_per_endpoint connections per url. Calls get
+    routed to the healthy connection with the least outstanding requests
+    (strategy='least_outstanding') or with the lowest expected latency,
+    based on an exponentially weighted moving average of past calls
+    (strategy='ewma'). Ties get broken round-robin, so light load gets
+    spread too.
+
+    Connections that fail get marked unhealthy and are reconnected in the
+    background every retry_interval seconds. Subscriptions of failed
+    connections get moved to healthy ones.
+    """
+
+    STRATEGIES = ('least_outstanding', 'ewma')
+
+    def __init__(self, urls, connections_per_endpoint=1,
+                 strategy='least_outstanding', cookies=None,
+                 retry_interval=5, ewma_alpha=0.3, logger=default_logger,
+                 loop=None):
+
+        if strategy not in self.STRATEGIES:
+            raise ValueError('unknown strategy {}'.format(repr(strategy)))
+
+        if isinstance(urls, str):
+            urls = [urls]
+
+        self._loop = loop or asyncio.get_event_loop()
+        self._logger = logger
+        self._strategy = strategy
+        self._cookies = cookies
+        self._retry_interval = retry_interval
+        self._ewma_alpha = ewma_alpha
+
+        self._handler = {}
+        self._reconnecting = set()
+        self._tie_breaker = 0
+
+        self._members = [
+            PoolMember(url, JsonRpcClient(logger=logger, loop=self._loop))
+            for url in urls for _ in range(connections_per_endpoint)
+        ]
+
+    def get_stats(self):
+        return [member.get_stats() for member in self._members]
+
+    # connection handling
+    async def _connect_member(self, member):
+        try:
+            await member.client.connect_url(member.url, cookies=self._cookies)
+
+        except CONNECTION_ERRORS as e:
+            self._logger.debug('connecting to %s failed: %s', member.url, e)
+            member.retry_at = time.monotonic() + self._retry_interval
+
+            return False
+
+        member.healthy = True
+        member.latency = None
+
+        return True
+
+    async def connect(self):
+        results = await asyncio.gather(*[
+            self._connect_member(member) for member in self._members
+        ])
+
+        if not any(results):
+            raise ConnectionError('no endpoint is reachable')
+
+    async def _close_member(self, member):
+        if not hasattr(member.client, '_ws'):
+            return
+
+        try:
+            await member.client.disconnect()
+
+        except Exception as e:
+            self._logger.debug('closing %s failed: %s', member.url, e)
+
+    async def disconnect(self):
+        for member in self._members:
+            member.healthy = False
+            await self._close_member(member)
+
+    async def _reconnect(self, member):
+        self._reconnecting.add(member)
+
+        try:
+            await self._close_member(member)
+
+            if await self._connect_member(member):
+                self._logger.debug('%s is healthy again', member.url)
+
+        finally:
+            self._reconnecting.discard(member)
+
+    def _mark_unhealthy(self, member):
+        if not member.healthy:
+            return
+
+        self._logger.debug('%s is unhealthy', member.url)
+
+        member.healthy = False
+        member.errors += 1
+        member.retry_at = time.monotonic() + self._retry_interval
+
+        # move subscriptions to healthy connections
+        topics = member.topics
+        member.topics = set()
+
+        for topic in topics:
+            asyncio.ensure_future(self._resubscribe(topic), loop=self._loop)
+
+    def _get_healthy_members(self):
+        now = time.monotonic()
+        members = []
+
+        for member in self._members:
+            ws = getattr(member.client, '_ws', None)
+
+            if member.healthy and (ws is None or ws.closed):
+                self._mark_unhealthy(member)
+
+            if member.healthy:
+                members.append(member)
+
+            elif member.retry_at <= now and member not in self._reconnecting:
+                member.retry_at = now + self._retry_interval
+
+                asyncio.ensure_future(self._reconnect(member),
+                                      loop=self._loop)
+
+        return members
+
+    def _select(self):
+        members = self._get_healthy_members()
+
+        if not members:
+            raise ConnectionError('no healthy connection available')
+
+        if self._strategy == 'least_outstanding':
+            def score(member):
+                return member.outstanding
+
+        else:
+            # ewma: unmeasured connections go first, so every connection
+            # gets a latency estimate
+            def score(member):
+                if member.latency is None:
+                    return -1
+
+                return member.latency * (member.outstanding + 1)
+
+        scores = [score(i) for i in members]
+        best_score = min(scores)
+        best = [i for i, s in zip(members, scores) if s == best_score]
+
+        self._tie_breaker += 1
+
+        return best[self._tie_breaker % len(best)]
+
+    # rpc api
+    async def call(self, method, params=None, timeout=1):
+        member = self._select()
+        member.calls += 1
+        start = time.monotonic()
+
+        try:
+            result = await member.client.call(method, params=params,
+                                              timeout=timeout)
+
+        except asyncio.TimeoutError:
+            member.update_latency(time.monotonic() - start, self._ewma_alpha)
+
+            raise
+
+        except CONNECTION_ERRORS:
+            self._mark_unhealthy(member)
+
+            raise
+
+        member.update_latency(time.monotonic() - start, self._ewma_alpha)
+
+        return result
+
+    async def get_methods(self, timeout=None):
+        return await self.call('get_methods', timeout=timeout)
+
+    async def get_topics(self, timeout=None):
+        return await self.call('get_topics', timeout=timeout)
+
+    async def get_subscriptions(self, timeout=None):
+        subscriptions = set()
+
+        for member in self._get_healthy_members():
+            subscriptions.update(
+                await member.client.get_subscriptions(timeout=timeout))
+
+        return sorted(subscriptions)
+
+    async def _subscribe(self, topic, timeout=None):
+        member = self._select()
+
+        try:
+            result = await member.client.subscribe(
+                topic, self._handler[topic], timeout=timeout)
+
+        except CONNECTION_ERRORS:
+            self._mark_unhealthy(member)
+
+            raise
+
+        member.topics.add(topic)
+
+        return result
+
+    async def _resubscribe(self, topic):
+        if topic not in self._handler:
+            return
+
+        try:
+            await self._subscribe(topic)
+
+        except Exception as e:
+            self._logger.error('resubscribing %s failed: %s', topic, e)
+
+    async def subscribe(self, topic, handler, timeout=None):
+        self._handler[topic] = handler
+
+        # one subscription per topic is enough
+        for member in self._get_healthy_members():
+            if topic in member.topics:
+                return await member.client.subscribe(topic, handler,
+                                                     timeout=timeout)
+
+        return await self._subscribe(topic, timeout=timeout)
+
+    async def unsubscribe(self, topic, timeout=None):
+        self._handler.pop(topic, None)
+
+        for member in self._members:
+            if topic in member.topics:
+                member.topics.discard(topic)
+
+                if member.healthy:
+                    return await member.client.unsubscribe(topic,
+                                                           timeout=timeout)
+
+        return []
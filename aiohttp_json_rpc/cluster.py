@@ -0,0 +1,469 @@
+import threading
+import tempfile
+import asyncio
+import logging
+import signal
+import socket
+import shutil
+import json
+import os
+
+from aiohttp.web import Application, AppRunner, TCPSite
+
+from .brokers import Broker, InMemoryBroker
+
+default_logger = logging.getLogger('aiohttp-json-rpc.cluster')
+
+NOTIFY = 'notify'
+TOPICS = 'topics'
+
+
+def encode_hub_msg(msg):
+    return (json.dumps(msg) + '\n').encode()
+
+
+class PubSubHub:
+    """
+    Relays notifications and topics between the worker processes of a
+    cluster over a Unix socket.
+
+    Every message a worker sends gets forwarded to all other workers. The
+    hub keeps the last state of every topic and the names of all topics
+    that were added at runtime, and sends them to workers when they
+    connect.
+    """
+
+    def __init__(self, path, logger=default_logger):
+        self.path = path
+        self.logger = logger
+
+        self.state = {}
+        self.topics = set()
+
+        self._server = None
+        self._writers = set()
+
+    async def start(self, sock=None):
+        if sock is not None:
+            self._server = await asyncio.start_unix_server(
+                self._handle_connection, sock=sock)
+
+        else:
+            self._server = await asyncio.start_unix_server(
+                self._handle_connection, path=self.path)
+
+    async def stop(self):
+        if self._server is None:
+            return
+
+        self._server.close()
+
+        for writer in list(self._writers):
+            writer.close()
+
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _handle_connection(self, reader, writer):
+        if self.topics:
+            writer.write(encode_hub_msg({
+                'type': TOPICS,
+                'topics': sorted(self.topics),
+            }))
+
+        for topic, data in self.state.items():
+            writer.write(encode_hub_msg({
+                'type': NOTIFY,
+                'topic': topic,
+                'data': data,
+                'state': True,
+            }))
+
+        self._writers.add(writer)
+
+        try:
+            while True:
+                line = await reader.readline()
+
+                if not line:
+                    break
+
+                try:
+                    msg = json.loads(line.decode())
+
+                except ValueError:
+                    self.logger.error('invalid message: %r', line)
+
+                    continue
+
+                if msg.get('type') == TOPICS:
+                    self.topics.update(msg['topics'])
+
+                elif msg.get('type') == NOTIFY and msg.get('state'):
+                    self.state[msg['topic']] = msg['data']
+
+                writers = [i for i in self._writers if i is not writer]
+
+                for other in writers:
+                    other.write(line)
+
+                await asyncio.gather(*[i.drain() for i in writers],
+                                     return_exceptions=True)
+
+        except ConnectionError:
+            pass
+
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+class UnixSocketBroker(Broker):
+    """
+    Connects a JsonRpc to a PubSubHub over a Unix socket.
+
+    If the connection to the hub gets lost, it gets reopened in the
+    background; notifications and topics get dropped in the meantime.
+    State and topics get restored by the hub on reconnect.
+    """
+
+    def __init__(self, path, logger=default_logger):
+        self.path = path
+        self.logger = logger
+
+        self._writer = None
+        self._task = None
+
+    async def _open_connection(self):
+        reader, self._writer = await asyncio.open_unix_connection(self.path)
+
+        return reader
+
+    async def connect(self, rpc):
+        reader = await self._open_connection()
+        await super().connect(rpc)
+        self._task = asyncio.ensure_future(self._run(reader))
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+        await super().close()
+
+    def _write(self, msg):
+        if self._writer is None or self._writer.is_closing():
+            self.logger.error('not connected to the hub; %s dropped',
+                              msg['type'])
+
+            return False
+
+        self._writer.write(encode_hub_msg(msg))
+
+        return True
+
+    async def publish(self, topic, data=None, state=False):
+        if self._write({
+                'type': NOTIFY,
+                'topic': topic,
+                'data': data,
+                'state': state}):
+
+            await self._writer.drain()
+
+    def publish_topics(self, topics):
+        self._write({'type': TOPICS, 'topics': list(topics)})
+
+    async def _run(self, reader):
+        while True:
+            try:
+                await self._read(reader)
+
+            except ConnectionError:
+                pass
+
+            self.logger.error('connection to the hub lost')
+
+            self._writer.close()
+            self._writer = None
+
+            reader = await self._reconnect(self._open_connection)
+            self.logger.info('reconnected to the hub')
+
+    async def _read(self, reader):
+        while True:
+            line = await reader.readline()
+
+            if not line:
+                return
+
+            try:
+                msg = json.loads(line.decode())
+
+                if msg['type'] == NOTIFY:
+                    await self._receive_notification(
+                        msg['topic'], msg['data'], msg['state'])
+
+                elif msg['type'] == TOPICS:
+                    self._receive_topics(msg['topics'])
+
+            except Exception as e:
+                self.logger.exception(e)
+
+
+async def _start_server(rpc, host, port, url, routes):
+    app = Application()
+    app.router.add_route('*', url, rpc.handle_request)
+
+    for route in routes:
+        app.router.add_route(*route)
+
+    runner = AppRunner(app)
+    await runner.setup()
+    site = TCPSite(runner, host, port, reuse_port=True)
+    await site.start()
+
+    return runner
+
+
+def _run_worker(setup, host, port, url, routes, socket_path, logger):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    rpc = setup(loop)
+    broker = None
+
+    # setup may have connected rpc to another broker already
+    if rpc.broker is None:
+        broker = UnixSocketBroker(socket_path, logger=logger)
+        loop.run_until_complete(broker.connect(rpc))
+
+    runner = loop.run_until_complete(
+        _start_server(rpc, host, port, url, routes))
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, loop.stop)
+
+    logger.debug('worker %s serves on %s:%s', os.getpid(), host, port)
+
+    try:
+        loop.run_forever()
+
+    finally:
+        loop.run_until_complete(runner.cleanup())
+
+        if broker is not None:
+            loop.run_until_complete(broker.close())
+
+        loop.run_until_complete(rpc.shutdown())
+        loop.close()
+
+
+def run_cluster(setup, host='localhost', port=8080, workers=None,
+                url='/rpc', routes=(), socket_path=None,
+                logger=default_logger):
+    """
+    Runs a JsonRpc server in workers processes, one per CPU core by
+    default, which share host:port using SO_REUSEPORT, so the kernel
+    spreads new connections over them.
+
+    setup(loop) gets called in every worker and has to return the JsonRpc
+    of the worker; its handle_request() gets served at url. Notifications,
+    state and topics that get added at runtime are kept consistent across
+    the workers by a PubSubHub in the parent process, unless setup
+    connected the JsonRpc to a broker already. Topics that get added at
+    runtime using decorators are local to their worker.
+
+    Blocks until the parent receives SIGINT or SIGTERM, or all workers
+    exit. Needs os.fork() and SO_REUSEPORT, so it runs on Linux and BSDs.
+    """
+
+    workers = workers or os.cpu_count() or 1
+    tmp_dir = None
+
+    if socket_path is None:
+        tmp_dir = tempfile.mkdtemp(prefix='aiohttp-json-rpc-')
+        socket_path = os.path.join(tmp_dir, 'hub.sock')
+
+    # the hub socket listens before the workers start, so they can connect
+    # right away
+    hub_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    hub_socket.bind(socket_path)
+    hub_socket.listen(workers)
+
+    pids = set()
+
+    for _ in range(workers):
+        pid = os.fork()
+
+        if pid == 0:
+            hub_socket.close()
+            exit_code = 0
+
+            try:
+                _run_worker(setup, host, port, url, routes, socket_path,
+                            logger)
+
+            except BaseException as e:
+                logger.exception(e)
+                exit_code = 1
+
+            finally:
+                os._exit(exit_code)
+
+        pids.add(pid)
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    hub = PubSubHub(socket_path, logger=logger)
+
+    def reap_workers():
+        for pid in list(pids):
+            try:
+                if os.waitpid(pid, os.WNOHANG)[0]:
+                    logger.error('worker %s exited', pid)
+                    pids.discard(pid)
+
+            except ChildProcessError:
+                pids.discard(pid)
+
+        if not pids:
+            loop.stop()
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, loop.stop)
+
+    loop.add_signal_handler(signal.SIGCHLD, reap_workers)
+
+    try:
+        loop.run_until_complete(hub.start(sock=hub_socket))
+        loop.run_forever()
+
+    finally:
+        loop.remove_signal_handler(signal.SIGCHLD)
+
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+
+            except (ProcessLookupError, ChildProcessError):
+                pass
+
+        loop.run_until_complete(hub.stop())
+        loop.close()
+
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        else:
+            os.unlink(socket_path)
+
+
+def _run_shard(shard, broker, host, port, url, routes, started, logger):
+    loop = shard.loop
+    asyncio.set_event_loop(loop)
+
+    try:
+        loop.run_until_complete(broker.connect(shard))
+        runner = loop.run_until_complete(
+            _start_server(shard, host, port, url, routes))
+
+    except BaseException as e:
+        logger.exception(e)
+        started.set()
+
+        return
+
+    started.set()
+
+    try:
+        loop.run_forever()
+
+    finally:
+        loop.run_until_complete(runner.cleanup())
+        loop.run_until_complete(broker.close())
+        loop.run_until_complete(shard.shutdown())
+        loop.close()
+
+
+def run_sharded(setup, host='localhost', port=8080, shards=None, url='/rpc',
+                routes=(), logger=default_logger):
+    """
+    Runs a JsonRpc server on shards event loops, one per CPU core by
+    default, in as many threads of this process. The loops share host:port
+    using SO_REUSEPORT, so each loop owns a shard of the connections and
+    does their I/O, decoding and dispatch.
+
+    setup(loop) gets called once and has to return the JsonRpc of the
+    first loop; all other loops get shards of it (see
+    JsonRpc.create_shard()), which copy its methods and topics and share
+    its worker threads and bulkheads. The shards get connected using
+    InMemoryBroker, so notify(), state and topics that get added at runtime
+    reach all loops; notify_threadsafe() can be used from other threads.
+
+    Blocks until SIGINT or SIGTERM. Scales best on free-threaded Python;
+    with the GIL, it helps if the I/O of many connections dominates.
+    """
+
+    shards = shards or os.cpu_count() or 1
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    rpc = setup(loop)
+
+    if rpc.broker is not None:
+        raise ValueError('sharded JsonRpc instances can not have a broker')
+
+    broker = InMemoryBroker()
+    loop.run_until_complete(broker.connect(rpc))
+
+    threads = []
+    loops = []
+
+    for index in range(1, shards):
+        shard = rpc.create_shard(asyncio.new_event_loop())
+        started = threading.Event()
+
+        thread = threading.Thread(
+            target=_run_shard,
+            args=(shard, InMemoryBroker(peer=broker), host, port, url,
+                  routes, started, logger),
+            name='aiohttp-json-rpc-shard-{}'.format(index),
+        )
+
+        thread.start()
+        started.wait()
+
+        threads.append(thread)
+        loops.append(shard.loop)
+
+    runner = loop.run_until_complete(
+        _start_server(rpc, host, port, url, routes))
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, loop.stop)
+
+    try:
+        loop.run_forever()
+
+    finally:
+        for shard_loop in loops:
+            try:
+                shard_loop.call_soon_threadsafe(shard_loop.stop)
+
+            except RuntimeError:  # loop closed already
+                pass
+
+        for thread in threads:
+            thread.join()
+
+        loop.run_until_complete(runner.cleanup())
+        loop.run_until_complete(broker.close())
+        loop.run_until_complete(rpc.shutdown())
+        loop.close()
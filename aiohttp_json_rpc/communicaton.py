@@ -1,14 +1,19 @@
 import asyncio
 
 from .protocol import encode_request, encode_notification
+from .timers import get_timer_wheel
 
 
 class JsonRpcRequest:
-    def __init__(self, http_request, rpc, msg):
+    def __init__(self, http_request, rpc, msg, deadline=None):
         self.http_request = http_request
         self.rpc = rpc
         self.msg = msg
 
+        # loop time after which the caller is no longer interested in the
+        # result, if the caller sent a timeout
+        self.deadline = deadline
+
     @property
     def ws(self):
         return getattr(self.http_request, 'ws', None)
@@ -57,23 +62,25 @@ class JsonRpcRequest:
     async def call(self, method, params=None, timeout=None):
         msg_id = self.http_request.msg_id
         self.http_request.msg_id += 1
-        self.http_request.pending[msg_id] = asyncio.Future()
+
+        future = self.http_request.pending[msg_id] = asyncio.Future()
+        timer = None
 
         request = encode_request(method, id=msg_id, params=params)
 
-        await self.http_request.ws.send_str(request)
+        try:
+            if timeout:
+                timer = get_timer_wheel(self.rpc.loop).add(future, timeout)
 
-        if timeout:
-            await asyncio.wait_for(self.http_request.pending[msg_id],
-                                   timeout=timeout)
+            await self.http_request.ws.send_str(request)
 
-        else:
-            await self.http_request.pending[msg_id]
+            return await future
 
-        result = self.http_request.pending[msg_id].result()
-        del self.http_request.pending[msg_id]
+        finally:
+            self.http_request.pending.pop(msg_id, None)
 
-        return result
+            if timer is not None:
+                get_timer_wheel(self.rpc.loop).cancel(timer)
 
     async def confirm(self, message='', timeout=None):
         return await self.call('confirm', params={'message': message},
@@ -84,6 +91,16 @@ class JsonRpcRequest:
 
 
 class SyncJsonRpcRequest(JsonRpcRequest):
+    """
+    call() blocks the worker thread until the client answers. Generator
+    methods get a JsonRpcRequest instead and yield its coroutines, which
+    frees the worker while waiting:
+
+        def delete(request, name):
+            if not (yield request.confirm('delete {}?'.format(name))):
+                return False
+    """
+
     def call(self, method, params=None, wait=True):
         return self.rpc.worker_pool.run_sync(super().call, method,
                                              params, wait=wait)
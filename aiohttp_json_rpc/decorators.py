@@ -10,6 +10,43 @@ def raw_response(function=None):
     return decorator
 
 
+def process(function=None):
+    """
+    Runs a sync method in a worker process of the worker pool, so CPU bound
+    methods are not limited by the GIL. The method, its arguments and its
+    result have to be picklable; the method can't take request or
+    worker_pool.
+    """
+
+    def decorator(function):
+        function.process = True
+
+        return function
+
+    if function:
+        return decorator(function)
+
+    return decorator
+
+
+def bulkhead(name, max_workers=None, max_concurrency=None):
+    """
+    Puts a method into the bulkhead group name, which has its own threads
+    and concurrency limit (see ThreadedWorkerPool.add_bulkhead()).
+    """
+
+    def decorator(function):
+        function.bulkhead = {
+            'name': name,
+            'max_workers': max_workers,
+            'max_concurrency': max_concurrency,
+        }
+
+        return function
+
+    return decorator
+
+
 def validate(**kwargs):
     def decorator(function):
         if not hasattr(function, 'validators'):
@@ -1,60 +1,257 @@
+from collections import deque
 import asyncio
+import time
 
 default_app_config = 'aiohttp_json_rpc.django.apps.AiohttpJsonRpcConfig'
 __already_patched = False
 
+connection_pool = None
 
-def local(original):
-    # we keep the original _connections in scope to keep the thread safety of
-    # Django for non-asyncio code.
 
-    class Storage(object):
-        pass
+class ConnectionPoolExhaustedError(RuntimeError):
+    pass
 
-    class TaskLocal(object):
-        def _get_storage(self):
-            try:
-                task = asyncio.Task.current_task()
 
-                if task is None:
-                    return original
+def _current_task():
+    try:
+        try:
+            return asyncio.current_task()
 
-            except RuntimeError:
-                return original
+        except AttributeError:  # Python < 3.7
+            return asyncio.Task.current_task()
 
-            storage = getattr(task, 'local', None)
+    except RuntimeError:  # no running event loop
+        return None
 
-            if storage is None:
-                storage = Storage()
-                setattr(task, 'local', storage)
 
+class Storage(object):
+    pass
+
+
+class ConnectionPool:
+    """
+    Leases sets of Django database connections to asyncio tasks.
+
+    A task gets its connections on first use and gives them back when it is
+    done. Connections that are still usable get reused by the next task;
+    CONN_MAX_AGE is honored like at the end of a Django request.
+
+    If max_connections is set, no more than max_connections tasks can hold
+    connections at the same time. A task that needs connections while the
+    pool is exhausted has to wait for them using acquire() up front;
+    otherwise ConnectionPoolExhaustedError gets raised on first use.
+    Coroutine methods that use the ORM do that by awaiting
+    acquire_db_connections(); the generic ORM methods of
+    DjangoAuthBackend do it for themselves.
+    """
+
+    TASK_ATTRIBUTE = '_aiohttp_json_rpc_db_connections'
+
+    def __init__(self, max_connections=None):
+        self.max_connections = max_connections
+
+        self._idle = []
+        self._leased = 0
+        self._waiters = deque()
+
+        # metrics
+        self.leases = 0
+        self.waits = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.discarded = 0
+
+    def get_stats(self):
+        return {
+            'max_connections': self.max_connections,
+            'leased': self._leased,
+            'idle': len(self._idle),
+            'waiting': len(self._waiters),
+            'leases': self.leases,
+            'waits': self.waits,
+            'wait_time_total': self.wait_time_total,
+            'wait_time_max': self.wait_time_max,
+            'discarded': self.discarded,
+        }
+
+    def _exhausted(self):
+        return (self.max_connections is not None and
+                self._leased >= self.max_connections)
+
+    def _lease(self, task):
+        storage = self._idle.pop() if self._idle else Storage()
+
+        setattr(task, self.TASK_ATTRIBUTE, storage)
+        task.add_done_callback(self._release)
+
+        self._leased += 1
+        self.leases += 1
+
+        return storage
+
+    def get_storage(self, task, lease=True):
+        storage = getattr(task, self.TASK_ATTRIBUTE, None)
+
+        if storage is not None or not lease:
             return storage
 
+        if self._exhausted():
+            raise ConnectionPoolExhaustedError(
+                'all {} database connections are in use; use '
+                'acquire_db_connections() to wait for one'.format(
+                    self.max_connections))
+
+        return self._lease(task)
+
+    async def acquire(self):
+        task = _current_task()
+
+        if task is None:
+            raise RuntimeError('acquire() has to be called from a task')
+
+        if getattr(task, self.TASK_ATTRIBUTE, None) is not None:
+            return
+
+        if self._exhausted():
+            start = time.monotonic()
+            self.waits += 1
+
+            while self._exhausted():
+                waiter = asyncio.Future()
+                self._waiters.append(waiter)
+
+                try:
+                    await waiter
+
+                except asyncio.CancelledError:
+                    # pass the wakeup on if we got one
+                    if waiter.done() and not waiter.cancelled():
+                        self._wake_up_waiter()
+
+                    raise
+
+            wait_time = time.monotonic() - start
+            self.wait_time_total += wait_time
+            self.wait_time_max = max(self.wait_time_max, wait_time)
+
+        self._lease(task)
+
+    def _wake_up_waiter(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+
+            if not waiter.done():
+                waiter.set_result(None)
+
+                return
+
+    def _release(self, task):
+        storage = getattr(task, self.TASK_ATTRIBUTE)
+        delattr(task, self.TASK_ATTRIBUTE)
+
+        reusable = True
+
+        for connection in list(vars(storage).values()):
+            # a task that ended with an open transaction would leak it into
+            # the next task, so these connections get closed and dropped
+            if connection.in_atomic_block or (
+                    connection.connection is not None and
+                    not connection.autocommit):
+
+                connection.close()
+                reusable = False
+
+            else:
+                connection.close_if_unusable_or_obsolete()
+
+        if reusable:
+            self._idle.append(storage)
+
+        else:
+            self.discarded += 1
+
+        self._leased -= 1
+        self._wake_up_waiter()
+
+
+def local(original, pool):
+    # we keep the original _connections in scope to keep the thread safety of
+    # Django for non-asyncio code.
+
+    class TaskLocal(object):
+        def _get_storage(self, lease=True):
+            task = _current_task()
+
+            if task is None:
+                return original
+
+            return pool.get_storage(task, lease=lease)
+
         def __getattr__(self, key):
-            return getattr(self._get_storage(), key)
+            storage = self._get_storage(lease=False)
+
+            # tasks that did not open connections yet don't need a lease
+            # just to find out that there are none
+            if storage is None:
+                raise AttributeError(key)
+
+            return getattr(storage, key)
 
         def __setattr__(self, key, item):
             return setattr(self._get_storage(), key, item)
 
+        def __delattr__(self, key):
+            storage = self._get_storage(lease=False)
+
+            if storage is None:
+                raise AttributeError(key)
+
+            return delattr(storage, key)
+
     return TaskLocal()
 
 
-def patch_db_connections():
+def patch_db_connections(max_connections=None):
     """
     This wraps django.db.connections._connections with a TaskLocal object.
 
     The Django transactions are only thread-safe, using threading.local,
     and don't know about coroutines.
+
+    The connections of a task get leased from a ConnectionPool and are
+    returned when the task is done. The pool is available as
+    aiohttp_json_rpc.django.connection_pool.
     """
 
     global __already_patched
+    global connection_pool
 
     if not __already_patched:
         from django.db import connections
 
-        connections._connections = local(connections._connections)
+        connection_pool = ConnectionPool(max_connections=max_connections)
+
+        connections._connections = local(connections._connections,
+                                         connection_pool)
+
         __already_patched = True
 
+    return connection_pool
+
+
+async def acquire_db_connections():
+    """
+    Waits until the current task can lease database connections from the
+    pool. The lease ends when the task is done. Coroutine methods that use
+    the ORM should await this first, so they wait for a connection instead
+    of failing if the pool is exhausted.
+    """
+
+    if connection_pool is None:
+        return
+
+    await connection_pool.acquire()
+
 
 def generate_view_permissions():
     from django.contrib.contenttypes.models import ContentType
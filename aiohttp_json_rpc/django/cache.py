@@ -0,0 +1,58 @@
+import threading
+
+from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+
+from ..cache import LRUCache
+
+
+class ModelViewCache:
+    """
+    Result cache for the generic view method of one model.
+
+    The cache gets cleared on every post_save and post_delete of the model,
+    and again when the transaction of the change gets committed, so results
+    that other connections query before the commit don't outlive it.
+    Results of queries that ran while the cache got cleared are not stored,
+    so the cache never serves data that was invalidated.
+
+    Signals can be sent from any thread, so the cache is thread-safe.
+    Note: queryset.update() and bulk_create() don't send model signals and
+    therefore don't clear the cache; call invalidate() after using them.
+    """
+
+    def __init__(self, model, maxsize=256, ttl=60):
+        self.model = model
+        self.generation = 0
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+        dispatch_uid = 'aiohttp_json_rpc.view_cache.{}'.format(id(self))
+
+        post_save.connect(self._handle_change, sender=model,
+                          dispatch_uid=dispatch_uid)
+
+        post_delete.connect(self._handle_change, sender=model,
+                            dispatch_uid=dispatch_uid)
+
+    def _handle_change(self, sender, using=None, **kwargs):
+        self.invalidate()
+
+        # runs right away in autocommit mode
+        transaction.on_commit(self.invalidate, using=using)
+
+    def invalidate(self, *args, **kwargs):
+        with self._lock:
+            self.generation += 1
+            self.cache.clear()
+
+    def get(self, key):
+        with self._lock:
+            return self.cache.get(key)
+
+    def set(self, key, value, generation):
+        with self._lock:
+            if generation != self.generation:
+                return
+
+            self.cache.set(key, value)
@@ -0,0 +1,130 @@
+from operator import attrgetter
+
+_serializers = {}
+
+
+class ModelSerializer:
+    """
+    Turns model instances into JSON serializable dicts.
+
+    All field accessors are computed once per model, so dumping a row does
+    not have to walk model._meta again. The output matches
+    django.forms.models.model_to_dict, except that many-to-many fields are
+    dumped as lists of primary keys.
+    """
+
+    MAX_COMPILED_FIELD_SETS = 64
+
+    def __init__(self, model):
+        opts = model._meta
+
+        self.model = model
+        self.accessors = {}
+        self.concrete_fields = set()
+        self.many_to_many = set()
+
+        for field in opts.concrete_fields:
+            if not getattr(field, 'editable', False):
+                continue
+
+            # foreign keys get dumped as their raw id, which is stored in
+            # field.attname; this never triggers a query, so there is no need
+            # for select_related()
+            self.accessors[field.name] = attrgetter(field.attname)
+            self.concrete_fields.add(field.name)
+
+        for field in opts.private_fields:
+            if not getattr(field, 'editable', False):
+                continue
+
+            self.accessors[field.name] = field.value_from_object
+
+        for field in opts.many_to_many:
+            if not getattr(field, 'editable', False):
+                continue
+
+            self.accessors[field.name] = self._gen_m2m_accessor(field.name)
+            self.many_to_many.add(field.name)
+
+        self.field_names = tuple(self.accessors.keys())
+        self._compiled = {None: tuple(self.accessors.items())}
+
+    @staticmethod
+    def _gen_m2m_accessor(name):
+        def accessor(obj):
+            if obj.pk is None:
+                return []
+
+            # .all() is served from the prefetch cache if the queryset was
+            # prepared using prepare_queryset()
+            return [i.pk for i in getattr(obj, name).all()]
+
+        return accessor
+
+    def _compile(self, fields):
+        if fields is not None:
+            fields = tuple(fields)
+
+        try:
+            return self._compiled[fields]
+
+        except KeyError:
+            pass
+
+        for name in fields:
+            if name not in self.accessors:
+                raise ValueError("unknown field '{}'".format(name))
+
+        compiled = tuple((name, self.accessors[name]) for name in fields)
+
+        if len(self._compiled) < self.MAX_COMPILED_FIELD_SETS:
+            self._compiled[fields] = compiled
+
+        return compiled
+
+    def prepare_queryset(self, queryset, fields=None):
+        if fields is None:
+            m2m_fields = self.many_to_many
+
+        else:
+            self._compile(fields)
+            m2m_fields = self.many_to_many & set(fields)
+
+            queryset = queryset.only(
+                *(self.concrete_fields & set(fields)) or ['pk'])
+
+        if m2m_fields:
+            queryset = queryset.prefetch_related(*m2m_fields)
+
+        return queryset
+
+    def dump(self, obj, fields=None):
+        data = {name: accessor(obj)
+                for name, accessor in self._compile(fields)}
+
+        data['pk'] = obj.pk
+
+        return data
+
+    def dump_many(self, objects, fields=None):
+        compiled = self._compile(fields)
+        data = []
+
+        for obj in objects:
+            d = {name: accessor(obj) for name, accessor in compiled}
+            d['pk'] = obj.pk
+
+            data.append(d)
+
+        return data
+
+
+def get_serializer(model):
+    try:
+        return _serializers[model]
+
+    except KeyError:
+        serializer = ModelSerializer(model)
+        _serializers[model] = serializer
+
+        return serializer
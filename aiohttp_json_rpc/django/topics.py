@@ -0,0 +1,163 @@
+from collections import OrderedDict
+from functools import partial
+import threading
+
+from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+
+from ..auth import permission_required
+
+
+class ChangeSet:
+    """
+    Collects model changes per topic until they get sent.
+
+    Multiple changes of the same object get coalesced into one, so a
+    notification contains every primary key at most once.
+    """
+
+    def __init__(self):
+        self.changes = OrderedDict()
+
+    def add(self, topic, pk, action):
+        changes = self.changes.setdefault(topic, OrderedDict())
+        previous_action = changes.get(pk, None)
+
+        if previous_action == 'created':
+            if action == 'deleted':
+                # the clients never heard of this object
+                changes.pop(pk)
+
+            return
+
+        if previous_action == 'deleted' and action == 'created':
+            action = 'changed'
+
+        changes[pk] = action
+
+    def dump(self):
+        for topic, changes in self.changes.items():
+            if not changes:
+                continue
+
+            data = OrderedDict((
+                ('created', []),
+                ('changed', []),
+                ('deleted', []),
+            ))
+
+            for pk, action in changes.items():
+                data[action].append(pk)
+
+            yield topic, data
+
+
+class ModelTopics:
+    """
+    Maps post_save and post_delete signals of models to JSON-RPC topics.
+
+    Changes get collected once they are committed and sent after
+    flush_interval seconds, as one notification per topic, so a transaction
+    or a burst of saves in autocommit mode results in one notification.
+    Changes of rolled back transactions and savepoints are never sent. The
+    notification data is a dict containing lists of the primary keys of
+    created, changed and deleted objects.
+
+    By default a topic requires the view permission of its model, so only
+    clients that are allowed to see the objects can subscribe. Django
+    creates view permissions since 2.1; on older versions they get created
+    by generate_view_permissions() after migrate, if
+    'aiohttp_json_rpc.django' is in INSTALLED_APPS.
+
+    Note: queryset.update() and bulk_create() don't send model signals and
+    therefore don't trigger notifications.
+    """
+
+    def __init__(self, rpc, flush_interval=0.01):
+        self.rpc = rpc
+        self.flush_interval = flush_interval
+        self.topics = {}
+
+        self._change_set = None
+        self._lock = threading.Lock()
+
+    def register(self, model, topic=None, decorators=None):
+        opts = model._meta
+
+        if not topic:
+            topic = 'db__{}.{}'.format(opts.app_label, opts.model_name)
+
+        if decorators is None:
+            decorators = (
+                permission_required('{}.view_{}'.format(opts.app_label,
+                                                        opts.model_name)),
+            )
+
+        self.topics[model] = topic
+        self.rpc.add_topics((topic, decorators))
+
+        dispatch_uid = 'aiohttp_json_rpc.{}.{}'.format(id(self), topic)
+
+        post_save.connect(self._handle_post_save, sender=model,
+                          dispatch_uid=dispatch_uid)
+
+        post_delete.connect(self._handle_post_delete, sender=model,
+                            dispatch_uid=dispatch_uid)
+
+        return topic
+
+    def unregister(self, model):
+        topic = self.topics.pop(model)
+        dispatch_uid = 'aiohttp_json_rpc.{}.{}'.format(id(self), topic)
+
+        post_save.disconnect(sender=model, dispatch_uid=dispatch_uid)
+        post_delete.disconnect(sender=model, dispatch_uid=dispatch_uid)
+
+        self.rpc.remove_topics(topic)
+
+    # signal handling
+    def _handle_post_save(self, sender, instance, created=False, using=None,
+                          **kwargs):
+
+        self._add_change(sender, instance.pk,
+                         'created' if created else 'changed', using)
+
+    def _handle_post_delete(self, sender, instance, using=None, **kwargs):
+        self._add_change(sender, instance.pk, 'deleted', using)
+
+    def _add_change(self, model, pk, action, using=None):
+        if model not in self.topics:
+            return
+
+        # on_commit() runs the hook right away in autocommit mode, and
+        # drops it if the transaction or savepoint gets rolled back
+        transaction.on_commit(
+            partial(self._add_committed_change, self.topics[model], pk,
+                    action),
+            using=using,
+        )
+
+    def _add_committed_change(self, topic, pk, action):
+        with self._lock:
+            schedule_flush = self._change_set is None
+
+            if schedule_flush:
+                self._change_set = ChangeSet()
+
+            self._change_set.add(topic, pk, action)
+
+        if schedule_flush:
+            self.rpc.loop.call_soon_threadsafe(
+                self.rpc.loop.call_later, self.flush_interval, self.flush)
+
+    def flush(self):
+        with self._lock:
+            change_set = self._change_set
+            self._change_set = None
+
+        if change_set is not None:
+            self._send(change_set)
+
+    def _send(self, change_set):
+        for topic, data in change_set.dump():
+            self.rpc.notify_threadsafe(topic, data)
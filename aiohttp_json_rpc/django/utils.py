@@ -2,8 +2,12 @@ from functools import partial
 
 
 def notify(request, topic, data=None, state=False, wait=False):
-    return request.environ['aiohttp.request'].app['rpc'].worker_pool.run_sync(
-        partial(request.environ['aiohttp.request'].app['rpc'].notify,
-                topic, data, state=state),
+    rpc = request.environ['aiohttp.request'].app['rpc']
+
+    if not wait:
+        return rpc.notify_threadsafe(topic, data, state=state)
+
+    return rpc.worker_pool.run_sync(
+        partial(rpc.notify, topic, data, state=state),
         wait=wait,
     )
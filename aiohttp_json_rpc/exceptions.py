@@ -103,6 +103,11 @@ class RpcParseError(RpcError):
     MESSAGE = 'Invalid JSON was received'
 
 
+class RpcDeadlineExceededError(RpcError):
+    ERROR_CODE = -32001
+    MESSAGE = 'Deadline exceeded'
+
+
 class RpcGenericServerDefinedError(RpcError):
     ERROR_CODE = None
     MESSAGE = 'Generic server defined Error'
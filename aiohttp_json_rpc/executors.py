@@ -0,0 +1,272 @@
+from concurrent.futures import Executor, Future
+from collections import deque
+import threading
+import queue
+import time
+
+
+class AdaptiveThreadPoolExecutor(Executor):
+    """
+    Thread pool that sizes itself between min_workers and max_workers.
+
+    Every interval seconds a controller looks at the time calls waited in
+    the queue, the throughput and the CPU use of the process since the last
+    look, and decides:
+
+    grow: calls waited longer than target_wait on average, so the pool
+    grows by a quarter (at least one thread). It does not grow while the
+    process uses cpu_limit CPU cores or more; since the GIL lets only one
+    thread run Python code at a time, more threads would not help.
+
+    shrink: the last growth did not raise the throughput by min_gain while
+    calls still waited, so it gets reverted, or threads were idle during
+    the whole interval, so they get retired. After reverting a growth,
+    the pool does not grow for cooldown intervals.
+
+    All decisions get counted and the last history decisions are kept,
+    see get_stats(). With interval=None no controller thread runs and
+    adjust() has to be called manually.
+    """
+
+    def __init__(self, min_workers=1, max_workers=32, target_wait=0.01,
+                 interval=1, cpu_limit=0.9, min_gain=0.05, cooldown=3,
+                 history=100, clock=time.monotonic,
+                 cpu_clock=time.process_time):
+
+        if not 0 < min_workers <= max_workers:
+            raise ValueError('0 < min_workers <= max_workers does not hold')
+
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.target_wait = target_wait
+        self.interval = interval
+        self.cpu_limit = cpu_limit
+        self.min_gain = min_gain
+        self.cooldown = cooldown
+        self.clock = clock
+        self.cpu_clock = cpu_clock
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._shutdown = False
+        self._threads = set()
+
+        # counters of the current interval
+        self._started = 0
+        self._wait_time = 0.0
+        self._completed = 0
+        self._busy = 0
+        self._queued = 0
+        self._min_idle = min_workers
+
+        self._last_adjust = clock()
+        self._last_cpu = cpu_clock()
+        self._grown_from = None
+        self._grown_by = 0
+        self._cooldown = 0
+
+        # metrics
+        self.workers = 0
+        self.grows = 0
+        self.shrinks = 0
+        self.holds = 0
+        self.decisions = deque(maxlen=history)
+
+        self._add_workers(min_workers)
+
+        if interval:
+            self._controller = threading.Thread(
+                target=self._run_controller, daemon=True,
+                name='AdaptiveThreadPoolExecutor-controller')
+
+            self._controller.start()
+
+    # workers
+    def _add_workers(self, count):
+        for _ in range(count):
+            thread = threading.Thread(target=self._run_worker, daemon=True)
+            self._threads.add(thread)
+            self.workers += 1
+            thread.start()
+
+    def _remove_workers(self, count):
+        for _ in range(count):
+            self.workers -= 1
+            self._queue.put(None)
+
+    def _run_worker(self):
+        while True:
+            item = self._queue.get()
+
+            if item is None:
+                break
+
+            future, fn, args, kwargs, submitted = item
+
+            with self._lock:
+                self._queued -= 1
+
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            with self._lock:
+                self._started += 1
+                self._wait_time += self.clock() - submitted
+                self._busy += 1
+                self._min_idle = min(self._min_idle, self.workers - self._busy)
+
+            try:
+                result = fn(*args, **kwargs)
+
+            except BaseException as e:
+                future.set_exception(e)
+
+            else:
+                future.set_result(result)
+
+            finally:
+                with self._lock:
+                    self._busy -= 1
+                    self._completed += 1
+
+            del future, fn, args, kwargs, item
+
+        with self._lock:
+            self._threads.discard(threading.current_thread())
+
+    def submit(self, fn, *args, **kwargs):
+        if self._shutdown:
+            raise RuntimeError('cannot schedule new futures after shutdown')
+
+        future = Future()
+
+        with self._lock:
+            self._queued += 1
+
+        self._queue.put((future, fn, args, kwargs, self.clock()))
+
+        return future
+
+    def shutdown(self, wait=True, **kwargs):
+        with self._lock:
+            self._shutdown = True
+            threads = list(self._threads)
+
+            self._remove_workers(self.workers)
+
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    # controller
+    def _run_controller(self):
+        while not self._shutdown:
+            time.sleep(self.interval)
+
+            if not self._shutdown:
+                self.adjust()
+
+    def _decide(self, action, count, reason, wait_time, throughput, cpu):
+        if action == 'grow':
+            self.grows += 1
+            self._add_workers(count)
+
+        elif action == 'shrink':
+            self.shrinks += 1
+            self._remove_workers(count)
+
+        else:
+            self.holds += 1
+
+        self.decisions.append({
+            'time': self.clock(),
+            'action': action,
+            'reason': reason,
+            'workers': self.workers,
+            'wait_time': wait_time,
+            'throughput': throughput,
+            'cpu': cpu,
+        })
+
+        return action
+
+    def adjust(self):
+        """Runs one controller step and returns the decision."""
+
+        with self._lock:
+            if self._shutdown:
+                return 'hold'
+
+            now = self.clock()
+            cpu_now = self.cpu_clock()
+            elapsed = max(now - self._last_adjust, 1e-9)
+
+            wait_time = (self._wait_time / self._started
+                         if self._started else 0.0)
+
+            throughput = self._completed / elapsed
+            cpu = (cpu_now - self._last_cpu) / elapsed
+            min_idle = self._min_idle
+            waiting = wait_time > self.target_wait or self._queued > 0
+
+            self._started = 0
+            self._wait_time = 0.0
+            self._completed = 0
+            self._min_idle = self.workers - self._busy
+            self._last_adjust = now
+            self._last_cpu = cpu_now
+
+            grown_from, self._grown_from = self._grown_from, None
+            metrics = (wait_time, throughput, cpu)
+
+            # revert growths that did not help
+            if (grown_from is not None and waiting and
+                    throughput <= grown_from * (1 + self.min_gain) and
+                    self.workers > self.min_workers):
+
+                self._cooldown = self.cooldown
+                count = min(self._grown_by, self.workers - self.min_workers)
+
+                return self._decide('shrink', count, 'no throughput gain',
+                                    *metrics)
+
+            if waiting:
+                if self.workers >= self.max_workers:
+                    return self._decide('hold', 0, 'max_workers', *metrics)
+
+                if cpu >= self.cpu_limit:
+                    return self._decide('hold', 0, 'cpu', *metrics)
+
+                if self._cooldown:
+                    self._cooldown -= 1
+
+                    return self._decide('hold', 0, 'cooldown', *metrics)
+
+                count = min(max(1, self.workers // 4),
+                            self.max_workers - self.workers)
+
+                self._grown_from = throughput
+                self._grown_by = count
+
+                return self._decide('grow', count, 'wait time', *metrics)
+
+            if min_idle > 0 and self.workers > self.min_workers:
+                count = min(min_idle, self.workers - self.min_workers)
+
+                return self._decide('shrink', count, 'idle', *metrics)
+
+            return self._decide('hold', 0, '', *metrics)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'min_workers': self.min_workers,
+                'max_workers': self.max_workers,
+                'busy': self._busy,
+                'queued': self._queued,
+                'grows': self.grows,
+                'shrinks': self.shrinks,
+                'holds': self.holds,
+                'decisions': list(self.decisions),
+            }
@@ -0,0 +1,158 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import logging
+import time
+
+default_logger = logging.getLogger('aiohttp-json-rpc.monitoring')
+
+
+class BlockingMonitor:
+    """
+    Finds sync methods that block the event loop.
+
+    With max_workers=0 sync methods run inline on the event loop. The
+    monitor times every inline call; calls that take threshold seconds or
+    more count as blocking. A lag monitor task additionally measures how
+    late the loop wakes it up every interval seconds and attributes lags
+    of threshold seconds or more to the method that blocked longest since
+    the last wakeup, or to no method, if coroutines were blocking.
+
+    If offload_after is set, methods that blocked offload_after times run
+    in a pool of offload_workers threads from then on.
+
+    get_report() returns the methods sorted by blocking time.
+    """
+
+    def __init__(self, threshold=0.05, interval=0.1, offload_after=None,
+                 offload_workers=4, logger=default_logger):
+
+        self.threshold = threshold
+        self.interval = interval
+        self.offload_after = offload_after
+        self.offload_workers = offload_workers
+        self.logger = logger
+
+        self.stats = {}
+        self.loop_lags = 0
+        self.loop_lag_max = 0.0
+        self.unattributed_loop_lags = 0
+
+        self._executor = None
+        self._task = None
+        self._slowest = None
+
+    def _get_stats(self, method):
+        if method not in self.stats:
+            self.stats[method] = {
+                'name': getattr(method, '__qualname__', repr(method)),
+                'calls': 0,
+                'blocking_calls': 0,
+                'blocking_time': 0.0,
+                'max_time': 0.0,
+                'loop_lags': 0,
+                'offloaded': False,
+            }
+
+        return self.stats[method]
+
+    def _record(self, method, duration):
+        stats = self._get_stats(method)
+        stats['calls'] += 1
+        stats['max_time'] = max(stats['max_time'], duration)
+
+        if self._slowest is None or duration > self._slowest[1]:
+            self._slowest = (method, duration)
+
+        if duration < self.threshold:
+            return
+
+        stats['blocking_calls'] += 1
+        stats['blocking_time'] += duration
+
+        if stats['blocking_calls'] == 1:
+            self.logger.warning('%s blocked the event loop for %.3fs',
+                                stats['name'], duration)
+
+        if (self.offload_after and not stats['offloaded'] and
+                stats['blocking_calls'] >= self.offload_after):
+
+            self.logger.warning('%s blocked the event loop %s times; it '
+                                'runs in a thread from now on',
+                                stats['name'], stats['blocking_calls'])
+
+            stats['offloaded'] = True
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.offload_workers)
+
+        return self._executor
+
+    async def run(self, func):
+        method = getattr(func, 'func', func)
+
+        if self.stats.get(method, {}).get('offloaded', False):
+            loop = asyncio.get_event_loop()
+            self.stats[method]['calls'] += 1
+
+            return await loop.run_in_executor(self._get_executor(), func)
+
+        start = time.monotonic()
+
+        try:
+            return func()
+
+        finally:
+            self._record(method, time.monotonic() - start)
+
+    # loop lag
+    async def _watch_loop(self):
+        loop = asyncio.get_event_loop()
+
+        while True:
+            self._slowest = None
+            start = loop.time()
+
+            await asyncio.sleep(self.interval)
+
+            lag = loop.time() - start - self.interval
+
+            if lag < self.threshold:
+                continue
+
+            self.loop_lags += 1
+            self.loop_lag_max = max(self.loop_lag_max, lag)
+
+            if self._slowest is not None and (
+                    self._slowest[1] >= self.threshold):
+
+                self._get_stats(self._slowest[0])['loop_lags'] += 1
+
+            else:
+                self.unattributed_loop_lags += 1
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._watch_loop())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def get_report(self):
+        return {
+            'loop_lags': self.loop_lags,
+            'loop_lag_max': self.loop_lag_max,
+            'unattributed_loop_lags': self.unattributed_loop_lags,
+            'methods': sorted(
+                [dict(i) for i in self.stats.values()],
+                key=lambda i: i['blocking_time'],
+                reverse=True,
+            ),
+        }
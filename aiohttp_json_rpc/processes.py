@@ -0,0 +1,109 @@
+from concurrent.futures import ProcessPoolExecutor
+import pickle
+
+try:
+    from multiprocessing import shared_memory
+
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+VALUE = 'value'
+PICKLED = 'pickled'
+SHARED_MEMORY = 'shared_memory'
+
+
+def dump(obj, threshold=None):
+    """
+    Returns a reference to obj that can be sent to another process.
+
+    If threshold is set and shared memory is available, objects that pickle
+    to threshold bytes or more get copied to a shared memory block, so only
+    the name of the block has to go through the executor pipe. Smaller
+    objects get passed on pickled already, so they don't get pickled twice.
+    The receiving side has to release the block using release().
+    """
+
+    if threshold is None or shared_memory is None:
+        return (VALUE, obj)
+
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+
+    if len(data) < threshold:
+        return (PICKLED, data)
+
+    block = shared_memory.SharedMemory(create=True, size=len(data))
+
+    try:
+        block.buf[:len(data)] = data
+
+    finally:
+        block.close()
+
+    return (SHARED_MEMORY, block.name, len(data))
+
+
+def load(ref):
+    if ref[0] == VALUE:
+        return ref[1]
+
+    if ref[0] == PICKLED:
+        return pickle.loads(ref[1])
+
+    block = shared_memory.SharedMemory(name=ref[1])
+
+    try:
+        return pickle.loads(bytes(block.buf[:ref[2]]))
+
+    finally:
+        block.close()
+
+
+def release(ref):
+    if ref[0] != SHARED_MEMORY:
+        return
+
+    try:
+        block = shared_memory.SharedMemory(name=ref[1])
+
+    except FileNotFoundError:
+        return
+
+    block.close()
+    block.unlink()
+
+
+def release_call(kwargs_ref, future):
+    """
+    Done callback for the executor future of a call nobody waits for
+    anymore; releases its arguments and its result.
+    """
+
+    release(kwargs_ref)
+
+    if not future.cancelled() and future.exception() is None:
+        release(future.result())
+
+
+def call(func, kwargs_ref, threshold):
+    # runs in the worker process
+    result = func(**load(kwargs_ref))
+
+    return dump(result, threshold)
+
+
+def _warm_up():
+    pass
+
+
+def create_process_pool(max_processes):
+    """
+    Creates a ProcessPoolExecutor and starts all of its worker processes
+    right away, so the first calls don't pay for starting them.
+    """
+
+    executor = ProcessPoolExecutor(max_workers=max_processes)
+
+    for future in [executor.submit(_warm_up) for _ in range(max_processes)]:
+        future.result()
+
+    return executor
@@ -65,6 +65,46 @@ def decode_msg(raw_msg):
     except ValueError:
         raise RpcParseError
 
+    return _decode_msg_data(msg_data)
+
+
+def decode_msgs(raw_msg):
+    """
+    Decodes single jsonrpc 2.0 messages and batches.
+
+    Returns a tuple (is_batch, msgs). msgs is a list of JsonRpcMsg objects
+    and, for batch entries that could not be decoded, RpcError objects.
+    Errors that concern the whole message get raised.
+    """
+
+    try:
+        msg_data = json.loads(raw_msg)
+
+    except ValueError:
+        raise RpcParseError
+
+    if type(msg_data) is not list:
+        return False, [_decode_msg_data(msg_data)]
+
+    if not msg_data:
+        raise RpcInvalidRequestError
+
+    msgs = []
+
+    for i in msg_data:
+        try:
+            msgs.append(_decode_msg_data(i))
+
+        except RpcError as error:
+            msgs.append(error)
+
+    return True, msgs
+
+
+def _decode_msg_data(msg_data):
+    if type(msg_data) is not dict:
+        raise RpcInvalidRequestError
+
     # check jsonrpc version
     if 'jsonrpc' not in msg_data or not msg_data['jsonrpc'] == JSONRPC:
         raise RpcInvalidRequestError(msg_id=msg_data.get('id', None))
@@ -131,7 +171,26 @@ def decode_msg(raw_msg):
     return JsonRpcMsg(msg_type, msg_data)
 
 
-def encode_request(method, id=None, params=None):
+def get_msg_timeout(msg):
+    """
+    Returns the timeout of a request message or None if it has no valid
+    timeout.
+    """
+
+    timeout = msg.data.get('timeout', None)
+
+    if type(timeout) not in (int, float) or timeout < 0:
+        return None
+
+    return timeout
+
+
+def encode_request(method, id=None, params=None, timeout=None):
+    """
+    timeout is an extension to jsonrpc 2.0: the number of seconds after
+    which the caller is no longer interested in the result.
+    """
+
     if type(method) is not str:
         raise ValueError('method has to be a string')
 
@@ -146,6 +205,9 @@ def encode_request(method, id=None, params=None):
     if params is not None:
         msg['params'] = params
 
+    if timeout is not None:
+        msg['timeout'] = timeout
+
     return json.dumps(msg)
 
 
@@ -187,6 +249,14 @@ def encode_error(error, id=None):
     return json.dumps(msg)
 
 
+def encode_batch(msgs):
+    """
+    Combines already encoded messages into one batch message.
+    """
+
+    return '[{}]'.format(','.join(msgs))
+
+
 def decode_error(msg: JsonRpcMsg):
     error_code = msg.data['error']['code']
 
@@ -86,6 +86,7 @@ def gen_rpc_context(loop, host, port, rpc, rpc_route, routes=(),
 
     # teardown server
     loop.run_until_complete(runner.cleanup())
+    loop.run_until_complete(rpc.shutdown())
 
 
 @pytest.yield_fixture
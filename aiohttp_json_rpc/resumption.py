@@ -0,0 +1,66 @@
+import binascii
+import hashlib
+import base64
+import hmac
+import json
+import time
+
+RESUMPTION_TOKEN_HEADER = 'X-JSON-RPC-Resumption-Token'
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _b64decode(string):
+    string = string.encode()
+
+    return base64.urlsafe_b64decode(string + b'=' * (-len(string) % 4))
+
+
+class ResumptionTokenSigner:
+    """
+    Signs and verifies session resumption tokens.
+
+    A token contains a JSON payload, an expiry timestamp and a HMAC-SHA256
+    signature. Tokens are opaque to clients, but not encrypted, so they
+    must not contain secrets. Every server that shares the secret accepts
+    the tokens of the others, which makes them survive restarts.
+    """
+
+    def __init__(self, secret, max_age=600):
+        if isinstance(secret, str):
+            secret = secret.encode()
+
+        self.secret = secret
+        self.max_age = max_age
+
+    def _sign(self, data):
+        return hmac.new(self.secret, data, hashlib.sha256).digest()
+
+    def dumps(self, payload):
+        data = json.dumps({
+            'payload': payload,
+            'expires': int(time.time() + self.max_age),
+        }).encode()
+
+        return '{}.{}'.format(_b64encode(data), _b64encode(self._sign(data)))
+
+    def loads(self, token):
+        try:
+            data, signature = token.split('.')
+            data = _b64decode(data)
+            signature = _b64decode(signature)
+
+        except (ValueError, AttributeError, binascii.Error):
+            raise ValueError('malformed token')
+
+        if not hmac.compare_digest(signature, self._sign(data)):
+            raise ValueError('invalid signature')
+
+        data = json.loads(data.decode())
+
+        if data['expires'] < time.time():
+            raise ValueError('token expired')
+
+        return data['payload']
@@ -1,3 +1,4 @@
+from functools import partial
 from copy import copy
 import asyncio
 import aiohttp
@@ -7,7 +8,17 @@ import inspect
 import types
 
 from .communicaton import JsonRpcRequest, SyncJsonRpcRequest
-from .threading import ThreadedWorkerPool
+from .threading import ThreadedWorkerPool, NotificationBridge
+from .resumption import ResumptionTokenSigner, RESUMPTION_TOKEN_HEADER
+from .cache import CACHE_INVALIDATION_TOPIC
+from .topics import (
+    filter_subscriptions,
+    is_topic_allowed,
+    is_valid_pattern,
+    is_pattern,
+    TopicTrie,
+)
+
 from .auth import DummyAuthBackend
 
 from .protocol import (
@@ -15,11 +26,14 @@ from .protocol import (
     JsonRpcMsgTyp,
     encode_result,
     encode_error,
-    decode_msg,
+    encode_batch,
+    decode_msgs,
+    get_msg_timeout,
 )
 
 from .exceptions import (
     RpcGenericServerDefinedError,
+    RpcDeadlineExceededError,
     RpcInvalidRequestError,
     RpcMethodNotFoundError,
     RpcInvalidParamsError,
@@ -33,6 +47,8 @@ class JsonRpcMethod:
 
     def __init__(self, method):
         self.method = method
+        self.process = getattr(method, 'process', False)
+        self.generator = inspect.isgeneratorfunction(method)
 
         # method introspection
         try:
@@ -48,6 +64,14 @@ class JsonRpcMethod:
         self.args = [i for i in self.argspec.args
                      if i not in self.CREDENTIAL_KEYS + ['self']]
 
+        if self.process and (
+                asyncio.iscoroutinefunction(method) or self.generator or
+                set(self.CREDENTIAL_KEYS) & set(self.argspec.args)):
+
+            raise ValueError(
+                '{} can not run in a process: only sync methods without '
+                'yield, request and worker_pool can'.format(method.__name__))
+
         # required args
         self.required_args = copy(self.args)
 
@@ -87,7 +111,7 @@ class JsonRpcMethod:
     def __repr__(self):
         return self._repr_str
 
-    async def __call__(self, http_request, rpc, msg):
+    async def __call__(self, http_request, rpc, msg, deadline=None):
         params = msg.data['params']
         method_params = dict()
 
@@ -130,37 +154,79 @@ class JsonRpcMethod:
 
         # credentials
         if 'request' in self.argspec.args:
-            if asyncio.iscoroutinefunction(self.method):
+            # generator methods yield the coroutines of JsonRpcRequest
+            if asyncio.iscoroutinefunction(self.method) or self.generator:
                 method_params['request'] = JsonRpcRequest(
-                    rpc=rpc, http_request=http_request, msg=msg)
+                    rpc=rpc, http_request=http_request, msg=msg,
+                    deadline=deadline)
 
             else:
                 method_params['request'] = SyncJsonRpcRequest(
-                    rpc=rpc, http_request=http_request, msg=msg)
+                    rpc=rpc, http_request=http_request, msg=msg,
+                    deadline=deadline)
 
         if 'worker_pool' in self.argspec.args:
             method_params['worker_pool'] = rpc.worker_pool
 
         # run method
+        bulkhead = rpc.worker_pool.get_bulkhead(self.method)
+
+        if bulkhead is not None:
+            return await bulkhead.run(partial(
+                self._run, rpc, method_params, deadline,
+                executor=bulkhead.executor))
+
+        return await self._run(rpc, method_params, deadline)
+
+    async def _run(self, rpc, method_params, deadline, executor=None):
         if asyncio.iscoroutinefunction(self.method):
             return await self.method(**method_params)
 
+        elif self.process:
+            return await rpc.worker_pool.run_in_process(
+                deadline, self.method, **method_params)
+
+        elif self.generator:
+            return await rpc.worker_pool.run_generator(
+                executor, deadline, self.method, **method_params)
+
+        elif executor is not None:
+            return await rpc.worker_pool.run_in_executor(
+                executor, deadline, self.method, **method_params)
+
         else:
-            return await rpc.worker_pool.run(self.method, **method_params)
+            return await rpc.worker_pool.run_before(deadline, self.method,
+                                                    **method_params)
 
 
 class JsonRpc(object):
     def __init__(self, loop=None, max_workers=0, auth_backend=None,
-                 logger=None):
+                 logger=None, resumption_secret=None,
+                 resumption_token_max_age=600, cache_invalidation=False,
+                 max_processes=0, shared_memory_threshold=None,
+                 blocking_monitor=None, adaptive_workers=False,
+                 min_workers=1):
 
         self.clients = []
         self.methods = {}
         self.topics = {}
         self.state = {}
+        self.subscription_index = TopicTrie()
         self.logger = logger or logging.getLogger('aiohttp-json-rpc.server')
         self.auth_backend = auth_backend or DummyAuthBackend()
         self.loop = loop or asyncio.get_event_loop()
-        self.worker_pool = ThreadedWorkerPool(max_workers=max_workers)
+        self.worker_pool = ThreadedWorkerPool(
+            max_workers=max_workers,
+            max_processes=max_processes,
+            shared_memory_threshold=shared_memory_threshold,
+            blocking_monitor=blocking_monitor,
+            adaptive=adaptive_workers,
+            min_workers=min_workers,
+        )
+        self.notification_bridge = NotificationBridge(self)
+
+        # set by Broker.connect()
+        self.broker = None
 
         self.add_methods(
             ('', self.get_methods),
@@ -170,6 +236,68 @@ class JsonRpc(object):
             ('', self.unsubscribe),
         )
 
+        # session resumption
+        self.resumption_token_signer = None
+
+        if resumption_secret:
+            self.resumption_token_signer = ResumptionTokenSigner(
+                resumption_secret, max_age=resumption_token_max_age)
+
+            self.add_methods(
+                ('', self.get_resumption_token),
+                ('', self.resume),
+            )
+
+        # client cache invalidation
+        self.cache_version = 0
+
+        if cache_invalidation:
+            self.add_topics(CACHE_INVALIDATION_TOPIC)
+
+            self.state[CACHE_INVALIDATION_TOPIC] = {
+                'version': self.cache_version,
+                'methods': None,
+            }
+
+    def create_shard(self, loop):
+        """
+        Returns a JsonRpc for another event loop, which shares the auth
+        backend and worker threads with this one, but has its own clients
+        and its own copies of methods, topics and state, so no loop reads
+        dicts another loop writes. Connect the shards using InMemoryBroker
+        peers to keep state and topics that get added at runtime in sync
+        and to let notifications reach the clients of all shards (see
+        cluster.run_sharded()). Methods have to be added before the shard
+        gets created.
+        """
+
+        shard = copy(self)
+        shard.loop = loop
+        shard.clients = []
+        shard.methods = dict(self.methods)
+        shard.topics = dict(self.topics)
+        shard.state = dict(self.state)
+        shard.subscription_index = TopicTrie()
+        shard.broker = None
+        shard.worker_pool = self.worker_pool.for_loop(loop)
+        shard.notification_bridge = NotificationBridge(shard)
+
+        return shard
+
+    async def shutdown(self, app=None):
+        """
+        Stops the auth backend and the worker threads and processes. Can be
+        used as cleanup handler of the aiohttp application:
+        app.on_cleanup.append(rpc.shutdown)
+        """
+
+        # shards share both with the JsonRpc they were created from
+        if self.worker_pool.parent is None and hasattr(self.auth_backend,
+                                                       'shutdown'):
+            self.auth_backend.shutdown()
+
+        self.worker_pool.shutdown()
+
     def _add_method(self, method, name='', prefix=''):
         if not callable(method):
             return
@@ -221,6 +349,33 @@ class JsonRpc(object):
                 self._add_methods_from_object(method, prefix=prefix_)
 
     def add_topics(self, *topics):
+        self._add_topics(*topics)
+
+        # topics with decorators can't be shared with other processes
+        if self.broker is not None:
+            names = [i for i in topics if isinstance(i, str)]
+
+            if names:
+                self.broker.publish_topics(names)
+
+    def remove_topics(self, *names):
+        """
+        Removes the topics names. Connected clients lose their
+        subscriptions of them; their state gets dropped.
+        """
+
+        for name in names:
+            self.topics.pop(name, None)
+            self.state.pop(name, None)
+
+        for client in self.clients:
+            client.topics.difference_update(names)
+
+            if client.subscriptions & set(names):
+                client.subscriptions.difference_update(names)
+                self._index_subscriptions(client)
+
+    def _add_topics(self, *topics):
         for topic in topics:
             if type(topic) not in (str, tuple):
                 raise ValueError('Topic has to be string or tuple')
@@ -250,13 +405,45 @@ class JsonRpc(object):
     def __call__(self, request):
         return self.handle_request(request)
 
+    async def _resume_request(self, request, token):
+        try:
+            payload = self.resumption_token_signer.loads(token)
+
+        except ValueError as e:
+            self.logger.debug('invalid resumption token: %s', e)
+
+            return False
+
+        coroutine = self.auth_backend.resume_request(request,
+                                                     payload['identity'])
+
+        if asyncio.iscoroutine(coroutine):
+            await coroutine
+
+        request.subscriptions = filter_subscriptions(
+            request.topics, payload['subscriptions'])
+
+        self._index_subscriptions(request)
+
+        return True
+
     async def handle_request(self, request):
+        if self.worker_pool.blocking_monitor:
+            self.worker_pool.blocking_monitor.start()
+
         # prepare request
         request.rpc = self
-        coroutine = self.auth_backend.prepare_request(request)
+        request.resumed = False
+        token = request.headers.get(RESUMPTION_TOKEN_HEADER, '')
 
-        if asyncio.iscoroutine(coroutine):
-            await coroutine
+        if token and self.resumption_token_signer:
+            request.resumed = await self._resume_request(request, token)
+
+        if not request.resumed:
+            coroutine = self.auth_backend.prepare_request(request)
+
+            if asyncio.iscoroutine(coroutine):
+                await coroutine
 
         # handle request
         if request.method == 'GET':
@@ -276,20 +463,58 @@ class JsonRpc(object):
     async def _ws_send_str(self, client, string):
         if client.ws._writer.transport.is_closing():
             self.clients.remove(client)
+            self._index_subscriptions(client, remove=True)
             await client.ws.close()
 
         await client.ws.send_str(string)
 
     async def _handle_rpc_msg(self, http_request, raw_msg):
+        received = self.loop.time()
+
         try:
-            msg = decode_msg(raw_msg.data)
-            self.logger.debug('message decoded: %s', msg)
+            is_batch, msgs = decode_msgs(raw_msg.data)
+            self.logger.debug('message decoded: %s', msgs)
 
         except RpcError as error:
             await self._ws_send_str(http_request, encode_error(error))
 
             return
 
+        # single messages
+        if not is_batch:
+            response = await self._handle_decoded_msg(http_request, msgs[0],
+                                                      received=received)
+
+            if response is not None:
+                await self._ws_send_str(http_request, response)
+
+            return
+
+        # batches
+        self.logger.debug('msg gets handled as batch')
+
+        responses = await asyncio.gather(*[
+            self._handle_decoded_msg(http_request, msg, received=received)
+            for msg in msgs
+        ])
+
+        responses = [i for i in responses if i is not None]
+
+        if responses:
+            await self._ws_send_str(http_request, encode_batch(responses))
+
+    async def _handle_decoded_msg(self, http_request, msg, received=None):
+        """
+        Handles one decoded message and returns the encoded response or
+        None if there is nothing to respond.
+
+        Requests that carry a timeout and expired before they got
+        dispatched are answered with RpcDeadlineExceededError.
+        """
+
+        if isinstance(msg, RpcError):
+            return encode_error(msg)
+
         # handle requests
         if msg.type == JsonRpcMsgTyp.REQUEST:
             self.logger.debug('msg gets handled as request')
@@ -299,11 +524,23 @@ class JsonRpc(object):
                 self.logger.debug('method %s is unknown or restricted',
                                   msg.data['method'])
 
-                await self._ws_send_str(http_request, encode_error(
+                return encode_error(
                     RpcMethodNotFoundError(msg_id=msg.data.get('id', None))
-                ))
+                )
+
+            # check deadline
+            deadline = None
+            timeout = get_msg_timeout(msg)
 
-                return
+            if timeout is not None:
+                deadline = (received or self.loop.time()) + timeout
+
+                if self.loop.time() > deadline:
+                    self.logger.debug('deadline of %s exceeded',
+                                      msg.data['method'])
+
+                    return encode_error(RpcDeadlineExceededError(
+                        msg_id=msg.data.get('id', None)))
 
             # call method
             raw_response = getattr(
@@ -317,42 +554,47 @@ class JsonRpc(object):
                     http_request=http_request,
                     rpc=self,
                     msg=msg,
+                    deadline=deadline,
                 )
 
                 if not raw_response:
                     result = encode_result(msg.data['id'], result)
 
-                await self._ws_send_str(http_request, result)
+                return result
 
             except (RpcGenericServerDefinedError,
+                    RpcDeadlineExceededError,
                     RpcInvalidRequestError,
                     RpcInvalidParamsError) as error:
 
-                await self._ws_send_str(
-                    http_request,
-                    encode_error(error, id=msg.data.get('id', None))
-                )
+                return encode_error(error, id=msg.data.get('id', None))
 
             except Exception as error:
                 self.logger.error(error, exc_info=True)
 
-                await self._ws_send_str(http_request, encode_error(
+                return encode_error(
                     RpcInternalError(msg_id=msg.data.get('id', None))
-                ))
+                )
 
         # handle result
         elif msg.type == JsonRpcMsgTyp.RESULT:
             self.logger.debug('msg gets handled as result')
 
-            http_request.pending[msg.data['id']].set_result(
-                msg.data['result'])
+            # results of calls that timed out get dropped
+            if msg.data['id'] in http_request.pending:
+                http_request.pending[msg.data['id']].set_result(
+                    msg.data['result'])
+
+        # notifications never get a response, not even inside batches
+        elif msg.type == JsonRpcMsgTyp.NOTIFICATION:
+            self.logger.debug('notification %s ignored', msg.data['method'])
 
         else:
             self.logger.debug('unsupported msg type (%s)', msg.type)
 
-            await self._ws_send_str(http_request, encode_error(
+            return encode_error(
                 RpcInvalidRequestError(msg_id=msg.data.get('id', None))
-            ))
+            )
 
     async def handle_websocket_request(self, http_request):
         http_request.msg_id = 0
@@ -363,6 +605,10 @@ class JsonRpc(object):
         await ws.prepare(http_request)
         http_request.ws = ws
         self.clients.append(http_request)
+        self._index_subscriptions(http_request)
+
+        if getattr(http_request, 'resumed', False):
+            await self._send_state(http_request, http_request.subscriptions)
 
         while not ws.closed:
             self.logger.debug('waiting for messages')
@@ -375,8 +621,36 @@ class JsonRpc(object):
             self.loop.create_task(self._handle_rpc_msg(http_request, raw_msg))
 
         self.clients.remove(http_request)
+        self._index_subscriptions(http_request, remove=True)
+
         return ws
 
+    def _index_subscriptions(self, http_request, remove=False):
+        """
+        Updates the subscription index after the subscriptions of
+        http_request have changed. Gets called by subscribe(),
+        unsubscribe(), resume() and the login methods of auth backends.
+        """
+
+        # calls that finish after the connection was closed must not add
+        # the client again
+        if not remove and http_request not in self.clients:
+            return
+
+        indexed = getattr(http_request, 'indexed_subscriptions', set())
+        subscriptions = set()
+
+        if not remove:
+            subscriptions = set(getattr(http_request, 'subscriptions', ()))
+
+        for pattern in indexed - subscriptions:
+            self.subscription_index.remove(pattern, http_request)
+
+        for pattern in subscriptions - indexed:
+            self.subscription_index.add(pattern, http_request)
+
+        http_request.indexed_subscriptions = subscriptions
+
     async def get_methods(self, request):
         return list(request.methods.keys())
 
@@ -391,11 +665,26 @@ class JsonRpc(object):
             request.params = [request.params]
 
         for topic in request.params:
-            if topic and topic in request.topics:
-                request.subscriptions.add(topic)
+            if not topic or type(topic) is not str:
+                continue
+
+            # patterns get authorized per topic on delivery
+            if is_pattern(topic):
+                if not is_valid_pattern(topic):
+                    continue
+
+            elif not is_topic_allowed(request.topics, topic):
+                continue
+
+            # the methods of shards are bound to the JsonRpc they were
+            # created from; request.rpc is the one of the connection
+            request.subscriptions.add(topic)
+            request.rpc._index_subscriptions(request.http_request)
 
-                if topic in self.state:
-                    await request.send_notification(topic, self.state[topic])
+            for state_topic, data in request.rpc._get_state(
+                    request.http_request, [topic]):
+
+                await request.send_notification(state_topic, data)
 
         return list(request.subscriptions)
 
@@ -407,25 +696,85 @@ class JsonRpc(object):
             if topic and topic in request.subscriptions:
                 request.subscriptions.remove(topic)
 
+        request.rpc._index_subscriptions(request.http_request)
+
+        return list(request.subscriptions)
+
+    def _get_state(self, http_request, subscriptions):
+        if not any(is_pattern(i) for i in subscriptions):
+            topics = [i for i in subscriptions if i in self.state]
+
+        else:
+            topics = [i for i in list(self.state)
+                      if is_topic_allowed(subscriptions, i)]
+
+        for topic in topics:
+            if is_topic_allowed(http_request.topics, topic):
+                yield topic, self.state[topic]
+
+    async def _send_state(self, http_request, subscriptions):
+        for topic, data in self._get_state(http_request, subscriptions):
+            await self._ws_send_str(http_request, encode_notification(
+                topic, data))
+
+    async def get_resumption_token(self, request):
+        http_request = request.http_request
+
+        return self.resumption_token_signer.dumps({
+            'identity': self.auth_backend.dump_identity(http_request),
+            'subscriptions': sorted(request.subscriptions),
+        })
+
+    async def resume(self, request):
+        if not isinstance(request.params, str):
+            raise RpcInvalidParamsError(message='token has to be a string')
+
+        if not await request.rpc._resume_request(request.http_request,
+                                                 request.params):
+
+            raise RpcInvalidParamsError(message='invalid token')
+
+        await request.rpc._send_state(request.http_request,
+                                      request.subscriptions)
+
         return list(request.subscriptions)
 
     def filter(self, topics):
         if type(topics) is not list:
             topics = [topics]
 
-        topics = set(topics)
+        clients = set()
 
-        for client in self.clients:
-            if client.ws.closed:
-                continue
+        # topics get authorized again, since pattern subscriptions can
+        # match topics the client may not see
+        for topic in topics:
+            for client in self.subscription_index.match(topic):
+                if id(client) in clients or client.ws.closed:
+                    continue
+
+                if not is_topic_allowed(client.topics, topic):
+                    continue
+
+                clients.add(id(client))
 
-            if len(topics & client.subscriptions) > 0:
                 yield client
 
     async def notify(self, topic, data=None, state=False):
         if type(topic) is not str:
             raise ValueError
 
+        await self._deliver(topic, data, state=state)
+
+        # the local clients got the notification already, so broker
+        # failures don't concern the caller
+        if self.broker is not None:
+            try:
+                await self.broker.publish(topic, data, state=state)
+
+            except Exception:
+                self.logger.exception('publishing %s failed', topic)
+
+    async def _deliver(self, topic, data=None, state=False):
         if state:
             self.state[topic] = data
 
@@ -438,3 +787,26 @@ class JsonRpc(object):
                 await self._ws_send_str(client, notification)
             except Exception as e:
                 self.logger.exception(e)
+
+    async def invalidate_cache(self, *methods):
+        """
+        Invalidates the cached results of methods, or of all methods if
+        none are given, in all clients that cache results.
+        Requires cache_invalidation=True.
+        """
+
+        if CACHE_INVALIDATION_TOPIC not in self.topics:
+            raise RuntimeError('cache invalidation is not enabled')
+
+        self.cache_version += 1
+
+        await self.notify(CACHE_INVALIDATION_TOPIC, {
+            'version': self.cache_version,
+            'methods': list(methods) or None,
+        }, state=True)
+
+    def notify_threadsafe(self, topic, data=None, state=False):
+        if type(topic) is not str:
+            raise ValueError
+
+        self.notification_bridge.push(topic, data, state=state)
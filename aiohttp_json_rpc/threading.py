@@ -1,36 +1,282 @@
 from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 from functools import partial
+from copy import copy
+import threading
 import asyncio
+import time
+
+from .executors import AdaptiveThreadPoolExecutor
+from .exceptions import RpcDeadlineExceededError
+from . import processes
 
 
 class ThreadedWorkerPool:
-    def __init__(self, max_workers, loop=None):
+    """
+    Runs sync methods in max_workers threads.
+
+    Methods decorated with @process run in max_processes worker processes
+    instead, which get started up front. Arguments and results that pickle
+    to shared_memory_threshold bytes or more get transferred using shared
+    memory, if available.
+
+    With max_workers=0 sync methods run inline on the event loop, timed by
+    blocking_monitor if set. With adaptive set, the number of threads
+    changes between min_workers and max_workers with the load (see
+    AdaptiveThreadPoolExecutor).
+    """
+
+    def __init__(self, max_workers, loop=None, max_processes=0,
+                 shared_memory_threshold=None, blocking_monitor=None,
+                 adaptive=False, min_workers=1):
+
         self.loop = loop or asyncio.get_event_loop()
+        self.shared_memory_threshold = shared_memory_threshold
+        self.blocking_monitor = blocking_monitor
 
-        if max_workers > 0:
+        if max_workers > 0 and adaptive:
+            self.executor = AdaptiveThreadPoolExecutor(
+                min_workers=min(min_workers, max_workers),
+                max_workers=max_workers,
+            )
+
+        elif max_workers > 0:
             self.executor = ThreadPoolExecutor(max_workers=max_workers)
 
         else:
             self.executor = None
 
+        if max_processes > 0:
+            self.process_executor = processes.create_process_pool(
+                max_processes)
+
+        else:
+            self.process_executor = None
+
+        self.bulkheads = {}
+        self._bulkheads_lock = threading.Lock()
+
+        # set on pools created by for_loop()
+        self.parent = None
+
+        self._results = deque()
+        self._completion_scheduled = False
+
+    def for_loop(self, loop):
+        """
+        Returns a pool for another event loop, which shares the threads,
+        processes and bulkheads of this pool, so the limits of a bulkhead
+        apply across all loops.
+        """
+
+        pool = copy(self)
+        pool.loop = loop
+        pool.parent = self
+        pool._results = deque()
+        pool._completion_scheduled = False
+
+        return pool
+
+    def add_bulkhead(self, name, max_workers=None, max_concurrency=None):
+        with self._bulkheads_lock:
+            self.bulkheads[name] = Bulkhead(
+                name,
+                max_workers=max_workers,
+                max_concurrency=max_concurrency,
+            )
+
+            return self.bulkheads[name]
+
+    def get_bulkhead(self, method):
+        """
+        Returns the Bulkhead of a method decorated with @bulkhead or None.
+        Bulkheads that were not added up front get created on first use.
+        """
+
+        options = getattr(method, 'bulkhead', None)
+
+        if options is None:
+            return None
+
+        try:
+            return self.bulkheads[options['name']]
+
+        except KeyError:
+            pass
+
+        with self._bulkheads_lock:
+            # pools of other loops may have created it in the meantime
+            if options['name'] not in self.bulkheads:
+                self.bulkheads[options['name']] = Bulkhead(**options)
+
+            return self.bulkheads[options['name']]
+
+    def get_bulkhead_stats(self):
+        return {name: bulkhead.get_stats()
+                for name, bulkhead in self.bulkheads.items()}
+
     async def run(self, func, *args, **kwargs):
-        if not isinstance(func, partial):
-            func = partial(func, *args, **kwargs)
+        return await self.run_before(None, func, *args, **kwargs)
+
+    async def run_before(self, deadline, func, *args, **kwargs):
+        """
+        Like run(), but raises RpcDeadlineExceededError instead of running
+        func if the deadline, in loop time, has passed once a worker is
+        free.
+        """
 
         if not self.executor:
-            return func()
+            if self.blocking_monitor:
+                if args or kwargs:
+                    func = partial(func, *args, **kwargs)
 
-        def _run(func, *args):
-            try:
-                future.set_result(func())
+                return await self.blocking_monitor.run(func)
+
+            return func(*args, **kwargs)
+
+        return await self.run_in_executor(self.executor, deadline, func,
+                                          *args, **kwargs)
+
+    async def run_in_executor(self, executor, deadline, func, *args,
+                              **kwargs):
+
+        future = self.loop.create_future()
+        job = executor.submit(self._call, future, deadline, func, args, kwargs)
+
+        try:
+            return await future
+
+        except asyncio.CancelledError:
+            # jobs that did not start yet don't run anymore
+            job.cancel()
 
-            except Exception as e:
-                future.set_exception(e)
+            raise
 
-        future = asyncio.Future()
-        self.loop.run_in_executor(self.executor, _run, func)
+    def _call(self, future, deadline, func, args, kwargs):
+        # runs in a worker thread; loop.time() is thread-safe for the
+        # default loops
+        try:
+            if deadline is not None and self.loop.time() > deadline:
+                raise RpcDeadlineExceededError
 
-        return await future
+            result = (future, func(*args, **kwargs), None)
+
+        except StopIteration as e:
+            # futures refuse StopIteration
+            result = (future, None, RuntimeError(repr(e)))
+
+        except BaseException as e:
+            # anything else would leave the caller waiting forever
+            result = (future, None, e)
+
+        # futures may only be completed on the loop thread. Results that
+        # finish while a wakeup is pending get completed in the same batch,
+        # which saves a write to the self-pipe of the loop per call; the
+        # flag is handled like in NotificationBridge.push()
+        self._results.append(result)
+
+        if not self._completion_scheduled:
+            self._completion_scheduled = True
+            self.loop.call_soon_threadsafe(self._complete)
+
+    def _complete(self):
+        self._completion_scheduled = False
+
+        try:
+            while True:
+                future, result, exception = self._results.popleft()
+
+                if future.done():  # cancelled
+                    continue
+
+                if exception is not None:
+                    future.set_exception(exception)
+
+                else:
+                    future.set_result(result)
+
+        except IndexError:
+            pass
+
+    async def run_generator(self, executor, deadline, func, **kwargs):
+        """
+        Runs the generator function func step by step in executor, or the
+        default executor if None. Everything func yields gets awaited on
+        the loop and sent back into func, so waiting for reverse calls
+        like request.confirm() does not occupy a worker. The return value
+        of func is the result.
+        """
+
+        executor = executor or self.executor
+        generator = func(**kwargs)  # runs no code of func yet
+        method, value = generator.send, None
+
+        try:
+            while True:
+                if executor:
+                    done, value = await self.run_in_executor(
+                        executor, deadline, _step, method, value)
+
+                    # the deadline only applies before the first step
+                    deadline = None
+
+                else:
+                    done, value = _step(method, value)
+
+                if done:
+                    return value
+
+                try:
+                    value = await value
+                    method = generator.send
+
+                except Exception as e:
+                    method, value = generator.throw, e
+
+        finally:
+            generator.close()
+
+    async def run_in_process(self, deadline, func, **kwargs):
+        """
+        Runs func(**kwargs) in a worker process. func, its arguments and
+        its result have to be picklable. Without worker processes func
+        runs in a thread.
+        """
+
+        if not self.process_executor:
+            return await self.run_before(deadline, func, **kwargs)
+
+        if deadline is not None and self.loop.time() > deadline:
+            raise RpcDeadlineExceededError
+
+        kwargs_ref = processes.dump(kwargs, self.shared_memory_threshold)
+
+        future = self.process_executor.submit(
+            processes.call, func, kwargs_ref, self.shared_memory_threshold)
+
+        try:
+            result_ref = await asyncio.wrap_future(future, loop=self.loop)
+
+        except asyncio.CancelledError:
+            # the worker may still use the arguments and create a result
+            # block, so both get released once it is done
+            future.add_done_callback(
+                partial(processes.release_call, kwargs_ref))
+
+            raise
+
+        except BaseException:
+            processes.release(kwargs_ref)
+
+            raise
+
+        processes.release(kwargs_ref)
+
+        try:
+            return processes.load(result_ref)
+
+        finally:
+            processes.release(result_ref)
 
     def run_sync(self, coro, *args, wait=True, **kwargs):
         if not isinstance(coro, partial):
@@ -43,6 +289,228 @@ class ThreadedWorkerPool:
 
         return future
 
+    def shutdown(self, wait=True):
+        # shared with the parent
+        if self.parent is not None:
+            return
+
+        for bulkhead in self.bulkheads.values():
+            bulkhead.shutdown(wait=wait)
+
+        if self.executor:
+            self.executor.shutdown(wait=wait)
+
+        if self.process_executor:
+            self.process_executor.shutdown(wait=wait)
+
+        if self.blocking_monitor:
+            self.blocking_monitor.stop()
+
+
+def _step(method, value):
+    try:
+        return False, method(value)
+
+    except StopIteration as e:
+        return True, e.value
+
+
+class Bulkhead:
+    """
+    Isolates a group of methods from all other methods.
+
+    Sync methods of the group run in their own pool of max_workers threads,
+    if set, and at most max_concurrency calls of the group run at the same
+    time, which defaults to max_workers. Calls over the limit wait in line;
+    the bulkhead keeps track of how many are waiting and for how long.
+
+    Bulkheads are thread-safe and can be used from multiple event loops;
+    waiters get woken up on their own loop.
+    """
+
+    def __init__(self, name, max_workers=None, max_concurrency=None):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency or max_workers
+
+        if max_workers:
+            self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        else:
+            self.executor = None
+
+        self._lock = threading.Lock()
+        self._acquired = 0
+        self._waiters = deque()
+
+        # metrics
+        self.waiting = 0
+        self.running = 0
+        self.calls = 0
+        self.waits = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def get_stats(self):
+        return {
+            'max_workers': self.max_workers,
+            'max_concurrency': self.max_concurrency,
+            'waiting': self.waiting,
+            'running': self.running,
+            'calls': self.calls,
+            'waits': self.waits,
+            'wait_time_total': self.wait_time_total,
+            'wait_time_max': self.wait_time_max,
+        }
+
+    async def _acquire(self):
+        with self._lock:
+            self.calls += 1
+
+            if self._acquired < self.max_concurrency:
+                self._acquired += 1
+                self.running += 1
+
+                return
+
+            loop = asyncio.get_event_loop()
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+            self.waits += 1
+            self.waiting += 1
+
+        future = waiter[1]
+        start = time.monotonic()
+
+        try:
+            await future
+
+        except asyncio.CancelledError:
+            with self._lock:
+                self.waiting -= 1
+
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+                    raise
+
+            # the slot got handed over already; if the future got
+            # cancelled, _hand_over() passes it on
+            if future.done() and not future.cancelled():
+                self._release(running=False)
+
+            raise
+
+        wait_time = time.monotonic() - start
+
+        with self._lock:
+            self.waiting -= 1
+            self.running += 1
+            self.wait_time_total += wait_time
+            self.wait_time_max = max(self.wait_time_max, wait_time)
+
+    def _release(self, running=True):
+        with self._lock:
+            if running:
+                self.running -= 1
+
+            if not self._waiters:
+                self._acquired -= 1
+
+                return
+
+            # the slot goes to the next waiter directly
+            loop, future = self._waiters.popleft()
+
+        loop.call_soon_threadsafe(self._hand_over, future)
+
+    def _hand_over(self, future):
+        if future.cancelled():
+            self._release(running=False)
+
+        else:
+            future.set_result(None)
+
+    async def run(self, func):
+        """Runs the coroutine function func within the bulkhead."""
+
+        if not self.max_concurrency:
+            with self._lock:
+                self.calls += 1
+                self.running += 1
+
+            try:
+                return await func()
+
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+        await self._acquire()
+
+        try:
+            return await func()
+
+        finally:
+            self._release()
+
     def shutdown(self, wait=True):
         if self.executor:
             self.executor.shutdown(wait=wait)
+
+
+class NotificationBridge:
+    """
+    Hands notifications from arbitrary threads over to the event loop.
+
+    push() never blocks: it appends to a deque, which is thread-safe without
+    an explicit lock, and wakes up the loop only if no drain is scheduled
+    yet. The loop drains everything that queued up in one go and sends it,
+    in order, using JsonRpc.notify.
+    """
+
+    def __init__(self, rpc, loop=None):
+        self.rpc = rpc
+        self.loop = loop or rpc.loop
+
+        self._queue = deque()
+        self._drain_scheduled = False
+        self._send_lock = None
+
+    def push(self, topic, data=None, state=False):
+        self._queue.append((topic, data, state))
+
+        # the flag may be reset by the loop right after it was read here;
+        # in the worst case this schedules a drain for an empty queue
+        if not self._drain_scheduled:
+            self._drain_scheduled = True
+            self.loop.call_soon_threadsafe(self._drain)
+
+    def _drain(self):
+        # reset the flag before draining, so notifications that get pushed
+        # while draining schedule a new drain
+        self._drain_scheduled = False
+        batch = []
+
+        try:
+            while True:
+                batch.append(self._queue.popleft())
+
+        except IndexError:
+            pass
+
+        if batch:
+            asyncio.ensure_future(self._send(batch), loop=self.loop)
+
+    async def _send(self, batch):
+        if self._send_lock is None:
+            self._send_lock = asyncio.Lock()
+
+        # batches have to be sent one after another to keep the order
+        async with self._send_lock:
+            for topic, data, state in batch:
+                try:
+                    await self.rpc.notify(topic, data, state=state)
+
+                except Exception as e:
+                    self.rpc.logger.exception(e)
@@ -0,0 +1,104 @@
+import weakref
+import asyncio
+import math
+
+_timer_wheels = weakref.WeakKeyDictionary()
+
+
+class Timer:
+    __slots__ = ('deadline', 'future', 'bucket')
+
+    def __init__(self, deadline, future, bucket):
+        self.deadline = deadline
+        self.future = future
+        self.bucket = bucket
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel for the deadlines of pending calls.
+
+    Deadlines get rounded up to multiples of resolution seconds and hashed
+    into one of slots buckets. While timers are set, one loop timer ticks
+    every resolution seconds and expires all due timers of the current
+    bucket at once, by setting asyncio.TimeoutError on their futures.
+    Adding and cancelling a timer is O(1) and does not create tasks or loop
+    timers; deadlines fire up to resolution seconds late.
+    """
+
+    def __init__(self, resolution=0.01, slots=512, loop=None):
+        self.resolution = resolution
+        self.slots = slots
+        self.loop = loop or asyncio.get_event_loop()
+
+        self._buckets = [set() for _ in range(slots)]
+        self._timers = 0
+        self._tick = None
+        self._handle = None
+
+    def __len__(self):
+        return self._timers
+
+    def add(self, future, timeout):
+        now = self.loop.time()
+
+        if self._handle is None:
+            self._tick = math.floor(now / self.resolution)
+            self._schedule()
+
+        deadline = now + timeout
+        tick = max(math.ceil(deadline / self.resolution), self._tick + 1)
+
+        timer = Timer(deadline, future, self._buckets[tick % self.slots])
+        timer.bucket.add(timer)
+        self._timers += 1
+
+        return timer
+
+    def cancel(self, timer):
+        if timer.bucket is None:
+            return
+
+        timer.bucket.discard(timer)
+        timer.bucket = None
+        self._timers -= 1
+
+    def _schedule(self):
+        self._handle = self.loop.call_at(
+            (self._tick + 1) * self.resolution, self._run)
+
+    def _run(self):
+        now = self.loop.time()
+        now_tick = math.floor(now / self.resolution)
+
+        # after a stalled loop one full round covers every bucket
+        last_tick = min(now_tick, self._tick + self.slots)
+
+        while self._tick < last_tick:
+            self._tick += 1
+            bucket = self._buckets[self._tick % self.slots]
+
+            for timer in [i for i in bucket if i.deadline <= now]:
+                self.cancel(timer)
+
+                if not timer.future.done():
+                    timer.future.set_exception(asyncio.TimeoutError())
+
+        self._tick = max(self._tick, now_tick)
+
+        if self._timers:
+            self._schedule()
+
+        else:
+            self._handle = None
+
+
+def get_timer_wheel(loop=None):
+    """Returns the TimerWheel shared by all calls on loop."""
+
+    loop = loop or asyncio.get_event_loop()
+
+    if loop not in _timer_wheels:
+        _timer_wheels[loop] = TimerWheel(loop=loop)
+
+    return _timer_wheels[loop]
@@ -0,0 +1,141 @@
+SEPARATOR = '.'
+SINGLE_LEVEL = '*'
+MULTI_LEVEL = '#'
+
+
+def is_pattern(topic):
+    return any(level in (SINGLE_LEVEL, MULTI_LEVEL)
+               for level in topic.split(SEPARATOR))
+
+
+def is_valid_pattern(pattern):
+    levels = pattern.split(SEPARATOR)
+
+    return MULTI_LEVEL not in levels[:-1]
+
+
+def matches(pattern, topic):
+    """
+    Returns True if topic matches pattern. Topics are dot-separated; in
+    patterns '*' matches exactly one level and '#', which may only be the
+    last level, any number of levels including none.
+    """
+
+    topic = topic.split(SEPARATOR)
+
+    for index, level in enumerate(pattern.split(SEPARATOR)):
+        if level == MULTI_LEVEL:
+            return True
+
+        if index >= len(topic) or level not in (SINGLE_LEVEL, topic[index]):
+            return False
+
+    return len(pattern.split(SEPARATOR)) == len(topic)
+
+
+def is_topic_allowed(topics, topic):
+    """
+    Returns True if topic is one of topics or matches one of the patterns
+    among them.
+    """
+
+    if topic in topics:
+        return True
+
+    return any(is_pattern(i) and matches(i, topic) for i in topics)
+
+
+def filter_subscriptions(topics, subscriptions):
+    """
+    Returns the subscriptions a client with the allowed topics may keep.
+    Pattern subscriptions are kept, since they get checked per topic on
+    delivery.
+    """
+
+    return {i for i in subscriptions
+            if is_pattern(i) or is_topic_allowed(topics, i)}
+
+
+class TopicTrieNode:
+    __slots__ = ('children', 'values')
+
+    def __init__(self):
+        self.children = {}
+        self.values = {}
+
+
+class TopicTrie:
+    """
+    Maps topics and topic patterns (see matches()) to sets of values.
+    Values are compared by identity, so they don't have to be hashable.
+
+    match() follows one path per matching wildcard level, so lookups cost
+    O(topic depth), independent of the number of patterns.
+    """
+
+    def __init__(self):
+        self.root = TopicTrieNode()
+
+    def add(self, pattern, value):
+        if not is_valid_pattern(pattern):
+            raise ValueError("'#' has to be the last level")
+
+        node = self.root
+
+        for level in pattern.split(SEPARATOR):
+            if level not in node.children:
+                node.children[level] = TopicTrieNode()
+
+            node = node.children[level]
+
+        node.values[id(value)] = value
+
+    def remove(self, pattern, value):
+        path = [self.root]
+
+        for level in pattern.split(SEPARATOR):
+            node = path[-1].children.get(level)
+
+            if node is None:
+                return
+
+            path.append(node)
+
+        path[-1].values.pop(id(value), None)
+
+        # prune empty nodes
+        levels = pattern.split(SEPARATOR)
+
+        for depth in range(len(levels), 0, -1):
+            if path[depth].values or path[depth].children:
+                break
+
+            del path[depth - 1].children[levels[depth - 1]]
+
+    def match(self, topic):
+        values = {}
+        nodes = [self.root]
+
+        for level in topic.split(SEPARATOR):
+            next_nodes = []
+
+            for node in nodes:
+                if MULTI_LEVEL in node.children:
+                    values.update(node.children[MULTI_LEVEL].values)
+
+                if level in node.children:
+                    next_nodes.append(node.children[level])
+
+                if SINGLE_LEVEL in node.children:
+                    next_nodes.append(node.children[SINGLE_LEVEL])
+
+            nodes = next_nodes
+
+        for node in nodes:
+            values.update(node.values)
+
+            # '#' matches no level too
+            if MULTI_LEVEL in node.children:
+                values.update(node.children[MULTI_LEVEL].values)
+
+        return list(values.values())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures PasswdAuthBackend login throughput under a burst of concurrent
+logins, while a ticker task measures how long the event loop stalls.
+
+usage: benchmarks/passwd_login.py [LOGINS] [ROUNDS]
+"""
+
+from types import SimpleNamespace
+import tempfile
+import asyncio
+import time
+import sys
+import os
+
+from aiohttp_json_rpc.auth.passwd import PasswdAuthBackend
+
+
+class FakeRpc:
+    methods = {}
+    topics = {}
+
+
+def gen_request(username, password):
+    http_request = SimpleNamespace(rpc=FakeRpc())
+
+    return SimpleNamespace(
+        http_request=http_request,
+        params={'username': username, 'password': password},
+    )
+
+
+async def measure_loop_lag(stop, interval=0.01):
+    loop = asyncio.get_event_loop()
+    max_lag = 0
+
+    while not stop.done():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        max_lag = max(max_lag, loop.time() - start - interval)
+
+    return max_lag
+
+
+async def burst(backend, logins):
+    stop = asyncio.Future()
+    lag = asyncio.ensure_future(measure_loop_lag(stop))
+
+    start = time.monotonic()
+
+    results = await asyncio.gather(*[
+        backend.login(gen_request('user{}'.format(i), 'password'))
+        for i in range(logins)
+    ])
+
+    duration = time.monotonic() - start
+    stop.set_result(None)
+
+    assert all(results)
+
+    return duration, await lag
+
+
+def main(logins=64, rounds=100000):
+    loop = asyncio.get_event_loop()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        passwd_file = os.path.join(tmp_dir, 'passwd')
+        backend = PasswdAuthBackend(passwd_file, hash_workers=0)
+
+        for i in range(logins):
+            backend._create_user('user{}'.format(i), 'password',
+                                 rounds=rounds)
+
+        for name, hash_workers in (('thread executor', 0),
+                                   ('process pool', None)):
+
+            backend = PasswdAuthBackend(passwd_file,
+                                        hash_workers=hash_workers)
+
+            cold = loop.run_until_complete(burst(backend, logins))
+            warm = loop.run_until_complete(burst(backend, logins))
+
+            backend.shutdown()
+
+            for label, (duration, lag) in (('cold', cold),
+                                           ('cached', warm)):
+
+                print('{:16} {:6}: {:8.1f} logins/s, max loop lag {:.3f}s'.format(  # NOQA
+                    name, label, logins / duration, lag))
+
+
+if __name__ == '__main__':
+    main(*[int(i) for i in sys.argv[1:3]])
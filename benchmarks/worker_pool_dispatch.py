@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures the per-call overhead of ThreadedWorkerPool.run for a method that
+does nothing, compared to the previous dispatch path, which wrapped every
+call in a partial, an extra asyncio.Future and a closure that completed
+the future from the worker thread.
+
+usage: benchmarks/worker_pool_dispatch.py [CALLS] [CONCURRENCY]
+"""
+
+from functools import partial
+import asyncio
+import time
+import sys
+
+from aiohttp_json_rpc.threading import ThreadedWorkerPool
+
+
+class LegacyWorkerPool(ThreadedWorkerPool):
+    async def run_before(self, deadline, func, *args, **kwargs):
+        if not isinstance(func, partial):
+            func = partial(func, *args, **kwargs)
+
+        def _run(func, *args):
+            try:
+                future.set_result(func())
+
+            except Exception as e:
+                future.set_exception(e)
+
+        future = asyncio.Future()
+        self.loop.run_in_executor(self.executor, _run, func)
+
+        return await future
+
+
+def noop(value=None):
+    return value
+
+
+async def sequential(pool, calls):
+    start = time.monotonic()
+
+    for i in range(calls):
+        await pool.run(noop, value=i)
+
+    return time.monotonic() - start
+
+
+async def concurrent(pool, calls, concurrency):
+    async def worker():
+        for i in range(calls // concurrency):
+            await pool.run(noop, value=i)
+
+    start = time.monotonic()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+    return time.monotonic() - start
+
+
+def main(calls=20000, concurrency=16):
+    loop = asyncio.get_event_loop()
+
+    for name, pool_class in (('legacy', LegacyWorkerPool),
+                             ('current', ThreadedWorkerPool)):
+
+        pool = pool_class(max_workers=4, loop=loop)
+
+        # warm up the threads
+        loop.run_until_complete(sequential(pool, 100))
+
+        for label, coro in (
+                ('sequential', sequential(pool, calls)),
+                ('concurrent', concurrent(pool, calls, concurrency))):
+
+            duration = loop.run_until_complete(coro)
+
+            print('{:8} {:10}: {:6.1f} us/call, {:8.1f} calls/s'.format(
+                name, label, duration / calls * 1000000, calls / duration))
+
+        pool.shutdown()
+
+
+if __name__ == '__main__':
+    main(*[int(i) for i in sys.argv[1:3]])
@@ -0,0 +1,269 @@
+import asyncio
+
+import pytest
+
+from aiohttp_json_rpc.brokers import (
+    InMemoryBroker,
+    RedisBroker,
+    encode_command,
+    read_reply,
+)
+
+from aiohttp_json_rpc.pytest import gen_rpc_context
+from aiohttp_json_rpc import JsonRpc
+
+
+class FakeRedis:
+    """
+    Stand-in for a Redis server that implements the commands RedisBroker
+    uses.
+    """
+
+    def __init__(self):
+        self.hashes = {}
+        self.sets = {}
+        self.subscribers = {}
+        self.commands = []
+        self.writers = set()
+
+    async def start(self, port):
+        self.server = await asyncio.start_server(self.handle_connection,
+                                                 'localhost', port)
+
+    async def stop(self):
+        self.server.close()
+
+        for writer in list(self.writers):
+            writer.close()
+
+        await self.server.wait_closed()
+
+    def encode(self, value):
+        if value is None:
+            return b'$-1\r\n'
+
+        if isinstance(value, int):
+            return b':' + str(value).encode() + b'\r\n'
+
+        if isinstance(value, list):
+            return (b'*' + str(len(value)).encode() + b'\r\n' +
+                    b''.join(self.encode(i) for i in value))
+
+        return b'$' + str(len(value)).encode() + b'\r\n' + value + b'\r\n'
+
+    async def handle_connection(self, reader, writer):
+        self.writers.add(writer)
+
+        while True:
+            try:
+                command, *args = await read_reply(reader)
+
+            except (ConnectionError, asyncio.IncompleteReadError):
+                break
+
+            command = command.decode().upper()
+            self.commands.append(command)
+
+            if command == 'SUBSCRIBE':
+                self.subscribers.setdefault(args[0], []).append(writer)
+                reply = [b'subscribe', args[0], 1]
+
+            elif command == 'PUBLISH':
+                subscribers = self.subscribers.get(args[0], [])
+
+                for subscriber in subscribers:
+                    subscriber.write(self.encode(
+                        [b'message', args[0], args[1]]))
+
+                reply = len(subscribers)
+
+            elif command == 'HSET':
+                self.hashes.setdefault(args[0], {})[args[1]] = args[2]
+                reply = 1
+
+            elif command == 'HGETALL':
+                reply = [i for item in self.hashes.get(args[0], {}).items()
+                         for i in item]
+
+            elif command == 'SADD':
+                self.sets.setdefault(args[0], set()).update(args[1:])
+                reply = len(args) - 1
+
+            elif command == 'SMEMBERS':
+                reply = sorted(self.sets.get(args[0], set()))
+
+            else:
+                writer.write(b'-ERR unknown command\r\n')
+
+                continue
+
+            writer.write(self.encode(reply))
+
+        for subscribers in self.subscribers.values():
+            if writer in subscribers:
+                subscribers.remove(writer)
+
+        self.writers.discard(writer)
+        writer.close()
+
+
+@pytest.fixture
+def rpc_contexts(event_loop, unused_tcp_port_factory):
+    contexts = []
+    generators = []
+
+    for _ in range(2):
+        rpc = JsonRpc(loop=event_loop)
+        rpc.add_topics('foo')
+
+        generator = gen_rpc_context(
+            event_loop, 'localhost', unused_tcp_port_factory(), rpc,
+            ('*', '/rpc', rpc.handle_request))
+
+        contexts.append(next(generator))
+        generators.append(generator)
+
+    yield contexts
+
+    for context, generator in zip(contexts, generators):
+        if context.rpc.broker:
+            event_loop.run_until_complete(context.rpc.broker.close())
+
+        for _ in generator:
+            pass
+
+
+async def check_broker(contexts, broker_factory):
+    context1, context2 = contexts
+    notifications = []
+
+    async def handler(data):
+        notifications.append(data['params'])
+
+    await broker_factory().connect(context1.rpc)
+    await broker_factory().connect(context2.rpc)
+
+    client1 = await context1.make_client()
+    client2 = await context2.make_client()
+
+    await client1.subscribe('foo', handler)
+    await client2.subscribe('foo', handler)
+
+    # notifications reach the clients of all instances
+    await context1.rpc.notify('foo', 1)
+    await context2.rpc.notify('foo', 2, state=True)
+    await asyncio.sleep(0.1)
+
+    assert sorted(notifications) == [1, 1, 2, 2]
+    assert context1.rpc.state == context2.rpc.state == {'foo': 2}
+
+    # topics that get added at runtime
+    context1.rpc.add_topics('bar')
+    await asyncio.sleep(0.1)
+
+    assert 'bar' in context2.rpc.topics
+
+    # late instances get state and topics
+    rpc = JsonRpc()
+    broker = broker_factory()
+    await broker.connect(rpc)
+
+    assert rpc.state == {'foo': 2}
+    assert 'bar' in rpc.topics
+
+    await broker.close()
+
+    assert rpc.broker is None
+
+
+@pytest.mark.asyncio
+async def test_in_memory_broker(rpc_contexts):
+    broker = InMemoryBroker()
+
+    await check_broker(rpc_contexts, lambda: InMemoryBroker(peer=broker))
+
+
+@pytest.mark.asyncio
+async def test_redis_broker(rpc_contexts, unused_tcp_port):
+    redis = FakeRedis()
+    await redis.start(unused_tcp_port)
+
+    try:
+        await check_broker(rpc_contexts, lambda: RedisBroker(
+            port=unused_tcp_port, prefix='test:'))
+
+        assert b'test:notifications' in redis.subscribers
+        assert redis.hashes[b'test:state'] == {b'foo': b'2'}
+        assert redis.sets[b'test:topics'] == {b'bar'}
+
+    finally:
+        for context in rpc_contexts:
+            await context.rpc.broker.close()
+
+        await redis.stop()
+
+
+@pytest.mark.asyncio
+async def test_redis_broker_reconnect(rpc_contexts, unused_tcp_port):
+    context1, context2 = rpc_contexts
+    notifications = []
+
+    redis = FakeRedis()
+    await redis.start(unused_tcp_port)
+
+    for context in rpc_contexts:
+        broker = RedisBroker(port=unused_tcp_port, prefix='test:')
+        broker.reconnect_delay = 0.01
+
+        await broker.connect(context.rpc)
+
+    async def handler(data):
+        notifications.append(data['params'])
+
+    client = await context2.make_client()
+    await client.subscribe('foo', handler)
+
+    try:
+        # publish failures get logged instead of raised while redis is gone
+        await redis.stop()
+        await context1.rpc.notify('foo', 1)
+
+        await redis.start(unused_tcp_port)
+        await asyncio.sleep(0.3)
+
+        await context1.rpc.notify('foo', 2, state=True)
+        await asyncio.sleep(0.1)
+
+        assert notifications == [2]
+        assert context2.rpc.state == {'foo': 2}
+
+    finally:
+        for context in rpc_contexts:
+            await context.rpc.broker.close()
+
+        await redis.stop()
+
+
+def test_resp():
+    assert encode_command('SET', 'foo', 1) == (
+        b'*3\r\n$3\r\nSET\r\n$3\r\nfoo\r\n$1\r\n1\r\n')
+
+    async def read(data):
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+
+        return await read_reply(reader)
+
+    loop = asyncio.new_event_loop()
+
+    try:
+        assert loop.run_until_complete(read(b'+OK\r\n')) == 'OK'
+        assert loop.run_until_complete(read(b':3\r\n')) == 3
+        assert loop.run_until_complete(read(b'$-1\r\n')) is None
+
+        assert loop.run_until_complete(
+            read(b'*2\r\n$3\r\nfoo\r\n:1\r\n')) == [b'foo', 1]
+
+    finally:
+        loop.close()
@@ -0,0 +1,105 @@
+import threading
+import asyncio
+import time
+
+import pytest
+
+from aiohttp_json_rpc.threading import Bulkhead
+from aiohttp_json_rpc import bulkhead
+
+
+@pytest.mark.asyncio
+async def test_bulkheads(rpc_context):
+    @bulkhead('reports', max_workers=1)
+    def report(request):
+        time.sleep(0.1)
+
+        return request.params
+
+    def ping():
+        return 'pong'
+
+    @bulkhead('limited', max_concurrency=1)
+    async def limited(request):
+        await asyncio.sleep(0.05)
+
+        return request.params
+
+    rpc_context.rpc.add_methods(('', report), ('', ping), ('', limited))
+    client = await rpc_context.make_client()
+
+    reports = asyncio.ensure_future(asyncio.gather(*[
+        client.call('report', i, timeout=2) for i in range(3)
+    ]))
+
+    await asyncio.sleep(0.05)
+
+    # the rest of the worker pool is not affected by the reports
+    start = time.monotonic()
+    assert await client.call('ping') == 'pong'
+    assert time.monotonic() - start < 0.05
+
+    stats = rpc_context.rpc.worker_pool.get_bulkhead_stats()['reports']
+    assert stats['running'] == 1
+    assert stats['waiting'] == 2
+
+    assert await reports == [0, 1, 2]
+
+    stats = rpc_context.rpc.worker_pool.get_bulkhead_stats()['reports']
+    assert stats['calls'] == 3
+    assert stats['waits'] == 2
+    assert stats['waiting'] == stats['running'] == 0
+    assert stats['wait_time_max'] >= 0.1
+
+    # coroutines
+    assert await asyncio.gather(*[
+        client.call('limited', i) for i in range(2)
+    ]) == [0, 1]
+
+    stats = rpc_context.rpc.worker_pool.get_bulkhead_stats()['limited']
+    assert stats['waits'] == 1
+
+
+@pytest.mark.asyncio
+async def test_bulkhead_across_loops():
+    bulkhead = Bulkhead('limited', max_concurrency=1)
+    running = []
+    running_max = []
+
+    async def func():
+        running.append(1)
+        running_max.append(len(running))
+
+        try:
+            await asyncio.sleep(0.02)
+
+        finally:
+            running.pop()
+
+    async def run_calls():
+        await asyncio.gather(*[bulkhead.run(func) for _ in range(3)])
+
+    other_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=other_loop.run_forever)
+    thread.start()
+
+    try:
+        other_calls = asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(run_calls(), other_loop))
+
+        # cancelled waiters give up their place in line
+        cancelled = asyncio.ensure_future(bulkhead.run(func))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+
+        await asyncio.gather(other_calls, run_calls())
+
+    finally:
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        thread.join()
+        other_loop.close()
+
+    assert max(running_max) == 1
+    assert bulkhead.get_stats()['running'] == 0
+    assert bulkhead.get_stats()['waiting'] == 0
+    assert bulkhead._acquired == 0
@@ -0,0 +1,39 @@
+from aiohttp_json_rpc.cache import LRUCache
+
+
+class Clock:
+    def __init__(self):
+        self.time = 0
+
+    def __call__(self):
+        return self.time
+
+
+def test_lru_eviction():
+    cache = LRUCache(maxsize=2)
+
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+
+    cache.set('c', 3)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    assert len(cache) == 2
+
+
+def test_ttl():
+    clock = Clock()
+    cache = LRUCache(ttl=10, clock=clock)
+
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=20)
+
+    clock.time = 15
+
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+    assert cache.hits == 1
+    assert cache.misses == 1
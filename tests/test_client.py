@@ -1,3 +1,6 @@
+import asyncio
+import json
+
 import pytest
 import aiohttp
 
@@ -82,3 +85,310 @@ async def test_client_connection_failure(rpc_context, unused_tcp_port_factory):
             )
         )
     assert client._session.closed is True
+
+
+async def test_client_batch(rpc_context):
+    from aiohttp_json_rpc import RpcInvalidParamsError
+
+    async def add(request):
+        if not isinstance(request.params, list):
+            raise RpcInvalidParamsError
+
+        return sum(request.params)
+
+    rpc_context.rpc.add_methods(
+        ('', add),
+    )
+
+    client = await rpc_context.make_client()
+
+    async with client.batch() as batch:
+        result1 = batch.call('add', [1, 2])
+        result2 = batch.call('add', 'foo')
+        result3 = batch.call('foo')
+
+    assert result1.result() == 3
+    assert isinstance(result2.exception(), RpcInvalidParamsError)
+    assert result3.exception() is not None
+    assert client._pending == {}
+
+    # call_many
+    assert await client.call_many([
+        ('add', [1, 2]),
+        ('add', [3, 4]),
+        'get_topics',
+    ]) == [3, 7, []]
+
+    with pytest.raises(RpcInvalidParamsError):
+        await client.call_many([('add', [1, 2]), ('add', 'foo')])
+
+    results = await client.call_many([('add', [1, 2]), ('add', 'foo')],
+                                     return_exceptions=True)
+
+    assert results[0] == 3
+    assert isinstance(results[1], RpcInvalidParamsError)
+
+
+async def test_batch_notifications(rpc_context):
+    session = aiohttp.ClientSession()
+
+    ws = await session.ws_connect('ws://{}:{}{}'.format(
+        rpc_context.host, rpc_context.port, rpc_context.url))
+
+    try:
+        # notifications get no response, not even inside batches
+        await ws.send_str(json.dumps([
+            {'jsonrpc': '2.0', 'id': 1, 'method': 'get_topics'},
+            {'jsonrpc': '2.0', 'method': 'get_topics'},
+        ]))
+
+        msg = await asyncio.wait_for(ws.receive(), 1)
+
+        assert json.loads(msg.data) == [
+            {'jsonrpc': '2.0', 'id': 1, 'result': []},
+        ]
+
+    finally:
+        await ws.close()
+        await session.close()
+
+
+async def test_client_reconnect(rpc_context):
+    calls = []
+    event = asyncio.Event()
+
+    async def wait(request):
+        calls.append(request.params)
+        await event.wait()
+
+        return request.params
+
+    rpc_context.rpc.add_methods(('', wait))
+    rpc_context.rpc.add_topics('topic')
+
+    client = JsonRpcClient(reconnect=True, reconnect_delay=0.01)
+
+    await client.connect(rpc_context.host, rpc_context.port,
+                         url=rpc_context.url)
+
+    notifications = asyncio.Queue()
+
+    async def handler(data):
+        await notifications.put(data['params'])
+
+    await client.subscribe('topic', handler)
+
+    idempotent_call = asyncio.ensure_future(
+        client.call('wait', 'idempotent', timeout=None, idempotent=True))
+
+    other_call = asyncio.ensure_future(
+        client.call('wait', 'other', timeout=None))
+
+    await asyncio.sleep(0.1)
+    assert sorted(calls) == ['idempotent', 'other']
+
+    # drop the connection on the server side
+    await rpc_context.rpc.clients[0].ws.close()
+
+    with pytest.raises(ConnectionError):
+        await other_call
+
+    event.set()
+
+    assert await asyncio.wait_for(idempotent_call, 1) == 'idempotent'
+    assert calls.count('idempotent') == 2
+
+    # subscriptions were restored
+    assert await client.get_subscriptions() == ['topic']
+
+    await rpc_context.rpc.notify('topic', 'foo')
+    assert await asyncio.wait_for(notifications.get(), 1) == 'foo'
+
+    await client.disconnect()
+    assert not hasattr(client, '_ws')
+
+
+async def test_client_disconnect_while_reconnecting(
+        rpc_context, unused_tcp_port_factory, monkeypatch):
+
+    # no jitter
+    monkeypatch.setattr('random.uniform', lambda a, b: b)
+
+    client = JsonRpcClient(reconnect=True, reconnect_delay=0.5,
+                           reconnect_attempts=1)
+
+    await client.connect(rpc_context.host, rpc_context.port,
+                         url=rpc_context.url)
+
+    def break_connection():
+        # nothing listens on the new port, so reconnecting fails
+        url = client._connect_kwargs['url']
+        client._connect_kwargs['url'] = url.with_port(
+            unused_tcp_port_factory())
+
+        return rpc_context.rpc.clients[0].ws.close()
+
+    await break_connection()
+    await asyncio.sleep(0.1)
+
+    # calls wait for the connection to come back
+    assert client._reconnect_task is not None
+    call = asyncio.ensure_future(client.call('get_topics', timeout=None))
+    await asyncio.sleep(0.1)
+
+    assert not call.done()
+
+    # until reconnecting gives up
+    with pytest.raises(ConnectionError):
+        await asyncio.wait_for(call, 2)
+
+    with pytest.raises(ConnectionError):
+        await client.call('get_topics')
+
+    await client.disconnect()
+
+    # disconnect() works while reconnecting too
+    await client.connect(rpc_context.host, rpc_context.port,
+                         url=rpc_context.url)
+
+    await break_connection()
+    await asyncio.sleep(0.1)
+
+    assert client._reconnect_task is not None
+
+    await client.disconnect()
+
+    assert client._reconnect_task is None
+    assert not hasattr(client, '_ws')
+
+
+async def test_client_connection_lost(rpc_context):
+    async def ping(request):
+        return 'pong'
+
+    rpc_context.rpc.add_methods(('', ping))
+
+    url = 'ws://{host}:{port}{url}'.format(
+        host=rpc_context.host, port=rpc_context.port, url=rpc_context.url)
+
+    client = JsonRpcClient(url=url)
+    assert await client.call('ping') == 'pong'
+
+    await rpc_context.rpc.clients[0].ws.close()
+    await asyncio.sleep(0.1)
+
+    # auto_connect opens a new connection
+    assert not hasattr(client, '_ws')
+    assert await client.call('ping') == 'pong'
+
+    await client.disconnect()
+
+
+async def test_client_concurrent_handlers(rpc_context):
+    rpc_context.rpc.add_topics('slow', 'fast')
+    event = asyncio.Event()
+
+    async def ping(request):
+        return 'pong'
+
+    rpc_context.rpc.add_methods(('', ping))
+
+    client = JsonRpcClient(max_handlers=2)
+
+    await client.connect(rpc_context.host, rpc_context.port,
+                         url=rpc_context.url)
+
+    slow = []
+    fast = asyncio.Queue()
+
+    async def slow_handler(data):
+        await event.wait()
+        slow.append(data['params'])
+
+    async def fast_handler(data):
+        await fast.put(data['params'])
+
+    await client.subscribe('slow', slow_handler)
+    await client.subscribe('fast', fast_handler)
+
+    for i in range(3):
+        await rpc_context.rpc.notify('slow', i)
+
+    await rpc_context.rpc.notify('fast', 'foo')
+
+    # neither results nor other topics wait for the blocked handler
+    assert await client.call('ping') == 'pong'
+    assert await asyncio.wait_for(fast.get(), 1) == 'foo'
+    assert slow == []
+
+    event.set()
+    await asyncio.sleep(0.1)
+
+    # notifications of one topic get handled in order
+    assert slow == [0, 1, 2]
+
+    await client.disconnect()
+    assert client._handler_tasks == []
+
+
+async def test_client_streams(rpc_context):
+    rpc_context.rpc.add_topics('topic')
+
+    client = await rpc_context.make_client()
+
+    handler_calls = []
+
+    async def handler(data):
+        handler_calls.append(data['params'])
+
+    await client.subscribe('topic', handler)
+
+    async with client.stream('topic', maxsize=2) as stream1, \
+            client.stream('topic', overflow='drop_newest',
+                          maxsize=2) as stream2:
+
+        for i in range(3):
+            await rpc_context.rpc.notify('topic', i)
+
+        await asyncio.sleep(0.1)
+
+        assert [await stream1.__anext__() for _ in range(2)] == [1, 2]
+        assert [await stream2.__anext__() for _ in range(2)] == [0, 1]
+        assert stream1.dropped == stream2.dropped == 1
+        assert handler_calls == [0, 1, 2]
+
+        # the handler is gone, but the streams still need the subscription
+        assert 'topic' in await client.unsubscribe('topic')
+
+    assert 'topic' not in await client.get_subscriptions()
+
+    with pytest.raises(ValueError):
+        client.stream('topic', overflow='foo')
+
+
+async def test_client_stream_iteration(rpc_context):
+    rpc_context.rpc.add_topics('topic')
+
+    client = await rpc_context.make_client()
+    stream = client.stream('topic', overflow='block', maxsize=1)
+    received = []
+
+    async def consume():
+        async for params in stream:
+            received.append(params)
+
+            if params == 2:
+                await stream.close()
+
+    task = asyncio.ensure_future(consume())
+    await asyncio.sleep(0.1)
+    assert 'topic' in await client.get_subscriptions()
+
+    for i in range(3):
+        await rpc_context.rpc.notify('topic', i)
+
+    await asyncio.wait_for(task, 1)
+
+    assert received == [0, 1, 2]
+    assert stream.dropped == 0
+    assert 'topic' not in await client.get_subscriptions()
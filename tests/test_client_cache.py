@@ -0,0 +1,129 @@
+import asyncio
+import pytest
+
+from aiohttp_json_rpc.pytest import gen_rpc_context
+from aiohttp_json_rpc import JsonRpc, JsonRpcClient
+
+
+@pytest.fixture
+def cache_rpc_context(event_loop, unused_tcp_port):
+    rpc = JsonRpc(loop=event_loop, cache_invalidation=True)
+    rpc_route = ('*', '/rpc', rpc.handle_request)
+
+    for context in gen_rpc_context(event_loop, 'localhost', unused_tcp_port,
+                                   rpc, rpc_route):
+        yield context
+
+
+def gen_methods(context, calls):
+    async def get_a(request):
+        calls.append(('a', request.params))
+
+        return len(calls)
+
+    async def get_b(request):
+        calls.append(('b', request.params))
+
+        return len(calls)
+
+    context.rpc.add_methods(('', get_a), ('', get_b))
+
+
+@pytest.mark.asyncio
+async def test_client_cache(cache_rpc_context):
+    context = cache_rpc_context
+    calls = []
+    gen_methods(context, calls)
+
+    client = JsonRpcClient(cached_methods=['get_a', 'get_b'])
+    await client.connect(context.host, context.port, url=context.url)
+
+    assert await client.call('get_a', {'x': 1, 'y': 2}) == 1
+    assert await client.call('get_a', {'y': 2, 'x': 1}) == 1
+    assert await client.call('get_a', {'x': 2}) == 2
+    assert await client.call('get_b') == 3
+    assert len(calls) == 3
+
+    # invalidate one method
+    await context.rpc.invalidate_cache('get_a')
+    await asyncio.sleep(0.1)
+
+    assert await client.call('get_a', {'x': 1, 'y': 2}) == 4
+    assert await client.call('get_b') == 3
+
+    # invalidate all methods
+    await context.rpc.invalidate_cache()
+    await asyncio.sleep(0.1)
+
+    assert await client.call('get_a', {'x': 1, 'y': 2}) == 5
+    assert await client.call('get_b') == 6
+
+    await client.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_client_cache_copies(cache_rpc_context):
+    context = cache_rpc_context
+
+    async def get_list(request):
+        return [1, 2]
+
+    context.rpc.add_methods(('', get_list))
+
+    client = JsonRpcClient(cached_methods=['get_list'])
+    await client.connect(context.host, context.port, url=context.url)
+
+    # changing results doesn't change the cache
+    result = await client.call('get_list')
+    result.append(3)
+
+    result = await client.call('get_list')
+    assert result == [1, 2]
+    result.append(3)
+
+    assert await client.call('get_list') == [1, 2]
+
+    await client.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_client_cache_missed_invalidations(cache_rpc_context):
+    context = cache_rpc_context
+    calls = []
+    gen_methods(context, calls)
+
+    client = JsonRpcClient(cached_methods=['get_a', 'get_b'])
+    await client.connect(context.host, context.port, url=context.url)
+
+    assert await client.call('get_a') == 1
+    assert await client.call('get_b') == 2
+
+    # a skipped version invalidates everything
+    await client._handle_cache_invalidation(
+        {'params': {'version': 2, 'methods': ['get_a']}})
+
+    assert await client.call('get_b') == 3
+
+    await client.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_cache_invalidation_disabled(rpc_context):
+    with pytest.raises(RuntimeError):
+        await rpc_context.rpc.invalidate_cache()
+
+    calls = []
+    gen_methods(rpc_context, calls)
+
+    # without server support results only expire by ttl
+    client = JsonRpcClient(cached_methods=['get_a'], cache_ttl=0.1)
+    await client.connect(rpc_context.host, rpc_context.port,
+                         url=rpc_context.url)
+
+    assert await client.call('get_a') == 1
+    assert await client.call('get_a') == 1
+
+    await asyncio.sleep(0.2)
+    assert await client.call('get_a') == 2
+
+    await client.disconnect()
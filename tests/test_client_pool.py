@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+from aiohttp_json_rpc import JsonRpcClientPool
+
+
+pytestmark = pytest.mark.asyncio(reason='Depends on asyncio')
+
+
+def gen_url(rpc_context):
+    return 'ws://{host}:{port}{url}'.format(
+        host=rpc_context.host, port=rpc_context.port, url=rpc_context.url)
+
+
+async def test_least_outstanding(rpc_context):
+    event = asyncio.Event()
+
+    async def wait(request):
+        await event.wait()
+
+        return 'done'
+
+    rpc_context.rpc.add_methods(('', wait))
+
+    pool = JsonRpcClientPool(gen_url(rpc_context), connections_per_endpoint=3)
+    await pool.connect()
+
+    futures = [asyncio.ensure_future(pool.call('wait')) for _ in range(3)]
+    await asyncio.sleep(0.1)
+
+    assert [i['outstanding'] for i in pool.get_stats()] == [1, 1, 1]
+
+    event.set()
+
+    assert await asyncio.gather(*futures) == ['done'] * 3
+    assert [i['calls'] for i in pool.get_stats()] == [1, 1, 1]
+
+    # sequential calls tie and get spread round-robin
+    for _ in range(3):
+        assert await pool.call('wait') == 'done'
+
+    assert [i['calls'] for i in pool.get_stats()] == [2, 2, 2]
+
+    await pool.disconnect()
+
+
+async def test_ewma(rpc_context):
+    async def ping(request):
+        return 'pong'
+
+    rpc_context.rpc.add_methods(('', ping))
+
+    pool = JsonRpcClientPool(gen_url(rpc_context), connections_per_endpoint=2,
+                             strategy='ewma')
+
+    await pool.connect()
+
+    for _ in range(4):
+        assert await pool.call('ping') == 'pong'
+
+    assert all(i['latency'] is not None for i in pool.get_stats())
+
+    await pool.disconnect()
+
+    with pytest.raises(ValueError):
+        JsonRpcClientPool(gen_url(rpc_context), strategy='random')
+
+
+async def test_unhealthy_endpoints(rpc_context, unused_tcp_port_factory):
+    async def ping(request):
+        return 'pong'
+
+    rpc_context.rpc.add_methods(('', ping))
+
+    bad_url = 'ws://localhost:{}/rpc'.format(unused_tcp_port_factory())
+
+    # no endpoint reachable
+    pool = JsonRpcClientPool(bad_url)
+
+    with pytest.raises(ConnectionError):
+        await pool.connect()
+
+    # one endpoint reachable
+    pool = JsonRpcClientPool([bad_url, gen_url(rpc_context)],
+                             retry_interval=60)
+
+    await pool.connect()
+
+    for _ in range(3):
+        assert await pool.call('ping') == 'pong'
+
+    bad, good = pool.get_stats()
+
+    assert not bad['healthy'] and bad['calls'] == 0
+    assert good['healthy'] and good['calls'] == 3
+
+    await pool.disconnect()
+
+
+async def test_subscriptions_move_to_healthy_connections(rpc_context):
+    rpc_context.rpc.add_topics('topic')
+
+    pool = JsonRpcClientPool(gen_url(rpc_context), connections_per_endpoint=2)
+    await pool.connect()
+
+    notifications = asyncio.Queue()
+
+    async def handler(data):
+        await notifications.put(data['params'])
+
+    assert 'topic' in await pool.subscribe('topic', handler)
+
+    member = [i for i in pool._members if 'topic' in i.topics][0]
+    await member.client._ws.close()
+
+    # the next call detects the closed connection and moves the
+    # subscription
+    await pool.get_subscriptions()
+    await asyncio.sleep(0.1)
+
+    assert not member.healthy
+    assert 'topic' not in member.topics
+    assert await pool.get_subscriptions() == ['topic']
+
+    await rpc_context.rpc.notify('topic', 'foo')
+
+    assert await asyncio.wait_for(notifications.get(), 1) == 'foo'
+
+    assert 'topic' not in await pool.unsubscribe('topic')
+    assert await pool.get_subscriptions() == []
+
+    await pool.disconnect()
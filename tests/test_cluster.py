@@ -0,0 +1,206 @@
+import subprocess
+import textwrap
+import asyncio
+import socket
+import time
+import sys
+
+import pytest
+
+from aiohttp_json_rpc.cluster import PubSubHub, UnixSocketBroker
+from aiohttp_json_rpc.pytest import gen_rpc_context
+from aiohttp_json_rpc import JsonRpc, JsonRpcClient
+
+
+@pytest.fixture
+def hub_rpc_contexts(event_loop, unused_tcp_port_factory, tmp_path):
+    hub = PubSubHub(str(tmp_path / 'hub.sock'))
+    event_loop.run_until_complete(hub.start())
+
+    contexts = []
+    generators = []
+
+    for _ in range(2):
+        rpc = JsonRpc(loop=event_loop)
+        rpc.add_topics('foo')
+
+        generator = gen_rpc_context(
+            event_loop, 'localhost', unused_tcp_port_factory(), rpc,
+            ('*', '/rpc', rpc.handle_request))
+
+        context = next(generator)
+        context.broker = UnixSocketBroker(hub.path)
+        event_loop.run_until_complete(context.broker.connect(rpc))
+
+        contexts.append(context)
+        generators.append(generator)
+
+    yield hub, contexts
+
+    for context, generator in zip(contexts, generators):
+        event_loop.run_until_complete(context.broker.close())
+
+        for _ in generator:
+            pass
+
+    event_loop.run_until_complete(hub.stop())
+
+
+@pytest.mark.asyncio
+async def test_pub_sub_hub(hub_rpc_contexts):
+    hub, (context1, context2) = hub_rpc_contexts
+    notifications = []
+
+    async def handler(data):
+        notifications.append(data['params'])
+
+    client1 = await context1.make_client()
+    client2 = await context2.make_client()
+
+    await client1.subscribe('foo', handler)
+    await client2.subscribe('foo', handler)
+
+    # notifications reach the clients of all processes
+    await context1.rpc.notify('foo', 1)
+    await context2.rpc.notify('foo', 2, state=True)
+    await asyncio.sleep(0.1)
+
+    assert sorted(notifications) == [1, 1, 2, 2]
+    assert context1.rpc.state == context2.rpc.state == {'foo': 2}
+    assert hub.state == {'foo': 2}
+
+    # topics that get added at runtime
+    context1.rpc.add_topics('bar')
+    await asyncio.sleep(0.1)
+
+    assert 'bar' in context2.rpc.topics
+
+    # late processes get state and topics from the hub
+    rpc = JsonRpc()
+    broker = UnixSocketBroker(hub.path)
+    await broker.connect(rpc)
+    await asyncio.sleep(0.1)
+
+    assert rpc.state == {'foo': 2}
+    assert 'bar' in rpc.topics
+
+    await broker.close()
+
+
+@pytest.mark.asyncio
+async def test_hub_reconnect(hub_rpc_contexts):
+    hub, (context1, context2) = hub_rpc_contexts
+    notifications = []
+
+    for context in (context1, context2):
+        context.broker.reconnect_delay = 0.01
+
+    async def handler(data):
+        notifications.append(data['params'])
+
+    client = await context2.make_client()
+    await client.subscribe('foo', handler)
+
+    # restart the hub
+    await hub.stop()
+    await asyncio.sleep(0.1)
+
+    # notifications get dropped while the hub is gone
+    await context1.rpc.notify('foo', 1)
+
+    await hub.start()
+    await asyncio.sleep(0.2)
+
+    await context1.rpc.notify('foo', 2)
+    await asyncio.sleep(0.1)
+
+    assert notifications == [2]
+
+
+CLUSTER_SCRIPT = """
+import os
+
+from aiohttp_json_rpc.cluster import run_cluster
+from aiohttp_json_rpc import JsonRpc
+
+
+def setup(loop):
+    rpc = JsonRpc(loop=loop)
+    rpc.add_topics('foo')
+
+    async def pid(request):
+        return os.getpid()
+
+    async def publish(request):
+        await request.rpc.notify('foo', os.getpid())
+
+    rpc.add_methods(('', pid), ('', publish))
+
+    return rpc
+
+
+run_cluster(setup, port={port}, workers=2)
+"""
+
+
+@pytest.mark.skipif(not hasattr(socket, 'SO_REUSEPORT'),
+                    reason='SO_REUSEPORT is not available')
+@pytest.mark.asyncio
+async def test_run_cluster(unused_tcp_port):
+    process = subprocess.Popen([
+        sys.executable, '-c',
+        textwrap.dedent(CLUSTER_SCRIPT).format(port=unused_tcp_port),
+    ])
+
+    clients = []
+
+    try:
+        # wait for the workers
+        start = time.monotonic()
+
+        while True:
+            try:
+                socket.create_connection(('localhost', unused_tcp_port),
+                                         timeout=1).close()
+
+                break
+
+            except OSError:
+                assert time.monotonic() - start < 10
+
+                await asyncio.sleep(0.1)
+
+        # the kernel spreads connections over both workers
+        clients_by_pid = {}
+
+        for _ in range(32):
+            client = JsonRpcClient()
+            await client.connect('localhost', unused_tcp_port, url='/rpc')
+            clients.append(client)
+
+            clients_by_pid[await client.call('pid')] = client
+
+            if len(clients_by_pid) == 2:
+                break
+
+        assert len(clients_by_pid) == 2
+
+        # notifications reach the clients of all workers
+        notifications = []
+        client1, client2 = clients_by_pid.values()
+
+        async def handler(data):
+            notifications.append(data['params'])
+
+        await client1.subscribe('foo', handler)
+        await client2.call('publish')
+        await asyncio.sleep(0.2)
+
+        assert notifications == [await client2.call('pid')]
+
+    finally:
+        for client in clients:
+            await client.disconnect()
+
+        process.terminate()
+        assert process.wait(timeout=10) == 0
@@ -144,3 +144,88 @@ async def test_generic_orm_change(django_rpc_context, django_staff_user,
     }))[0]
 
     assert change_item['number'] == item['number'] + 1
+
+
+@pytest.mark.asyncio
+async def test_generic_orm_view_fields(django_rpc_context, django_staff_user,
+                                       items):
+
+    client = await django_rpc_context.make_client()
+
+    assert await client.call('login', {
+        'username': 'admin',
+        'password': 'admin',
+    })
+
+    items = await client.call('db__django_project.view_item', {
+        'number__lt': 2,
+        '_fields': ['number'],
+    })
+
+    assert len(items) == 2
+    assert sorted(items[0].keys()) == ['number', 'pk']
+
+
+@pytest.mark.asyncio
+async def test_generic_orm_view_cache(django_rpc_context, django_staff_user,
+                                      items):
+
+    from aiohttp_json_rpc.auth.django import DjangoAuthBackend
+    from django_project.models import Item
+
+    django_rpc_context.rpc.auth_backend = DjangoAuthBackend(
+        generic_orm_methods=True,
+        cached_models=['django_project.Item'],
+    )
+
+    cache = django_rpc_context.rpc.auth_backend.view_caches[Item]
+    client = await django_rpc_context.make_client()
+
+    assert await client.call('login', {
+        'username': 'admin',
+        'password': 'admin',
+    })
+
+    assert len(await client.call('db__django_project.view_item')) == 10
+    assert len(await client.call('db__django_project.view_item')) == 10
+    assert cache.cache.hits == 1
+
+    # invalidation
+    await client.call('db__django_project.add_item', {
+        'client_id': 100,
+        'number': 100,
+    })
+
+    assert len(await client.call('db__django_project.view_item')) == 11
+
+    # field lists get validated before they become part of the cache key
+    from aiohttp_json_rpc import RpcInvalidParamsError
+
+    for fields in ('number', [['number']], ['unknown']):
+        with pytest.raises(RpcInvalidParamsError):
+            await client.call('db__django_project.view_item', {
+                '_fields': fields,
+            })
+
+
+def test_resume_with_revoked_permission(db):
+    from aiohttp_json_rpc.auth.django import DjangoAuthBackend
+    from django.contrib.auth.models import Permission
+    from django.contrib.auth import get_user_model
+    from types import SimpleNamespace
+
+    permission = Permission.objects.get(codename='view_item')
+    user = get_user_model().objects.create(username='user', is_active=True)
+    user.user_permissions.add(permission)
+
+    backend = DjangoAuthBackend()
+    identity = backend.dump_identity(SimpleNamespace(user=user))
+
+    assert backend._get_user_by_identity(identity).has_perm(
+        'django_project.view_item')
+
+    # permissions get read again on resumption
+    user.user_permissions.remove(permission)
+
+    assert not backend._get_user_by_identity(identity).has_perm(
+        'django_project.view_item')
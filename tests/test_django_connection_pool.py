@@ -0,0 +1,150 @@
+import asyncio
+import pytest
+
+from aiohttp_json_rpc.django import (
+    ConnectionPoolExhaustedError,
+    acquire_db_connections,
+    ConnectionPool,
+    _current_task,
+)
+
+
+class FakeConnection:
+    def __init__(self, in_atomic_block=False):
+        self.in_atomic_block = in_atomic_block
+        self.connection = None
+        self.autocommit = True
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def close_if_unusable_or_obsolete(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_connection_reuse():
+    pool = ConnectionPool()
+    connections = []
+
+    async def task():
+        storage = pool.get_storage(_current_task())
+
+        if not hasattr(storage, 'default'):
+            storage.default = FakeConnection()
+
+        connections.append(storage.default)
+
+    # connections get released in a done callback of the task
+    await asyncio.ensure_future(task())
+    await asyncio.sleep(0)
+
+    await asyncio.ensure_future(task())
+    await asyncio.sleep(0)
+
+    assert connections[0] is connections[1]
+    assert pool.get_stats()['leased'] == 0
+    assert pool.get_stats()['idle'] == 1
+
+
+@pytest.mark.asyncio
+async def test_open_transactions_get_discarded():
+    pool = ConnectionPool()
+    connection = FakeConnection(in_atomic_block=True)
+
+    async def task():
+        await pool.acquire()
+        storage = pool.get_storage(_current_task())
+        storage.default = connection
+
+    await asyncio.ensure_future(task())
+    await asyncio.sleep(0)
+
+    assert connection.closed
+    assert pool.get_stats()['idle'] == 0
+    assert pool.get_stats()['discarded'] == 1
+
+
+@pytest.mark.asyncio
+async def test_bounded_pool():
+    pool = ConnectionPool(max_connections=1)
+    release = asyncio.Future()
+
+    async def holder():
+        await pool.acquire()
+        await release
+
+    async def waiter():
+        await pool.acquire()
+
+        return pool.get_storage(_current_task(), lease=False)
+
+    async def greedy():
+        pool.get_storage(_current_task())
+
+    holder_task = asyncio.ensure_future(holder())
+    await asyncio.sleep(0)
+
+    with pytest.raises(ConnectionPoolExhaustedError):
+        await asyncio.ensure_future(greedy())
+
+    waiter_task = asyncio.ensure_future(waiter())
+    await asyncio.sleep(0)
+
+    assert pool.get_stats()['waiting'] == 1
+
+    release.set_result(None)
+    await holder_task
+
+    assert await asyncio.wait_for(waiter_task, 1) is not None
+    await asyncio.sleep(0)
+
+    stats = pool.get_stats()
+
+    assert stats['leased'] == 0
+    assert stats['waits'] == 1
+    assert stats['wait_time_max'] > 0
+
+
+@pytest.mark.asyncio
+async def test_bounded_pool_dispatch(rpc_context, monkeypatch):
+    import aiohttp_json_rpc.django
+
+    pool = ConnectionPool(max_connections=2)
+    monkeypatch.setattr(aiohttp_json_rpc.django, 'connection_pool', pool)
+
+    running = []
+    max_running = []
+
+    async def query(request):
+        await acquire_db_connections()
+
+        # raises ConnectionPoolExhaustedError without a lease
+        pool.get_storage(_current_task())
+
+        running.append(request)
+        max_running.append(len(running))
+
+        await asyncio.sleep(0.05)
+        running.remove(request)
+
+        return True
+
+    rpc_context.rpc.add_methods(('', query))
+    client = await rpc_context.make_client()
+
+    assert await asyncio.gather(
+        *[client.call('query') for _ in range(5)]) == [True] * 5
+
+    stats = pool.get_stats()
+
+    assert max(max_running) == 2
+    assert stats['waits'] == 3
+    assert stats['wait_time_max'] > 0
+
+    # methods that don't use the ORM don't take connections
+    assert await asyncio.gather(
+        *[client.call('get_methods') for _ in range(5)])
+
+    assert pool.get_stats()['leases'] == 5
@@ -0,0 +1,108 @@
+import asyncio
+import pytest
+
+pytestmark = pytest.mark.django(reason='Depends on Django')
+
+
+@pytest.mark.asyncio
+async def test_model_topics(django_rpc_context, django_staff_user):
+    from aiohttp_json_rpc.django.topics import ModelTopics
+    from django_project.models import Item
+
+    model_topics = ModelTopics(django_rpc_context.rpc)
+    topic = model_topics.register(Item)
+
+    # setup client
+    client = await django_rpc_context.make_client()
+
+    assert await client.call('login', {
+        'username': 'admin',
+        'password': 'admin',
+    })
+
+    message = asyncio.Future()
+
+    async def handler(data):
+        message.set_result(data)
+
+    await client.subscribe(topic, handler)
+
+    # run test
+    item = await django_rpc_context.rpc.worker_pool.run(
+        Item.objects.create, client_id=1, number=1)
+
+    await asyncio.wait_for(message, 1)
+
+    assert message.result()['params'] == {
+        'created': [item.pk],
+        'changed': [],
+        'deleted': [],
+    }
+
+    # unregistered models have no topics anymore
+    model_topics.unregister(Item)
+
+    assert topic not in django_rpc_context.rpc.topics
+    assert topic not in await client.get_topics()
+    assert topic not in await client.get_subscriptions()
+
+
+@pytest.mark.asyncio
+async def test_model_topics_coalescing(django_rpc_context, django_staff_user):
+    from aiohttp_json_rpc.django.topics import ModelTopics
+    from django_project.models import Item
+    from django.db import transaction
+
+    model_topics = ModelTopics(django_rpc_context.rpc, flush_interval=0.1)
+    topic = model_topics.register(Item)
+
+    # setup client
+    client = await django_rpc_context.make_client()
+
+    assert await client.call('login', {
+        'username': 'admin',
+        'password': 'admin',
+    })
+
+    messages = []
+
+    async def handler(data):
+        messages.append(data['params'])
+
+    await client.subscribe(topic, handler)
+
+    # run test
+    def change_items():
+        with transaction.atomic():
+            item = Item.objects.create(client_id=1, number=1)
+
+            # changes of rolled back savepoints are never sent
+            try:
+                with transaction.atomic():
+                    Item.objects.create(client_id=1, number=2)
+
+                    raise ValueError
+
+            except ValueError:
+                pass
+
+        # autocommit changes within the flush interval get coalesced
+        changed_item = Item.objects.create(client_id=1, number=3)
+
+        for number in range(3):
+            changed_item.number = number
+            changed_item.save()
+
+        return item, changed_item
+
+    item, changed_item = await django_rpc_context.rpc.worker_pool.run(
+        change_items)
+    await asyncio.sleep(0.3)
+
+    assert messages == [{
+        'created': [item.pk, changed_item.pk],
+        'changed': [],
+        'deleted': [],
+    }]
+
+    model_topics.unregister(Item)
@@ -0,0 +1,128 @@
+import threading
+
+import pytest
+
+from aiohttp_json_rpc.executors import AdaptiveThreadPoolExecutor
+
+
+class Clock:
+    def __init__(self):
+        self.time = 0
+
+    def __call__(self):
+        return self.time
+
+
+def gen_executor(**kwargs):
+    clock = Clock()
+    cpu_clock = Clock()
+
+    executor = AdaptiveThreadPoolExecutor(
+        interval=None, clock=clock, cpu_clock=cpu_clock, **kwargs)
+
+    return executor, clock, cpu_clock
+
+
+def test_grow_and_shrink():
+    executor, clock, cpu_clock = gen_executor(min_workers=1, max_workers=8)
+    event = threading.Event()
+
+    futures = [executor.submit(event.wait) for _ in range(4)]
+
+    # calls wait in the queue
+    clock.time += 1
+    assert executor.adjust() == 'grow'
+    assert executor.workers == 2
+
+    event.set()
+    assert [i.result() for i in futures] == [True] * 4
+
+    # the queued calls waited a second on average, the growth helped
+    clock.time += 1
+    assert executor.adjust() == 'grow'
+    assert executor.workers == 3
+
+    # threads that were idle the whole interval get removed at once
+    clock.time += 1
+    assert executor.adjust() == 'shrink'
+    assert executor.workers == 1
+
+    clock.time += 1
+    assert executor.adjust() == 'hold'
+    assert executor.workers == 1
+
+    stats = executor.get_stats()
+    assert stats['grows'] == 2
+    assert stats['shrinks'] == 1
+    assert stats['decisions'][-1]['action'] == 'hold'
+
+    executor.shutdown()
+
+
+def test_cpu_limit_and_revert():
+    executor, clock, cpu_clock = gen_executor(min_workers=1, max_workers=8,
+                                              cooldown=1)
+
+    event = threading.Event()
+    futures = [executor.submit(event.wait) for _ in range(4)]
+
+    # the process is busy using one core
+    clock.time += 1
+    cpu_clock.time += 1
+    assert executor.adjust() == 'hold'
+    assert executor.decisions[-1]['reason'] == 'cpu'
+
+    # growing without throughput gain gets reverted
+    clock.time += 1
+    assert executor.adjust() == 'grow'
+    assert executor.workers == 2
+
+    clock.time += 1
+    assert executor.adjust() == 'shrink'
+    assert executor.decisions[-1]['reason'] == 'no throughput gain'
+
+    clock.time += 1
+    assert executor.adjust() == 'hold'
+    assert executor.decisions[-1]['reason'] == 'cooldown'
+
+    event.set()
+    assert [i.result() for i in futures] == [True] * 4
+
+    executor.shutdown()
+
+    with pytest.raises(RuntimeError):
+        executor.submit(print)
+
+
+def test_revert_whole_growth():
+    executor, clock, cpu_clock = gen_executor(min_workers=8, max_workers=16)
+
+    event = threading.Event()
+    futures = [executor.submit(event.wait) for _ in range(16)]
+
+    clock.time += 1
+    assert executor.adjust() == 'grow'
+    assert executor.workers == 10
+
+    # all threads of the growth get removed again
+    clock.time += 1
+    assert executor.adjust() == 'shrink'
+    assert executor.decisions[-1]['reason'] == 'no throughput gain'
+    assert executor.workers == 8
+
+    event.set()
+    assert [i.result() for i in futures] == [True] * 16
+
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_adaptive_worker_pool(event_loop):
+    from aiohttp_json_rpc.threading import ThreadedWorkerPool
+
+    pool = ThreadedWorkerPool(max_workers=4, adaptive=True, loop=event_loop)
+
+    assert isinstance(pool.executor, AdaptiveThreadPoolExecutor)
+    assert await pool.run(lambda: 'foo') == 'foo'
+
+    pool.shutdown()
@@ -1,6 +1,22 @@
-import pytest
+import threading
+import asyncio
 import logging
 
+import pytest
+
+from aiohttp_json_rpc.pytest import gen_rpc_context
+from aiohttp_json_rpc import JsonRpc
+
+
+@pytest.fixture
+def single_worker_rpc_context(event_loop, unused_tcp_port):
+    rpc = JsonRpc(loop=event_loop, max_workers=1)
+    rpc_route = ('*', '/rpc', rpc.handle_request)
+
+    for context in gen_rpc_context(event_loop, 'localhost', unused_tcp_port,
+                                   rpc, rpc_route):
+        yield context
+
 
 @pytest.mark.asyncio
 async def test_confirmation(rpc_context):
@@ -23,3 +39,60 @@ async def test_confirmation(rpc_context):
 
     # run test
     assert await client.call('test_method')
+
+
+@pytest.mark.asyncio
+async def test_confirmation_in_sync_methods(single_worker_rpc_context):
+    context = single_worker_rpc_context
+    threads = set()
+
+    # setup rpc
+    def delete(request):
+        threads.add(threading.get_ident())
+
+        if not (yield request.confirm('delete?', timeout=1)):
+            return 'kept'
+
+        threads.add(threading.get_ident())
+
+        try:
+            yield request.confirm('really?', timeout=0.2)
+
+        except asyncio.TimeoutError:
+            return 'timeout'
+
+    def ping():
+        return 'pong'
+
+    context.rpc.add_methods(('', delete), ('', ping))
+
+    # setup client
+    answers = [True, False]
+
+    async def confirm(params):
+        await asyncio.sleep(0.1)
+
+        if params['message'] == 'really?':
+            await asyncio.sleep(0.5)
+
+        return answers.pop(0)
+
+    client = await context.make_client()
+    client.add_methods(('', confirm))
+
+    # clients handle requests one at a time, so a second client pings
+    ping_client = await context.make_client()
+
+    # run test
+    calls = asyncio.ensure_future(asyncio.gather(
+        client.call('delete', timeout=3),
+        client.call('delete', timeout=3),
+    ))
+
+    await asyncio.sleep(0.05)
+
+    # waiting for confirmations does not occupy the only worker
+    assert await ping_client.call('ping', timeout=0.05) == 'pong'
+
+    assert sorted(await calls) == ['kept', 'timeout']
+    assert threading.get_ident() not in threads
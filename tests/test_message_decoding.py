@@ -106,3 +106,35 @@ def test_invalid_error():
 
     with pytest.raises(RpcInvalidRequestError):
         decode_msg(raw_msg)
+
+
+def test_batch():
+    from aiohttp_json_rpc.protocol import JsonRpcMsgTyp, decode_msgs
+    from aiohttp_json_rpc import RpcInvalidRequestError
+
+    raw_msg = '''
+    [
+        {"jsonrpc": "2.0", "id": 0, "method": "foo"},
+        {"jsonrpc": "2.0", "method": "bar"},
+        {"foo": "bar"},
+        1
+    ]
+    '''
+
+    is_batch, msgs = decode_msgs(raw_msg)
+
+    assert is_batch
+    assert msgs[0].type == JsonRpcMsgTyp.REQUEST
+    assert msgs[1].type == JsonRpcMsgTyp.NOTIFICATION
+    assert isinstance(msgs[2], RpcInvalidRequestError)
+    assert isinstance(msgs[3], RpcInvalidRequestError)
+
+    # single messages
+    is_batch, msgs = decode_msgs('{"jsonrpc": "2.0", "id": 0, "result": 1}')
+
+    assert not is_batch
+    assert msgs[0].type == JsonRpcMsgTyp.RESULT
+
+    # empty batches are invalid
+    with pytest.raises(RpcInvalidRequestError):
+        decode_msgs('[]')
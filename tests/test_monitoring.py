@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+import pytest
+
+from aiohttp_json_rpc.monitoring import BlockingMonitor
+from aiohttp_json_rpc.pytest import gen_rpc_context
+from aiohttp_json_rpc import JsonRpc
+
+
+@pytest.fixture
+def monitored_rpc_context(event_loop, unused_tcp_port):
+    monitor = BlockingMonitor(threshold=0.05, interval=0.01, offload_after=2)
+    rpc = JsonRpc(loop=event_loop, blocking_monitor=monitor)
+    rpc_route = ('*', '/rpc', rpc.handle_request)
+
+    for context in gen_rpc_context(event_loop, 'localhost', unused_tcp_port,
+                                   rpc, rpc_route):
+        yield context
+
+    rpc.worker_pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_blocking_monitor(monitored_rpc_context):
+    context = monitored_rpc_context
+    monitor = context.rpc.worker_pool.blocking_monitor
+
+    def block():
+        time.sleep(0.1)
+
+    def fast():
+        pass
+
+    context.rpc.add_methods(('', block), ('', fast))
+
+    client = await context.make_client()
+
+    await client.call('fast')
+
+    for _ in range(2):
+        await client.call('block')
+        await asyncio.sleep(0.05)
+
+    report = monitor.get_report()
+    block_stats, fast_stats = report['methods']
+
+    assert block_stats['name'].endswith('block')
+    assert block_stats['blocking_calls'] == 2
+    assert block_stats['loop_lags'] >= 1
+    assert block_stats['offloaded']
+    assert fast_stats['blocking_calls'] == 0
+    assert report['loop_lags'] >= 1
+
+    # offloaded methods don't block the loop anymore
+    lags = report['loop_lags']
+
+    await client.call('block')
+    await asyncio.sleep(0.05)
+
+    assert monitor.get_report()['loop_lags'] == lags
+    assert monitor.get_report()['methods'][0]['calls'] == 3
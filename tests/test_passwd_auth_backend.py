@@ -0,0 +1,192 @@
+from types import SimpleNamespace
+import asyncio
+import pytest
+
+from aiohttp_json_rpc.auth.passwd import PasswdAuthBackend
+from aiohttp_json_rpc.auth import login_required
+from aiohttp_json_rpc import JsonRpc
+from aiohttp_json_rpc.auth.passwd_stores import (
+    PasswdSqliteStore,
+    PasswdFileStore,
+    PasswdLogStore,
+)
+
+
+class FakeRpc:
+    methods = {}
+    topics = {}
+
+    def _index_subscriptions(self, http_request):
+        pass
+
+
+def gen_request(username, password):
+    return SimpleNamespace(
+        http_request=SimpleNamespace(rpc=FakeRpc()),
+        params={'username': username, 'password': password},
+    )
+
+
+@pytest.fixture
+def passwd_backend(tmpdir):
+    backend = PasswdAuthBackend(str(tmpdir.join('passwd')), hash_workers=1)
+    backend._create_user('admin', 'admin', rounds=1000)
+
+    yield backend
+
+    backend.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_login(passwd_backend):
+    request = gen_request('admin', 'admin')
+
+    assert await passwd_backend.login(request)
+    assert request.http_request.user == 'admin'
+    assert 'logout' in request.http_request.methods
+
+    assert not await passwd_backend.login(gen_request('admin', 'foo'))
+    assert not await passwd_backend.login(gen_request('foo', 'admin'))
+
+
+@pytest.mark.asyncio
+async def test_credential_cache(passwd_backend):
+    cache = passwd_backend._credential_cache
+
+    assert await passwd_backend.login(gen_request('admin', 'admin'))
+    assert await passwd_backend.login(gen_request('admin', 'admin'))
+    assert cache.hits == 1
+
+    # changing the password invalidates cached credentials
+    passwd_backend._set_password('admin', 'admin2', rounds=1000)
+
+    assert not await passwd_backend.login(gen_request('admin', 'admin'))
+    assert await passwd_backend.login(gen_request('admin', 'admin2'))
+
+
+@pytest.mark.parametrize('store_class', [
+    PasswdFileStore,
+    PasswdLogStore,
+    PasswdSqliteStore,
+])
+def test_stores(tmpdir, store_class):
+    path = str(tmpdir.join('passwd'))
+
+    backend = PasswdAuthBackend(store=store_class(path), hash_workers=0)
+    backend._create_user('admin', 'admin', rounds=1000)
+    backend._create_user('user1', 'user1', rounds=1000)
+    backend._create_user('user2', 'user2', rounds=1000)
+    backend._delete_user('user1')
+    backend._set_password('user2', 'password', rounds=1000)
+
+    assert not backend.reload()
+
+    # reload from disk
+    backend = PasswdAuthBackend(store=store_class(path), hash_workers=0)
+
+    assert sorted(backend.user.keys()) == ['admin', 'user2']
+    assert backend._login('user2', 'password')[0] == 'user2'
+
+    # external changes
+    other_backend = PasswdAuthBackend(store=store_class(path),
+                                      hash_workers=0)
+
+    other_backend._delete_user('admin')
+
+    assert backend.reload()
+    assert sorted(backend.user.keys()) == ['user2']
+
+
+def test_log_store_compaction(tmpdir):
+    path = str(tmpdir.join('passwd'))
+    store = PasswdLogStore(path, compact_factor=2, compact_min=4, fsync=False)
+    data = {
+        'password_hash': b'hash',
+        'salt': b'salt',
+        'rounds': 1,
+        'permissions': set(),
+    }
+
+    store.load()
+
+    for i in range(4):
+        store.set_user('admin', data)
+
+    with open(path, 'r') as f:
+        assert len(f.readlines()) == 4
+
+    store.set_user('admin', data)
+
+    with open(path, 'r') as f:
+        assert len(f.readlines()) == 1
+
+    # torn writes get ignored
+    with open(path, 'a') as f:
+        f.write('-adm')
+
+    assert list(store.load().keys()) == ['admin']
+
+    # and cut off by the next append
+    with open(path, 'a') as f:
+        f.write('+user:abc')
+
+    assert list(store.load().keys()) == ['admin']
+
+    store.set_user('user', data)
+
+    assert sorted(PasswdLogStore(path).load().keys()) == ['admin', 'user']
+
+    # unparseable lines get skipped
+    with open(path, 'a') as f:
+        f.write('+broken:xyz:xyz:1:\n')
+
+    assert sorted(store.load().keys()) == ['admin', 'user']
+
+
+@pytest.mark.asyncio
+async def test_resume_request(passwd_backend):
+    request = gen_request('admin', 'admin')
+
+    assert await passwd_backend.login(request)
+
+    identity = passwd_backend.dump_identity(request.http_request)
+    http_request = SimpleNamespace(rpc=FakeRpc())
+
+    passwd_backend.resume_request(http_request, identity)
+
+    assert http_request.user == 'admin'
+    assert 'logout' in http_request.methods
+
+
+def test_topics(passwd_backend):
+    rpc = JsonRpc(cache_invalidation=True)
+    rpc.add_topics('public', ('private', login_required))
+
+    http_request = SimpleNamespace(rpc=rpc)
+    passwd_backend.prepare_request(http_request)
+
+    assert http_request.topics == {'public', 'rpc__cache_invalidation'}
+
+
+@pytest.mark.asyncio
+async def test_watch_store(tmpdir):
+    path = str(tmpdir.join('passwd'))
+
+    backend = PasswdAuthBackend(path, hash_workers=0, reload_interval=0.01)
+    rpc = JsonRpc(auth_backend=backend)
+    backend.prepare_request(SimpleNamespace(rpc=rpc))
+
+    task = backend._watch_task
+
+    # external changes get picked up
+    other_backend = PasswdAuthBackend(path, hash_workers=0)
+    other_backend._create_user('admin', 'admin', rounds=1000)
+    await asyncio.sleep(0.1)
+
+    assert 'admin' in backend.user
+
+    # the task ends with the JsonRpc
+    await rpc.shutdown()
+    await asyncio.sleep(0)
+
+    assert task.cancelled()
@@ -0,0 +1,107 @@
+import asyncio
+import time
+import os
+
+import pytest
+
+from aiohttp_json_rpc.rpc import JsonRpcMethod
+from aiohttp_json_rpc.pytest import gen_rpc_context
+from aiohttp_json_rpc import JsonRpc, process
+from aiohttp_json_rpc import processes
+
+
+@process
+def get_pid():
+    return os.getpid()
+
+
+@process
+def reverse(data):
+    return data[::-1]
+
+
+@process
+def sleep_and_dump(seconds, size):
+    time.sleep(seconds)
+
+    return 'x' * size
+
+
+@pytest.fixture
+def process_rpc_context(event_loop, unused_tcp_port):
+    rpc = JsonRpc(loop=event_loop, max_processes=2,
+                  shared_memory_threshold=1024)
+
+    rpc_route = ('*', '/rpc', rpc.handle_request)
+
+    for context in gen_rpc_context(event_loop, 'localhost', unused_tcp_port,
+                                   rpc, rpc_route):
+        yield context
+
+    rpc.worker_pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_process_methods(process_rpc_context):
+    process_rpc_context.rpc.add_methods(
+        ('', get_pid),
+        ('', reverse),
+    )
+
+    client = await process_rpc_context.make_client()
+
+    assert await client.call('get_pid') != os.getpid()
+    assert await client.call('reverse', ['abc']) == 'cba'
+
+    # transferred using shared memory
+    data = list(range(10000))
+    assert await client.call('reverse', [data], timeout=5) == data[::-1]
+
+
+@pytest.mark.skipif(processes.shared_memory is None,
+                    reason='shared memory is not available')
+def test_shared_memory_transfer():
+    small = processes.dump('foo', threshold=1024)
+    assert small[0] == processes.PICKLED
+    assert processes.load(small) == 'foo'
+
+    ref = processes.dump('x' * 2048, threshold=1024)
+    assert ref[0] == processes.SHARED_MEMORY
+    assert processes.load(ref) == 'x' * 2048
+
+    processes.release(ref)
+
+    with pytest.raises(FileNotFoundError):
+        processes.load(ref)
+
+
+@pytest.mark.skipif(processes.shared_memory is None or
+                    not os.path.isdir('/dev/shm'),
+                    reason='shared memory is not available')
+@pytest.mark.asyncio
+async def test_cancelled_process_call(process_rpc_context):
+    worker_pool = process_rpc_context.rpc.worker_pool
+    blocks = set(os.listdir('/dev/shm'))
+
+    # the result block gets created after the caller is gone
+    task = asyncio.ensure_future(worker_pool.run_in_process(
+        None, sleep_and_dump, seconds=0.2, size=4096))
+
+    await asyncio.sleep(0.1)
+    task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    await asyncio.sleep(0.5)
+
+    assert set(os.listdir('/dev/shm')) <= blocks
+
+
+def test_process_method_validation():
+    @process
+    def method(request):
+        pass
+
+    with pytest.raises(ValueError):
+        JsonRpcMethod(method)
@@ -12,6 +12,26 @@ async def test_add_topics(rpc_context):
     assert 'topic' in await client2.get_topics()
 
 
+@pytest.mark.asyncio
+async def test_remove_topics(rpc_context):
+    rpc = rpc_context.rpc
+    rpc.add_topics('topic', 'other')
+
+    async def dummy_handler(data):
+        pass
+
+    client = await rpc_context.make_client()
+    await client.subscribe('topic', dummy_handler)
+    await client.subscribe('other', dummy_handler)
+
+    rpc.remove_topics('topic')
+
+    assert 'topic' not in rpc.topics
+    assert await client.get_topics() == ['other']
+    assert await client.get_subscriptions() == ['other']
+    assert rpc.subscription_index.match('topic') == []
+
+
 @pytest.mark.asyncio
 async def test_subscribe(rpc_context):
     rpc_context.rpc.add_topics('topic')
@@ -131,3 +151,38 @@ async def test_notify_on_request(rpc_context, event_loop):
 
     assert result['method'] == 'topic'
     assert result['params'] == 'foo'
+
+
+@pytest.mark.asyncio
+async def test_notify_threadsafe(rpc_context, event_loop):
+    import threading
+    import asyncio
+
+    # setup rpc
+    rpc_context.rpc.add_topics('topic')
+
+    # setup client
+    messages = []
+    done = asyncio.Future()
+
+    async def handler(data):
+        messages.append(data['params'])
+
+        if len(messages) == 10:
+            done.set_result(True)
+
+    client = await rpc_context.make_client()
+    await client.subscribe('topic', handler)
+
+    # run test
+    def notify():
+        for i in range(10):
+            rpc_context.rpc.notify_threadsafe('topic', i)
+
+    thread = threading.Thread(target=notify)
+    thread.start()
+    thread.join()
+
+    await asyncio.wait_for(done, 1)
+
+    assert messages == list(range(10))
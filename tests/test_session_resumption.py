@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+
+from aiohttp_json_rpc.pytest import gen_rpc_context
+from aiohttp_json_rpc.resumption import ResumptionTokenSigner
+from aiohttp_json_rpc import JsonRpc
+
+
+@pytest.fixture
+def resumption_rpc_context(event_loop, unused_tcp_port):
+    rpc = JsonRpc(loop=event_loop, resumption_secret='secret')
+    rpc_route = ('*', '/rpc', rpc.handle_request)
+
+    for context in gen_rpc_context(event_loop, 'localhost', unused_tcp_port,
+                                   rpc, rpc_route):
+        yield context
+
+
+def test_signer():
+    signer = ResumptionTokenSigner('secret')
+    token = signer.dumps({'foo': 'bar'})
+
+    assert signer.loads(token) == {'foo': 'bar'}
+
+    with pytest.raises(ValueError):
+        ResumptionTokenSigner('other-secret').loads(token)
+
+    with pytest.raises(ValueError):
+        signer.loads(token[:-2])
+
+    with pytest.raises(ValueError):
+        ResumptionTokenSigner('secret', max_age=-1).loads(
+            ResumptionTokenSigner('secret', max_age=-1).dumps(None))
+
+
+@pytest.mark.asyncio
+async def test_resume_on_connect(resumption_rpc_context):
+    context = resumption_rpc_context
+    context.rpc.add_topics('topic1', 'topic2')
+    await context.rpc.notify('topic1', 'foo', state=True)
+
+    async def handler(data):
+        pass
+
+    client1 = await context.make_client()
+    await client1.subscribe('topic1', handler)
+    token = await client1.get_resumption_token()
+
+    # the state of resumed subscriptions gets replayed
+    message = asyncio.Future()
+
+    async def state_handler(data):
+        message.set_result(data)
+
+    client2 = await context.make_client()
+    await client2.disconnect()
+    client2._handler['topic1'] = state_handler
+
+    await client2.connect(context.host, context.port, url=context.url,
+                          resumption_token=token)
+
+    await asyncio.wait_for(message, 1)
+
+    assert message.result()['params'] == 'foo'
+    assert await client2.get_subscriptions() == ['topic1']
+
+    # invalid tokens get ignored
+    await client2.disconnect()
+
+    await client2.connect(context.host, context.port, url=context.url,
+                          resumption_token=token + 'x')
+
+    assert await client2.get_subscriptions() == []
+
+
+@pytest.mark.asyncio
+async def test_resume_method(resumption_rpc_context):
+    from aiohttp_json_rpc import RpcInvalidParamsError
+
+    context = resumption_rpc_context
+    context.rpc.add_topics('topic1')
+
+    async def handler(data):
+        pass
+
+    client1 = await context.make_client()
+    await client1.subscribe('topic1', handler)
+    token = await client1.get_resumption_token()
+
+    client2 = await context.make_client()
+
+    assert await client2.resume(token) == ['topic1']
+
+    with pytest.raises(RpcInvalidParamsError):
+        await client2.resume('foo')
@@ -0,0 +1,181 @@
+import subprocess
+import threading
+import textwrap
+import asyncio
+import socket
+import time
+import sys
+
+import pytest
+
+from aiohttp_json_rpc.brokers import InMemoryBroker
+from aiohttp_json_rpc.cluster import _start_server
+from aiohttp_json_rpc import JsonRpcClient
+
+
+@pytest.fixture
+def shard_loop():
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+
+    yield loop
+
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+@pytest.mark.asyncio
+async def test_shards(rpc_context, shard_loop, unused_tcp_port_factory):
+    rpc = rpc_context.rpc
+    rpc.add_topics('foo')
+
+    async def get_thread():
+        return threading.get_ident()
+
+    rpc.add_methods(('', get_thread))
+
+    broker = InMemoryBroker()
+    await broker.connect(rpc)
+
+    # run a shard on another loop
+    shard = rpc.create_shard(shard_loop)
+    shard_broker = InMemoryBroker(peer=broker)
+    port = unused_tcp_port_factory()
+
+    def run(coro):
+        return asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(coro, shard_loop))
+
+    await run(shard_broker.connect(shard))
+    runner = await run(_start_server(shard, 'localhost', port, '/rpc', ()))
+
+    # shards get copies of the registries
+    assert shard.methods == rpc.methods
+    assert shard.methods is not rpc.methods
+
+    # topics that get added at runtime reach all shards
+    rpc.add_topics('bar')
+    await asyncio.sleep(0.1)
+
+    assert 'bar' in shard.topics
+
+    client1 = await rpc_context.make_client()
+    client2 = JsonRpcClient()
+    await client2.connect('localhost', port, url='/rpc')
+
+    try:
+        assert (await client1.call('get_thread') !=
+                await client2.call('get_thread'))
+
+        # notifications reach the clients of all shards
+        notifications = []
+
+        async def handler(data):
+            notifications.append(data['params'])
+
+        await client1.subscribe('foo', handler)
+        await client2.subscribe('foo', handler)
+
+        await rpc.notify('foo', 1, state=True)
+        await run(shard.notify('foo', 2))
+        await asyncio.sleep(0.1)
+
+        assert sorted(notifications) == [1, 1, 2, 2]
+        assert shard.state == {'foo': 1}
+
+    finally:
+        await client2.disconnect()
+        await run(runner.cleanup())
+        await run(shard_broker.close())
+        await broker.close()
+
+
+SHARDED_SCRIPT = """
+import threading
+
+from aiohttp_json_rpc.cluster import run_sharded
+from aiohttp_json_rpc import JsonRpc
+
+
+def setup(loop):
+    rpc = JsonRpc(loop=loop)
+    rpc.add_topics('foo')
+
+    async def thread(request):
+        return threading.get_ident()
+
+    async def publish(request):
+        await request.rpc.notify('foo', threading.get_ident())
+
+    rpc.add_methods(('', thread), ('', publish))
+
+    return rpc
+
+
+run_sharded(setup, port={port}, shards=2)
+"""
+
+
+@pytest.mark.skipif(not hasattr(socket, 'SO_REUSEPORT'),
+                    reason='SO_REUSEPORT is not available')
+@pytest.mark.asyncio
+async def test_run_sharded(unused_tcp_port):
+    process = subprocess.Popen([
+        sys.executable, '-c',
+        textwrap.dedent(SHARDED_SCRIPT).format(port=unused_tcp_port),
+    ])
+
+    clients = []
+
+    try:
+        # wait for the server
+        start = time.monotonic()
+
+        while True:
+            try:
+                socket.create_connection(('localhost', unused_tcp_port),
+                                         timeout=1).close()
+
+                break
+
+            except OSError:
+                assert time.monotonic() - start < 10
+
+                await asyncio.sleep(0.1)
+
+        # the kernel spreads connections over both loops
+        clients_by_thread = {}
+
+        for _ in range(32):
+            client = JsonRpcClient()
+            await client.connect('localhost', unused_tcp_port, url='/rpc')
+            clients.append(client)
+
+            clients_by_thread[await client.call('thread')] = client
+
+            if len(clients_by_thread) == 2:
+                break
+
+        assert len(clients_by_thread) == 2
+
+        # notifications reach the clients of all loops
+        notifications = []
+        client1, client2 = clients_by_thread.values()
+
+        async def handler(data):
+            notifications.append(data['params'])
+
+        await client1.subscribe('foo', handler)
+        await client2.call('publish')
+        await asyncio.sleep(0.2)
+
+        assert notifications == [await client2.call('thread')]
+
+    finally:
+        for client in clients:
+            await client.disconnect()
+
+        process.terminate()
+        assert process.wait(timeout=10) == 0
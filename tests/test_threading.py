@@ -0,0 +1,85 @@
+import threading
+import asyncio
+import time
+
+import pytest
+
+from aiohttp_json_rpc.threading import ThreadedWorkerPool
+from aiohttp_json_rpc import RpcDeadlineExceededError
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_dispatch(event_loop):
+    pool = ThreadedWorkerPool(max_workers=4, loop=event_loop)
+
+    def add(a, b=0):
+        return a + b
+
+    def fail():
+        raise ValueError
+
+    # results, exceptions and deadlines
+    assert await pool.run(add, 1, b=2) == 3
+
+    with pytest.raises(ValueError):
+        await pool.run(fail)
+
+    with pytest.raises(RpcDeadlineExceededError):
+        await pool.run_before(event_loop.time() - 1, add, 1)
+
+    # results get set on the loop thread, in batches
+    results = await asyncio.gather(*[pool.run(add, i) for i in range(1000)])
+
+    assert results == list(range(1000))
+    assert not pool._results
+
+    future = asyncio.ensure_future(pool.run(threading.get_ident))
+    threads = []
+    future.add_done_callback(lambda f: threads.append(threading.get_ident()))
+
+    assert await future != threading.get_ident()
+    assert threads == [threading.get_ident()]
+
+    pool.shutdown()
+
+
+class Abort(BaseException):
+    pass
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_base_exceptions(event_loop):
+    pool = ThreadedWorkerPool(max_workers=1, loop=event_loop)
+
+    def abort():
+        raise Abort
+
+    with pytest.raises(Abort):
+        await asyncio.wait_for(pool.run(abort), 1)
+
+    pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_cancellation(event_loop):
+    pool = ThreadedWorkerPool(max_workers=1, loop=event_loop)
+    event = threading.Event()
+    calls = []
+
+    # the only worker is busy, so the second job is still queued
+    running = asyncio.ensure_future(pool.run(event.wait))
+    queued = asyncio.ensure_future(pool.run(calls.append, 1))
+    await asyncio.sleep(0.1)
+
+    queued.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await queued
+
+    event.set()
+
+    assert await running
+    assert await pool.run(time.sleep, 0) is None
+    assert calls == []
+
+    pool.shutdown()
@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+import pytest
+
+from aiohttp_json_rpc.timers import TimerWheel
+from aiohttp_json_rpc import RpcDeadlineExceededError
+
+
+@pytest.mark.asyncio
+async def test_timer_wheel(event_loop):
+    wheel = TimerWheel(resolution=0.01, slots=8, loop=event_loop)
+
+    short = asyncio.Future()
+    long = asyncio.Future()
+    cancelled = asyncio.Future()
+
+    wheel.add(short, 0.02)
+    wheel.add(long, 0.2)  # wraps around the wheel
+    wheel.cancel(wheel.add(cancelled, 0.02))
+
+    assert len(wheel) == 2
+
+    with pytest.raises(asyncio.TimeoutError):
+        await short
+
+    assert not long.done()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await long
+
+    assert not cancelled.done()
+    assert len(wheel) == 0
+
+    # the wheel stops ticking when it is empty
+    await asyncio.sleep(0.02)
+    assert wheel._handle is None
+
+
+@pytest.mark.asyncio
+async def test_client_call_timeout(rpc_context):
+    async def sleep(request):
+        await asyncio.sleep(0.2)
+
+    rpc_context.rpc.add_methods(('', sleep))
+
+    client = await rpc_context.make_client()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await client.call('sleep', timeout=0.05)
+
+    assert client._pending == {}
+
+
+@pytest.mark.asyncio
+async def test_server_call_timeout(rpc_context):
+    async def method(request):
+        try:
+            await request.call('client_method', timeout=0.05)
+
+        except asyncio.TimeoutError:
+            return request.http_request.pending == {}
+
+    async def client_method(params):
+        await asyncio.sleep(0.2)
+
+    rpc_context.rpc.add_methods(('', method))
+
+    client = await rpc_context.make_client()
+    client.add_methods(('', client_method))
+
+    assert await client.call('method', timeout=0.5)
+
+
+@pytest.mark.asyncio
+async def test_deadline_propagation(rpc_context):
+    calls = []
+
+    def block(request):
+        calls.append(request.params)
+        time.sleep(0.2)
+
+        return request.params
+
+    rpc_context.rpc.add_methods(('', block))
+
+    client = await rpc_context.make_client()
+    client._propagate_timeouts = True
+
+    # 4 workers are busy for 0.2s, so the fifth call expires in the queue
+    results = await asyncio.gather(*[
+        client.call('block', i, timeout=0.5 if i < 4 else 0.1)
+        for i in range(5)
+    ], return_exceptions=True)
+
+    assert results[:4] == [0, 1, 2, 3]
+    assert isinstance(results[4], asyncio.TimeoutError)
+
+    await asyncio.sleep(0.2)
+    assert 4 not in calls
+
+    # already expired calls don't get dispatched at all
+    with pytest.raises(RpcDeadlineExceededError):
+        await client.call('block', 5, timeout=0)
+
+    assert 5 not in calls
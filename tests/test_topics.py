@@ -0,0 +1,161 @@
+import asyncio
+
+import pytest
+
+from aiohttp_json_rpc.topics import TopicTrie, matches
+
+
+def test_topic_trie():
+    trie = TopicTrie()
+
+    trie.add('device.1.status', 'exact')
+    trie.add('device.*.status', 'single')
+    trie.add('device.#', 'multi')
+    trie.add('#', 'all')
+
+    assert sorted(trie.match('device.1.status')) == [
+        'all', 'exact', 'multi', 'single']
+
+    assert sorted(trie.match('device.2.status')) == ['all', 'multi', 'single']
+    assert sorted(trie.match('device')) == ['all', 'multi']
+    assert sorted(trie.match('sensor.1')) == ['all']
+
+    with pytest.raises(ValueError):
+        trie.add('device.#.status', 'invalid')
+
+    # removing prunes empty nodes
+    trie.remove('device.1.status', 'exact')
+    trie.remove('device.*.status', 'single')
+    trie.remove('unknown.topic', 'exact')
+
+    assert sorted(trie.match('device.1.status')) == ['all', 'multi']
+    assert list(trie.root.children['device'].children) == ['#']
+
+    # patterns and topics agree
+    for pattern in ('device.*.status', 'device.#', '#', 'device.1.status'):
+        for topic in ('device.1.status', 'device', 'device.1.status.x'):
+            trie = TopicTrie()
+            trie.add(pattern, True)
+
+            assert bool(trie.match(topic)) == matches(pattern, topic)
+
+
+@pytest.mark.asyncio
+async def test_pattern_subscriptions(rpc_context):
+    rpc = rpc_context.rpc
+    rpc.add_topics('device.*.status', 'device.1.secret')
+
+    await rpc.notify('device.2.status', 'on', state=True)
+
+    notifications = []
+
+    async def handler(data):
+        notifications.append((data['method'], data['params']))
+
+    client = await rpc_context.make_client()
+
+    # only topics the client may see can be subscribed by name
+    assert await client.subscribe('device.3.secret', handler) == []
+
+    # the state of matching topics gets replayed
+    await client.subscribe('device.#', handler)
+    await asyncio.sleep(0.1)
+
+    assert notifications == [('device.2.status', 'on')]
+    assert await client.get_subscriptions() == ['device.#']
+
+    # pattern subscriptions get authorized per topic on delivery
+    del notifications[:]
+
+    await rpc.notify('device.1.status', 'off')
+    await rpc.notify('device.1.secret', 'foo')
+    await rpc.notify('device.3.secret', 'bar')
+    await asyncio.sleep(0.1)
+
+    assert sorted(notifications) == [
+        ('device.1.secret', 'foo'),
+        ('device.1.status', 'off'),
+    ]
+
+    # the client looks up topics by name and only matches patterns
+    await client.subscribe('device.1.status', handler)
+
+    assert client._patterns == {'device.#'}
+    assert sorted(client._get_subscriptions('device.1.status')) == [
+        'device.#',
+        'device.1.status',
+    ]
+
+    assert client._get_subscriptions('device.2.status') == ['device.#']
+
+    await client.unsubscribe('device.1.status')
+
+    # unsubscribing removes the client from the index
+    await client.unsubscribe('device.#')
+
+    assert rpc.subscription_index.match('device.1.status') == []
+    assert client._patterns == set()
+
+
+@pytest.mark.asyncio
+async def test_pattern_topics_on_client(rpc_context):
+    rpc = rpc_context.rpc
+    rpc.add_topics('foo.*')
+
+    topics = []
+
+    async def handler(data):
+        topics.append(data['method'])
+
+    client = await rpc_context.make_client()
+    await client.subscribe('foo.*', handler)
+
+    # streams of patterns yield the topic with the params
+    async with client.stream('foo.*') as stream:
+        await rpc.notify('foo.a', 1)
+        await rpc.notify('foo.b', 2)
+
+        assert [await stream.__anext__() for _ in range(2)] == [
+            ('foo.a', 1),
+            ('foo.b', 2),
+        ]
+
+    assert topics == ['foo.a', 'foo.b']
+
+
+@pytest.mark.asyncio
+async def test_disconnect_during_call(rpc_context):
+    rpc = rpc_context.rpc
+    rpc.add_topics('foo')
+
+    event = asyncio.Event()
+
+    async def slow(request):
+        await event.wait()
+
+    rpc.add_methods(('', slow))
+
+    async def handler(data):
+        pass
+
+    client = await rpc_context.make_client()
+    await client.subscribe('foo', handler)
+
+    assert len(rpc.subscription_index.match('foo')) == 1
+
+    call = asyncio.ensure_future(client.call('slow'))
+    await asyncio.sleep(0.1)
+
+    await client.disconnect()
+    await asyncio.sleep(0.1)
+
+    # the call finishes after the client is gone and must not add it to
+    # the index again
+    event.set()
+    await asyncio.sleep(0.1)
+
+    assert rpc.clients == []
+    assert rpc.subscription_index.match('foo') == []
+
+    with pytest.raises(Exception):
+        await call